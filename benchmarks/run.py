@@ -0,0 +1,289 @@
+# benchmarks/run.py
+"""
+End-to-end benchmarks for the generator, validator, loader and analytics.
+
+For every scale factor the suite creates a throwaway database on the
+configured Postgres server and a temporary working directory (the pipeline
+uses data/raw and logs relative to the cwd), then runs each stage in its own
+child process:
+
+    generate  -> data_generator.generate_scaled
+    validate  -> data_validator.main
+    init_db   -> db_setup.init_db
+    load      -> load_to_db.load_data
+    query:*   -> each query in sql/basic_analytics.sql
+
+Each child reports wall time and peak RSS (its own and its pool workers'),
+so stages never inherit each other's memory. Results go to a JSON file and
+are compared with benchmarks/baseline.json:
+
+    python -m benchmarks.run --scale-factors 1 10
+    python -m benchmarks.run --update-baseline
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime
+
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ANALYTICS_SQL = os.path.join(ROOT, "sql", "basic_analytics.sql")
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+
+DEFAULT_SCALE_FACTORS = [1, 10]
+DEFAULT_TOLERANCE = 0.25  # allowed slowdown / memory growth vs the baseline
+MIN_SLOWDOWN_SECONDS = 0.05  # timer noise on millisecond stages is not a regression
+BENCH_ENV = "bench"  # config/bench.yaml, filled from BENCH_DB_* variables
+
+
+# ---------- Analytics Queries ----------
+def analytics_queries(path=ANALYTICS_SQL):
+    """(title, sql) for each query, titled by its section header comment."""
+    from src.analytics import sql_queries
+
+    return sql_queries(path)
+
+
+# ---------- Child Process: One Stage ----------
+def peak_memory_bytes():
+    """Peak RSS of this process or of its largest finished child."""
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return peak_kb * 1024  # ru_maxrss is in KiB on Linux
+
+
+def run_stage(stage, scale_factor, workers=None, chunk_size=None):
+    """Run one stage in this process; returns its measurements.
+
+    Pipeline modules are imported and the engine is created before the
+    clock starts, so that setup is not attributed to the stage.
+    """
+    if stage == "generate":
+        from src import data_generator
+        work = lambda: sum(data_generator.generate_scaled(scale_factor, workers=workers).values())
+    elif stage == "validate":
+        from src import data_validator
+        work = lambda: data_validator.main(workers=workers)
+    elif stage == "init_db":
+        from src.scripts import db_setup
+        work = db_setup.init_db
+    elif stage == "load":
+        from src.etl import load_to_db
+        work = lambda: load_to_db.load_data(chunk_size=chunk_size)
+    elif stage.startswith("query:"):
+        from src.scripts.db_setup import get_engine
+        sql = dict(analytics_queries())[stage.split(":", 1)[1]]
+
+        def work():
+            with get_engine().connect() as conn:
+                return len(conn.execute(text(sql)).fetchall())
+    else:
+        raise ValueError(f"Unknown benchmark stage: {stage}")
+    if stage not in ("generate", "validate"):
+        from src.scripts import db_setup
+        db_setup.get_engine()
+
+    started = time.perf_counter()
+    output = work()
+    elapsed = time.perf_counter() - started
+    result = {"wall_seconds": elapsed, "peak_memory_bytes": peak_memory_bytes()}
+    if stage == "generate":
+        result["rows"] = output
+    elif stage.startswith("query:"):
+        result["result_rows"] = output
+    return result
+
+
+def spawn_stage(stage, scale_factor, workdir, env, workers=None, chunk_size=None):
+    """Run a stage in a fresh interpreter inside `workdir`; returns its result."""
+    result_path = os.path.join(workdir, "stage_result.json")
+    command = [sys.executable, "-m", "benchmarks.run", "--child", stage,
+               "--scale-factors", str(scale_factor), "--result-file", result_path]
+    if workers:
+        command += ["--workers", str(workers)]
+    if chunk_size:
+        command += ["--chunk-size", str(chunk_size)]
+
+    log_path = os.path.join(workdir, "bench.log")
+    with open(log_path, "a") as log:
+        completed = subprocess.run(command, cwd=workdir, env=env, stdout=log, stderr=log)
+    if completed.returncode != 0:
+        with open(log_path) as log:
+            tail = "".join(log.readlines()[-20:])
+        raise RuntimeError(f"Benchmark stage '{stage}' failed:\n{tail}")
+    with open(result_path) as f:
+        return json.load(f)
+
+
+# ---------- Throwaway Database ----------
+def admin_engine(env):
+    from config.config import load_config
+
+    db_conf = load_config(env=env)["database"]
+    url = (f"postgresql+psycopg2://{db_conf['user']}:{db_conf['password']}@"
+           f"{db_conf['host']}:{db_conf['port']}/{db_conf['name']}")
+    return create_engine(url, isolation_level="AUTOCOMMIT"), db_conf
+
+
+def bench_environment(db_conf, db_name):
+    env = dict(os.environ)
+    env.update({
+        "ENV": BENCH_ENV,
+        "PYTHONPATH": os.pathsep.join(filter(None, [ROOT, env.get("PYTHONPATH")])),
+        "BENCH_DB_USER": str(db_conf["user"]),
+        "BENCH_DB_PASSWORD": str(db_conf["password"]),
+        "BENCH_DB_HOST": str(db_conf["host"]),
+        "BENCH_DB_PORT": str(db_conf["port"]),
+        "BENCH_DB_NAME": db_name,
+    })
+    return env
+
+
+# ---------- Suite ----------
+def run_scale_factor(scale_factor, admin, db_conf, workers=None, chunk_size=None):
+    """All stages for one scale factor, on a fresh database and directory."""
+    db_name = f"shopflow_bench_{os.getpid()}_{str(scale_factor).replace('.', '_')}"
+    results = []
+    with admin.connect() as conn:
+        conn.execute(text(f'CREATE DATABASE "{db_name}"'))
+    try:
+        with tempfile.TemporaryDirectory(prefix="shopflow_bench_") as workdir:
+            env = bench_environment(db_conf, db_name)
+            stages = ["generate", "validate", "init_db", "load"]
+            stages += [f"query:{title}" for title, _ in analytics_queries()]
+
+            rows = None
+            for stage in stages:
+                print(f"⏱️ sf={scale_factor} {stage}...")
+                result = spawn_stage(stage, scale_factor, workdir, env, workers, chunk_size)
+                rows = result.pop("rows", rows)
+                stage_rows = None if stage == "init_db" else rows
+                result.update({
+                    "scale_factor": scale_factor,
+                    "stage": stage,
+                    "rows": stage_rows,
+                    "rows_per_sec": (stage_rows / result["wall_seconds"]
+                                     if stage_rows and result["wall_seconds"] else None),
+                })
+                results.append(result)
+                print(f"   {result['wall_seconds']:.2f}s, "
+                      f"{result['peak_memory_bytes'] / 2**20:.0f} MB peak")
+    finally:
+        with admin.connect() as conn:
+            conn.execute(text(f'DROP DATABASE IF EXISTS "{db_name}" WITH (FORCE)'))
+    return results
+
+
+def run_suite(scale_factors, env, workers=None, chunk_size=None):
+    admin, db_conf = admin_engine(env)
+    results = []
+    for scale_factor in scale_factors:
+        results += run_scale_factor(scale_factor, admin, db_conf, workers, chunk_size)
+    admin.dispose()
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "settings": {"workers": workers, "chunk_size": chunk_size},
+        "results": results,
+    }
+
+
+# ---------- Baseline Comparison ----------
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Regressions of `report` against `baseline`: slower or hungrier stages.
+
+    Stages missing from the baseline are ignored.
+    """
+    expected = {(r["scale_factor"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        base = expected.get((result["scale_factor"], result["stage"]))
+        if base is None:
+            continue
+        for metric in ("wall_seconds", "peak_memory_bytes"):
+            if metric == "wall_seconds" and result[metric] - base[metric] < MIN_SLOWDOWN_SECONDS:
+                continue
+            if base[metric] and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append({
+                    "scale_factor": result["scale_factor"], "stage": result["stage"],
+                    "metric": metric, "baseline": base[metric], "current": result[metric],
+                    "ratio": result[metric] / base[metric],
+                })
+    return regressions
+
+
+def print_report(report, regressions):
+    print(f"\n{'sf':>6}  {'stage':<45} {'seconds':>9} {'rows/s':>12} {'peak MB':>8}")
+    for r in report["results"]:
+        rate = f"{r['rows_per_sec']:,.0f}" if r["rows_per_sec"] else "-"
+        print(f"{r['scale_factor']:>6}  {r['stage'][:45]:<45} {r['wall_seconds']:>9.2f} "
+              f"{rate:>12} {r['peak_memory_bytes'] / 2**20:>8.0f}")
+    for reg in regressions:
+        print(f"❌ Regression sf={reg['scale_factor']} {reg['stage']}: {reg['metric']} "
+              f"{reg['current']:.4g} vs baseline {reg['baseline']:.4g} ({reg['ratio']:.2f}x)")
+    if not regressions:
+        print("✅ No regressions against the baseline.")
+
+
+# ---------- Main ----------
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline end to end.")
+    parser.add_argument("--scale-factors", type=float, nargs="+", default=DEFAULT_SCALE_FACTORS,
+                        help="data_generator scale factors to run")
+    parser.add_argument("--env", default=os.environ.get("ENV", "dev"),
+                        help="config whose Postgres server hosts the throwaway databases")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="generator / validator processes")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="load in chunks of N rows")
+    parser.add_argument("--output", default=None,
+                        help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown / memory growth")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="store this run as the new baseline")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    scale_factors = [int(sf) if float(sf).is_integer() else sf for sf in args.scale_factors]
+
+    if args.child:
+        result = run_stage(args.child, scale_factors[0], args.workers, args.chunk_size)
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        sys.exit(0)
+
+    report = run_suite(scale_factors, args.env, args.workers, args.chunk_size)
+
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Results written to {output}")
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"📌 Baseline updated: {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print(f"⚠️ No baseline at {args.baseline}; run with --update-baseline to create one")
+        print_report(report, [])
+        sys.exit(0)
+
+    with open(args.baseline) as f:
+        regressions = compare(report, json.load(f), args.tolerance)
+    print_report(report, regressions)
+    sys.exit(1 if regressions else 0)
@@ -1,5 +1,6 @@
 import os
 import yaml
+from functools import lru_cache
 
 class ConfigError(Exception):
     pass
@@ -45,3 +46,16 @@ def load_config(env="dev"):
     aws_config.pop("secret_key", None)
 
     return config
+
+
+def get_config(env=None):
+    """Memoized load_config for `env` (default: the ENV variable, else "dev").
+
+    Every module shares one parsed config per environment.
+    """
+    return _cached_config(env or os.environ.get("ENV", "dev"))
+
+
+@lru_cache(maxsize=None)
+def _cached_config(env):
+    return load_config(env=env)
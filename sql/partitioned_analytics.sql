@@ -0,0 +1,32 @@
+-- ============================================================
+-- Analytics for the monthly-partitioned schema
+-- (database.partition_transactions: true in the config)
+-- Filtering on the partition keys lets Postgres skip the partitions
+-- outside the range, and joining on the timestamp too pairs each
+-- transactions partition with its transaction_items partition.
+--
+-- :start and :end bound the transaction date (inclusive, NULL for no
+-- bound), e.g. python -m src analytics --queries partitioned
+-- --start 2025-01-01 --end 2025-06-30
+-- ============================================================
+
+SET LOCAL enable_partitionwise_join = on;
+SET LOCAL enable_partitionwise_aggregate = on;
+
+-- ============================================================
+-- Monthly Revenue Trends (for a date range)
+-- ============================================================
+SELECT
+    DATE_TRUNC('month', t.timestamp)::DATE AS month,
+    ROUND(SUM(ti.quantity * p.price)::numeric, 2) AS total_revenue
+FROM transactions t
+JOIN transaction_items ti
+    ON t.id = ti.transaction_id
+   AND t.timestamp = ti.transaction_timestamp
+JOIN products p ON ti.product_id = p.id
+WHERE t.timestamp >= COALESCE(CAST(:start AS DATE), '-infinity')
+  AND t.timestamp < COALESCE(CAST(:end AS DATE) + 1, 'infinity')
+  AND ti.transaction_timestamp >= COALESCE(CAST(:start AS DATE), '-infinity')
+  AND ti.transaction_timestamp < COALESCE(CAST(:end AS DATE) + 1, 'infinity')
+GROUP BY month
+ORDER BY month;
@@ -0,0 +1,52 @@
+-- ============================================================
+-- Rollup-based versions of basic_analytics.sql
+-- Read the summary tables maintained by src/etl/rollups.py instead
+-- of joining transactions/transaction_items/products/customers.
+-- ============================================================
+
+-- ============================================================
+-- Top 10 Customers by Total Spending
+-- ============================================================
+SELECT
+    c.id AS customer_id,
+    c.name AS customer_name,
+    c.country,
+    ROUND(cs.total_spent::numeric, 2) AS total_spent
+FROM customer_spend cs
+JOIN customers c ON cs.customer_id = c.id
+ORDER BY cs.total_spent DESC
+LIMIT 10;
+
+-- ============================================================
+-- Best-Selling Products by Category
+-- ============================================================
+SELECT
+    p.category,
+    p.id AS product_id,
+    p.name AS product_name,
+    ps.total_quantity AS total_quantity_sold,
+    ROUND((ps.total_quantity * p.price)::numeric, 2) AS total_revenue
+FROM product_sales ps
+JOIN products p ON ps.product_id = p.id
+ORDER BY p.category, total_quantity_sold DESC;
+
+-- ============================================================
+-- Monthly Revenue Trends
+-- ============================================================
+SELECT
+    DATE_TRUNC('month', dr.day)::DATE AS month,
+    ROUND(SUM(dr.revenue)::numeric, 2) AS total_revenue
+FROM daily_revenue dr
+GROUP BY month
+ORDER BY month;
+
+-- ============================================================
+-- Average Order Value by Country
+-- ============================================================
+SELECT
+    c.country,
+    ROUND((SUM(cs.total_spent) / SUM(cs.order_count))::numeric, 2) AS avg_order_value
+FROM customer_spend cs
+JOIN customers c ON cs.customer_id = c.id
+GROUP BY c.country
+ORDER BY avg_order_value DESC;
@@ -0,0 +1,445 @@
+# src/analytics.py
+"""
+Run the analytics SQL files against the warehouse and print the results.
+
+The queries of basic_analytics.sql are also exposed as parameterized
+functions returning DataFrames (top_customers, best_selling_products,
+monthly_revenue, avg_order_value_by_country). Their results are cached in
+memory (LRU with a TTL) and on disk (pickles under CACHE_DIR), keyed on the
+parameters and the data version (see data_version), so new data invalidates
+every cached result while repeated calls between loads never reach the
+database beyond a small version check.
+"""
+import os
+import re
+import time
+import pickle
+import hashlib
+import argparse
+import functools
+import inspect
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+SQL_DIR = "sql"
+SQL_FILES = {
+    "basic": os.path.join(SQL_DIR, "basic_analytics.sql"),
+    "rollup": os.path.join(SQL_DIR, "rollup_analytics.sql"),
+    "partitioned": os.path.join(SQL_DIR, "partitioned_analytics.sql"),
+}
+
+
+def sql_statements(path):
+    """(title, sql) for each statement, titled by its last header comment."""
+    with open(path) as f:
+        chunks = f.read().split(";")
+    statements = []
+    for chunk in chunks:
+        sql = "\n".join(line for line in chunk.splitlines()
+                        if not line.strip().startswith("--")).strip()
+        if not sql:
+            continue
+        titles = re.findall(r"^--\s*(\w.*)$", chunk, flags=re.MULTILINE)
+        statements.append((titles[-1].strip() if titles else sql.split("\n")[0], sql))
+    return statements
+
+
+def sql_queries(path):
+    """The SELECT statements of a SQL file, as (title, sql)."""
+    return [(title, sql) for title, sql in sql_statements(path)
+            if sql.upper().startswith(("SELECT", "WITH"))]
+
+
+def run_sql_file(path, conn, params=None):
+    """Execute every statement of a SQL file in `conn`'s transaction, binding
+    `params` (e.g. start/end) where used; returns {title: DataFrame}."""
+    import pandas as pd  # only needed once there are results to hold
+
+    results = {}
+    for title, sql in sql_statements(path):
+        result = conn.execute(text(sql), params or {})
+        if result.returns_rows:
+            results[title] = pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+    return results
+
+
+# ---------- Result Cache ----------
+CACHE_DIR = os.path.join("data", "cache", "analytics")
+CACHE_SIZE = 128  # results kept in memory and on disk
+CACHE_TTL_SECONDS = 3600
+
+
+class ResultCache:
+    """Thread-safe LRU of key -> DataFrame whose entries expire after `ttl` seconds."""
+
+    def __init__(self, max_size=CACHE_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at, df)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, df):
+        with self._lock:
+            self._entries[key] = (time.time(), df)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskCache:
+    """Pickled results in `directory`, expired by age and evicted least recently used.
+
+    Reads touch the file, so its mtime is the last use. Writes go through a
+    temp file and os.replace, so concurrent readers never see partial files.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_size=CACHE_SIZE, ttl=CACHE_TTL_SECONDS):
+        self.directory = directory
+        self.max_size = max_size
+        self.ttl = ttl
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.ttl:
+                os.remove(path)
+                return None
+            with open(path, "rb") as f:
+                df = pickle.load(f)
+            os.utime(path)
+            return df
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def put(self, key, df):
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        try:
+            paths = [os.path.join(self.directory, name) for name in os.listdir(self.directory)
+                     if name.endswith(".pkl")]
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:max(0, len(paths) - self.max_size)]:
+                os.remove(path)
+        except OSError:
+            pass  # another process evicted the same file
+
+    def clear(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".pkl"):
+                    os.remove(os.path.join(self.directory, name))
+
+
+_memory_cache = ResultCache()
+_disk_cache = DiskCache()
+
+
+def clear_cache():
+    _memory_cache.clear()
+    _disk_cache.clear()
+
+
+def data_version(conn):
+    """Version of the loaded data; changes whenever new data lands.
+
+    The latest successful load (its id and time, which tells apart ids
+    reused after the database is reset) plus the data_versions counters.
+    Loaders bump those in the transaction of every chunk they commit, while
+    the load_audit row only follows once the whole load is done.
+    """
+    audit, counters = conn.execute(
+        text("SELECT to_regclass('load_audit'), to_regclass('data_versions')")
+    ).one()
+    if audit is None:
+        return "none"
+    row = conn.execute(text("""
+        SELECT id, load_timestamp FROM load_audit
+        WHERE status = 'success'
+        ORDER BY id DESC
+        LIMIT 1
+    """)).fetchone()
+    version = f"{row.id}@{row.load_timestamp.isoformat()}" if row else "none"
+    if counters is not None:
+        changes = conn.execute(
+            text("SELECT SUM(version), MAX(updated_at) FROM data_versions")
+        ).one()
+        if changes[0] is not None:
+            version += f"+{changes[0]}@{changes[1].isoformat()}"
+    return version
+
+
+def cache_key(name, params, version, database):
+    raw = repr((name, sorted(params.items()), version, database))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def cached_query(query):
+    """Serve `query(conn, **params)` from the caches, keyed on its bound parameters.
+
+    The wrapped function takes the same parameters (without `conn`) plus
+    `refresh=True` to bypass the caches and `conn` to reuse a connection.
+    Callers get a copy, so modifying a result never alters the cache.
+    """
+    signature = inspect.signature(query)
+
+    @functools.wraps(query)
+    def wrapper(*args, refresh=False, conn=None, **kwargs):
+        bound = signature.bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        params = {k: _normalize(v) for k, v in bound.arguments.items() if k != "conn"}
+
+        from src.scripts.db_setup import get_engine
+
+        engine = get_engine()
+        with (nullcontext(conn) if conn is not None else engine.connect()) as conn:
+            database = engine.url.render_as_string(hide_password=True)
+            key = cache_key(query.__name__, params, data_version(conn), database)
+            if not refresh:
+                df = _memory_cache.get(key)
+                if df is None:
+                    df = _disk_cache.get(key)
+                    if df is not None:
+                        _memory_cache.put(key, df)
+                if df is not None:
+                    return df.copy()
+            df = query(conn, **params)
+        _memory_cache.put(key, df)
+        _disk_cache.put(key, df)
+        return df.copy()
+
+    return wrapper
+
+
+def _normalize(value):
+    """Dates as date objects, so "2024-01-31" and date(2024, 1, 31) share a key."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, str) and re.fullmatch(r"\d{4}-\d{2}-\d{2}", value):
+        return date.fromisoformat(value)
+    return value
+
+
+# ---------- Parameterized Queries ----------
+# Each returns the columns of its basic_analytics.sql counterpart. `start`
+# and `end` bound the transaction date (inclusive); the other filters are
+# exact matches. Without filters the results equal the SQL file's.
+
+def _where(clauses):
+    return ("WHERE " + " AND ".join(clauses)) if clauses else ""
+
+
+def _date_filters(start, end, column="t.timestamp"):
+    clauses = []
+    if start is not None:
+        clauses.append(f"{column} >= :start")
+    if end is not None:
+        clauses.append(f"{column} < CAST(:end AS DATE) + 1")
+    return clauses
+
+
+def _frame(conn, sql, params):
+    import pandas as pd
+
+    result = conn.execute(text(sql), params)
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+@cached_query
+def top_customers(conn, n=10, start=None, end=None, country=None):
+    """Top `n` customers by total spending."""
+    clauses = _date_filters(start, end)
+    if country is not None:
+        clauses.append("c.country = :country")
+    return _frame(conn, f"""
+        SELECT
+            c.id AS customer_id,
+            c.name AS customer_name,
+            c.country,
+            ROUND(SUM(ti.quantity * p.price)::numeric, 2) AS total_spent
+        FROM transactions t
+        JOIN customers c ON t.customer_id = c.id
+        JOIN transaction_items ti ON t.id = ti.transaction_id
+        JOIN products p ON ti.product_id = p.id
+        {_where(clauses)}
+        GROUP BY c.id, c.name, c.country
+        ORDER BY total_spent DESC
+        LIMIT :n
+    """, {"n": n, "start": start, "end": end, "country": country})
+
+
+@cached_query
+def best_selling_products(conn, category=None, start=None, end=None, country=None,
+                          n=None):
+    """Products by quantity sold within each category; `n` keeps the top n per category."""
+    clauses = _date_filters(start, end)
+    if category is not None:
+        clauses.append("p.category = :category")
+    if country is not None:
+        clauses.append("c.country = :country")
+    joins = ""
+    if start is not None or end is not None or country is not None:
+        joins = "JOIN transactions t ON t.id = ti.transaction_id"
+        if country is not None:
+            joins += " JOIN customers c ON t.customer_id = c.id"
+    df = _frame(conn, f"""
+        SELECT
+            p.category,
+            p.id AS product_id,
+            p.name AS product_name,
+            SUM(ti.quantity) AS total_quantity_sold,
+            ROUND(SUM(ti.quantity * p.price)::numeric, 2) AS total_revenue
+        FROM transaction_items ti
+        JOIN products p ON ti.product_id = p.id
+        {joins}
+        {_where(clauses)}
+        GROUP BY p.category, p.id, p.name
+        ORDER BY p.category, total_quantity_sold DESC
+    """, {"start": start, "end": end, "category": category, "country": country})
+    if n is not None:
+        df = df.groupby("category", sort=False).head(n).reset_index(drop=True)
+    return df
+
+
+@cached_query
+def monthly_revenue(conn, start=None, end=None, category=None, country=None):
+    """Revenue per calendar month."""
+    clauses = _date_filters(start, end)
+    joins = ""
+    if category is not None:
+        clauses.append("p.category = :category")
+    if country is not None:
+        clauses.append("c.country = :country")
+        joins = "JOIN customers c ON t.customer_id = c.id"
+    return _frame(conn, f"""
+        SELECT
+            DATE_TRUNC('month', t.timestamp)::DATE AS month,
+            ROUND(SUM(ti.quantity * p.price)::numeric, 2) AS total_revenue
+        FROM transactions t
+        JOIN transaction_items ti ON t.id = ti.transaction_id
+        JOIN products p ON ti.product_id = p.id
+        {joins}
+        {_where(clauses)}
+        GROUP BY month
+        ORDER BY month
+    """, {"start": start, "end": end, "category": category, "country": country})
+
+
+@cached_query
+def avg_order_value_by_country(conn, start=None, end=None, country=None):
+    """Average order value per customer country."""
+    clauses = _date_filters(start, end)
+    if country is not None:
+        clauses.append("c.country = :country")
+    return _frame(conn, f"""
+        SELECT
+            country_orders.country,
+            ROUND(AVG(order_value)::numeric, 2) AS avg_order_value
+        FROM (
+            SELECT
+                t.id AS transaction_id,
+                c.country,
+                SUM(ti.quantity * p.price) AS order_value
+            FROM transactions t
+            JOIN customers c ON t.customer_id = c.id
+            JOIN transaction_items ti ON t.id = ti.transaction_id
+            JOIN products p ON ti.product_id = p.id
+            {_where(clauses)}
+            GROUP BY t.id, c.country
+        ) AS country_orders
+        GROUP BY country_orders.country
+        ORDER BY avg_order_value DESC
+    """, {"start": start, "end": end, "country": country})
+
+
+REPORTS = {
+    "top-customers": top_customers,
+    "best-sellers": best_selling_products,
+    "monthly-revenue": monthly_revenue,
+    "order-value-by-country": avg_order_value_by_country,
+}
+
+
+# ---------- CLI ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Run the analytics queries.")
+    parser.add_argument("--queries", choices=SQL_FILES, default="basic",
+                        help="which SQL file to run")
+    parser.add_argument("--file", default=None, help="run this SQL file instead")
+    parser.add_argument("--report", choices=REPORTS, default=None,
+                        help="run one parameterized (cached) query instead of a SQL file")
+    parser.add_argument("--top", type=int, default=None, help="report: number of rows (per category)")
+    parser.add_argument("--start", type=date.fromisoformat, default=None, metavar="YYYY-MM-DD",
+                        help="first transaction date (reports, partitioned queries)")
+    parser.add_argument("--end", type=date.fromisoformat, default=None, metavar="YYYY-MM-DD",
+                        help="last transaction date (reports, partitioned queries)")
+    parser.add_argument("--category", default=None, help="report: product category")
+    parser.add_argument("--country", default=None, help="report: customer country")
+    parser.add_argument("--refresh", action="store_true", help="report: bypass the cache")
+    parser.add_argument("--clear-cache", action="store_true",
+                        help="delete cached report results and exit")
+    args = parser.parse_args(argv)
+
+    if args.clear_cache:
+        clear_cache()
+        print(f"🧹 Cleared {CACHE_DIR}")
+        return
+    if args.report:
+        report = REPORTS[args.report]
+        accepted = inspect.signature(report).parameters
+        filters = {"n": args.top, "start": args.start, "end": args.end,
+                   "category": args.category, "country": args.country}
+        options = {"n": "--top"}
+        unsupported = [options.get(name, f"--{name}") for name, value in filters.items()
+                       if value is not None and name not in accepted]
+        if unsupported:
+            parser.error(f"--report {args.report} does not take {', '.join(unsupported)}")
+        started = time.perf_counter()
+        df = report(refresh=args.refresh,
+                    **{k: v for k, v in filters.items() if v is not None})
+        print(f"\n📊 {args.report} ({time.perf_counter() - started:.3f}s)")
+        print(df.to_string(index=False))
+        return
+
+    from src.scripts.db_setup import get_engine
+
+    with get_engine().connect() as conn:
+        results = run_sql_file(args.file or SQL_FILES[args.queries], conn,
+                               {"start": args.start, "end": args.end})
+        for title, df in results.items():
+            print(f"\n📊 {title}")
+            print(df.to_string(index=False))
+
+
+if __name__ == "__main__":
+    cli()
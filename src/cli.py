@@ -0,0 +1,44 @@
+# src/cli.py
+"""
+Single entry point for the pipeline:
+
+    python -m src <command> [options]
+
+Each command imports only its own module when it runs, so `generate` or
+`validate` never load SQLAlchemy/boto3 or open a connection. Options after
+the command are handled by that module (`python -m src load --help`).
+"""
+import argparse
+import importlib
+
+PROG = "shopflow"
+
+# command -> (module with a cli(argv, prog) function, help)
+COMMANDS = {
+    "generate": ("src.data_generator", "generate synthetic raw data"),
+    "validate": ("src.data_validator", "validate the raw files"),
+    "upload": ("src.cloud.s3_handler", "upload the raw files to S3"),
+    "compact": ("src.cloud.s3_compaction", "merge the small objects of an S3 partition"),
+    "setup": ("src.scripts.db_setup", "create the schema / retire partitions"),
+    "load": ("src.etl.load_to_db", "load the raw files into PostgreSQL"),
+    "stream": ("src.etl.stream_load", "tail the transaction micro-batch stream into PostgreSQL"),
+    "reset": ("src.reset_db", "empty (or drop and recreate) all tables"),
+    "snapshot": ("src.snapshot", "save/restore database snapshots"),
+    "analytics": ("src.analytics", "run the analytics queries"),
+    "export": ("src.export", "stream a table or query to CSV/Parquet"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog=PROG, description="ShopFlow data pipeline.")
+    subparsers = parser.add_subparsers(dest="command", required=True, metavar="command")
+    for command, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(command, help=help_text, add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    module = importlib.import_module(COMMANDS[args.command][0])
+    module.cli(rest, prog=f"{PROG} {args.command}")
+
+
+if __name__ == "__main__":
+    main()
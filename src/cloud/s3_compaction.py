@@ -0,0 +1,308 @@
+"""
+Compaction of the S3 raw zone.
+
+Every upload adds an object `raw/year=/month=/day=/<type>/HHMMSS_<file>`,
+so partitions that receive frequent uploads pile up small objects, and
+listing and scanning them gets slower. Compaction merges the data of a
+day or month partition, for one file type and format, into a few large
+compressed objects:
+
+    compacted/year=YYYY/month=MM[/day=DD]/<type>/<run id>/part-NNNNN.csv.gz
+    compacted/year=YYYY/month=MM[/day=DD]/<type>/_manifest.csv.json
+
+Rows are deduplicated on their key (id, or transaction id and product for
+transaction items), keeping the version from the latest upload. The
+inputs are read oldest first:
+
+  - the objects of earlier compactions of the partition (a month also
+    absorbs its day compactions);
+  - the raw uploads, in upload order.
+
+The manifest lists the new objects (Key, Size, ETag, rows) and is what
+s3_reader uses instead of listing the partition. Once it is written, the
+inputs are deleted; bucket versioning keeps their old versions. Upload
+pointers (meta/latest/) carry the content hash themselves, so files that
+did not change are still skipped by the next upload.
+
+Uploads may run at the same time. An upload key carries the upload's
+start time. Only uploads that started at least `settle` seconds ago are
+compacted, so `settle` must exceed the longest upload. Later uploads stay
+in raw/ and readers prefer them to the compaction, as they would prefer a
+newer upload. A manifest is "complete" once its partition can receive no
+more uploads; readers then skip listing the partition altogether.
+
+Two compactions of the same partition are not meant to overlap. The
+manifest is written with a conditional PUT: If-Match the version the
+compaction read, or If-None-Match when there was none. If another
+compaction replaced it meanwhile, S3 rejects the write and this compaction
+deletes its own objects and aborts.
+"""
+import io
+import gzip
+import json
+import uuid
+import argparse
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+from botocore.exceptions import ClientError
+
+from src import instrumentation, schema
+from src.cloud import s3_reader
+from src.cloud.s3_handler import MB, bucket_name, get_s3_client, get_transfer_config
+from src.raw_zone import ENTITIES, FORMATS, PARQUET_COMPRESSION, require_pyarrow
+
+# Raw entity -> columns identifying a row. A transactions row is one item,
+# upserted on (transaction_id, product_id) (uix_transaction_product)
+PRIMARY_KEYS = {"customers": ["id"], "products": ["id"], "transactions": ["id", "product_id"]}
+
+DEFAULT_TARGET_MB = 128  # approximate uncompressed size of a compacted part
+DEFAULT_SETTLE_SECONDS = 15 * 60
+DELETE_BATCH_SIZE = 1000  # keys per DeleteObjects request
+MANIFEST_VERSION = 1
+# Errors of a conditional write that lost to another writer
+WRITE_CONFLICTS = ("PreconditionFailed", "ConditionalRequestConflict")
+
+# ---------- Partitions ----------
+def parse_partition(value):
+    """(path, first day, first day after) of a YYYY-MM-DD or YYYY-MM partition."""
+    if len(value) == 7:
+        first = date.fromisoformat(f"{value}-01")
+        after = date(first.year + first.month // 12, first.month % 12 + 1, 1)
+        return s3_reader.month_path(first), first, after
+    day = date.fromisoformat(value)
+    return s3_reader.day_path(day), day, day + timedelta(days=1)
+
+def _upload_started(key):
+    """UTC start time of an upload, from its key (.../day=DD/<type>/HHMMSS_<file>)."""
+    parts = key.split("/")
+    day = date(*(int(part.split("=")[1]) for part in parts[1:4]))
+    hhmmss = parts[-1].split("_", 1)[0]
+    return datetime(day.year, day.month, day.day, int(hhmmss[:2]), int(hhmmss[2:4]),
+                    int(hhmmss[4:6]), tzinfo=timezone.utc)
+
+def _settled_uploads(client, bucket, path, file_type, fmt, cutoff):
+    """Raw uploads of the partition that started before `cutoff`, oldest first."""
+    objects = s3_reader._list_objects(client, bucket,
+                                      f"{s3_reader.RAW_PREFIX}{path}{file_type}/")
+    uploads = [obj for obj in objects
+               if obj["Key"].endswith(f".{fmt}") and _upload_started(obj["Key"]) <= cutoff]
+    return sorted(uploads, key=lambda obj: (_upload_started(obj["Key"]), obj["Key"]))
+
+def _day_paths(client, bucket, path):
+    """Day partition paths of a month path, oldest first."""
+    return sorted(s3_reader._partition_children(client, bucket, path, "day"))
+
+# ---------- Read / Write ----------
+def read_object_frame(key, file_type, fmt, client, bucket):
+    """One raw or compacted object as a DataFrame (dates left as text)."""
+    data = s3_reader.read_object(s3_reader.s3_uri(key, bucket), client)
+    if fmt == "parquet":
+        require_pyarrow()
+        import pyarrow.parquet as pq
+
+        return schema.compact(pq.read_table(io.BytesIO(data)).to_pandas(), file_type,
+                              parse_dates=False)
+    buffer = io.BytesIO(gzip.decompress(data) if key.endswith(".gz") else data)
+    return schema.read_csv(buffer, file_type, parse_dates=False)
+
+def deduplicate(frames, file_type):
+    """Concatenate frames oldest first and keep the last version of each key."""
+    df = pd.concat(frames, ignore_index=True)
+    keys = PRIMARY_KEYS[file_type]
+    return df.drop_duplicates(subset=keys, keep="last").sort_values(keys, ignore_index=True)
+
+def encode_part(df, file_type, fmt):
+    """Bytes of one compacted object: gzip CSV, or zstd Parquet."""
+    if fmt == "parquet":
+        pa = require_pyarrow()
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(
+            df.astype({column: "string" for column in df.select_dtypes("category")}),
+            schema=schema.arrow_schema(file_type), preserve_index=False,
+        )
+        buffer = io.BytesIO()
+        pq.write_table(table, buffer, compression=PARQUET_COMPRESSION)
+        return buffer.getvalue()
+    return gzip.compress(df.to_csv(index=False).encode(), compresslevel=6)
+
+def split_parts(df, target_bytes):
+    """Row slices of about `target_bytes` in memory each."""
+    if df.empty:
+        return [df]
+    row_bytes = max(1, df.memory_usage(deep=True).sum() // len(df))
+    rows = max(1, int(target_bytes // row_bytes))
+    return [df.iloc[start:start + rows] for start in range(0, len(df), rows)]
+
+def _delete_objects(client, bucket, keys):
+    for start in range(0, len(keys), DELETE_BATCH_SIZE):
+        batch = keys[start:start + DELETE_BATCH_SIZE]
+        client.delete_objects(Bucket=bucket, Delete={
+            "Objects": [{"Key": key} for key in batch], "Quiet": True,
+        })
+
+def _manifest_run(client, bucket, key):
+    try:
+        return client.head_object(Bucket=bucket, Key=key)["Metadata"].get("run-id")
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+
+def _put_manifest(client, bucket, key, manifest, etag, run_id):
+    """Write a manifest if it is still the version read (`etag`; None: still
+    absent). Returns False when another compaction replaced it meanwhile.
+
+    This botocore has no PutObject parameters for the condition, so an event
+    handler adds the header to the request carrying this run's metadata.
+    """
+    header, value = ("If-Match", etag) if etag else ("If-None-Match", "*")
+
+    def add_condition(request, **kwargs):
+        if request.headers.get("x-amz-meta-run-id") == run_id:
+            request.headers[header] = value
+
+    event, handler_id = "before-sign.s3.PutObject", f"manifest-{run_id}"
+    client.meta.events.register(event, add_condition, unique_id=handler_id)
+    try:
+        client.put_object(Bucket=bucket, Key=key, ContentType="application/json",
+                          Metadata={"run-id": run_id},
+                          Body=json.dumps(manifest, indent=2).encode())
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in WRITE_CONFLICTS:
+            raise
+        # A retried request fails on the write its first attempt made
+        return _manifest_run(client, bucket, key) == run_id
+    finally:
+        client.meta.events.unregister(event, unique_id=handler_id)
+    return True
+
+# ---------- Compaction ----------
+def compact_partition(partition, file_type, fmt="csv", target_mb=DEFAULT_TARGET_MB,
+                      settle_seconds=DEFAULT_SETTLE_SECONDS, dry_run=False,
+                      client=None, bucket=None, now=None):
+    """Compact one day (YYYY-MM-DD) or month (YYYY-MM) partition of a file type.
+
+    Returns the manifest written (None when there was nothing to compact).
+    """
+    client = client or get_s3_client()
+    bucket = bucket or bucket_name()
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(seconds=settle_seconds)
+    path, _, day_after = parse_partition(partition)
+    is_month = "day=" not in path
+    manifest_key = s3_reader.manifest_key(path, file_type, fmt)
+
+    # Inputs, oldest first: the partition's own compaction, then each day's
+    # compaction (months) and settled raw uploads
+    previous = s3_reader.read_manifest(path, file_type, fmt, client, bucket)
+    inputs = [obj["Key"] for obj in previous["objects"]] if previous else []
+    absorbed = []  # day manifests merged into a month
+    uploads = 0
+    for day in (_day_paths(client, bucket, path) if is_month else [path]):
+        day_manifest = (s3_reader.read_manifest(day, file_type, fmt, client, bucket)
+                        if is_month else None)
+        if day_manifest:
+            inputs += [obj["Key"] for obj in day_manifest["objects"]]
+            absorbed.append(s3_reader.manifest_key(day, file_type, fmt))
+        settled = _settled_uploads(client, bucket, day, file_type, fmt, cutoff)
+        inputs += [obj["Key"] for obj in settled]
+        uploads += len(settled)
+    if not uploads and not absorbed:
+        print(f"⏭️ {path}{file_type}: nothing to compact")
+        return None
+
+    frames = []
+    for key in inputs:
+        with instrumentation.span("compaction_read", file_type) as timer:
+            frames.append(read_object_frame(key, file_type, fmt, client, bucket))
+            timer.rows = len(frames[-1])
+    rows_in = sum(len(frame) for frame in frames)
+    with instrumentation.span("compaction_dedupe", file_type, rows=rows_in):
+        df = deduplicate(frames, file_type)
+    del frames
+
+    run_id = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    prefix = f"{s3_reader.COMPACTED_PREFIX}{path}{file_type}/{run_id}/"
+    extension = "parquet" if fmt == "parquet" else "csv.gz"
+    parts = split_parts(df, target_mb * MB)
+    print(f"🗜️ {path}{file_type}: {len(inputs)} objects, {rows_in} rows → "
+          f"{len(parts)} parts, {len(df)} rows after dedup")
+    if dry_run:
+        return None
+
+    objects = []
+    for i, part in enumerate(parts):
+        key = f"{prefix}part-{i:05d}.{extension}"
+        with instrumentation.span("compaction_write", file_type, rows=len(part)) as timer:
+            body = encode_part(part, file_type, fmt)
+            timer.bytes = len(body)
+            client.upload_fileobj(io.BytesIO(body), bucket, key,
+                                  Config=get_transfer_config())
+        head = client.head_object(Bucket=bucket, Key=key)
+        objects.append({"Key": key, "Size": head["ContentLength"], "ETag": head["ETag"],
+                        "rows": len(part)})
+
+    complete = now >= datetime(day_after.year, day_after.month, day_after.day,
+                               tzinfo=timezone.utc) + timedelta(seconds=settle_seconds)
+    manifest = {
+        "version": MANIFEST_VERSION, "partition": partition, "file_type": file_type,
+        "format": fmt, "created_at": now.isoformat(timespec="seconds"),
+        "complete": complete, "rows": len(df), "objects": objects,
+        "replaced": len(inputs),
+    }
+    # Abort if another compaction replaced the manifest meanwhile
+    if not _put_manifest(client, bucket, manifest_key, manifest,
+                         (previous or {}).get("ETag"), run_id):
+        _delete_objects(client, bucket, [obj["Key"] for obj in objects])
+        raise RuntimeError(f"{manifest_key} changed during compaction; retry")
+
+    # The manifest now serves the data; drop the inputs and absorbed manifests
+    with instrumentation.span("compaction_delete", file_type):
+        _delete_objects(client, bucket, inputs + absorbed)
+    size = sum(obj["Size"] for obj in objects)
+    print(f"✅ Compacted {path}{file_type} → {len(objects)} objects "
+          f"({size / MB:.2f} MB){'' if complete else ', partition still open'}")
+    return manifest
+
+def compact(partition, file_types=ENTITIES, fmt="csv", **kwargs):
+    """Compact a partition for each file type; returns {file type: manifest}."""
+    return {file_type: compact_partition(partition, file_type, fmt, **kwargs)
+            for file_type in file_types}
+
+# ---------- Main ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Merge the small objects of an S3 raw-zone partition."
+    )
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--day", metavar="YYYY-MM-DD", help="compact one day partition")
+    target.add_argument("--month", metavar="YYYY-MM",
+                        help="compact a month, including its day compactions")
+    parser.add_argument("--type", dest="file_types", action="append", choices=ENTITIES,
+                        help="file type to compact (repeatable; default: all)")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--target-mb", type=int, default=DEFAULT_TARGET_MB,
+                        help="approximate uncompressed size of each compacted object")
+    parser.add_argument("--settle-seconds", type=int, default=DEFAULT_SETTLE_SECONDS,
+                        help="only compact uploads started at least this long ago "
+                             "(must exceed the longest upload)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report what would be compacted without writing")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    partition = args.day or args.month
+    try:
+        parse_partition(partition)
+    except ValueError:
+        parser.error(f"invalid partition: {partition}")
+
+    with instrumentation.run("compact", trace_memory=args.trace_memory) as run:
+        compact(partition, args.file_types or ENTITIES, args.format,
+                target_mb=args.target_mb, settle_seconds=args.settle_seconds,
+                dry_run=args.dry_run)
+    instrumentation.export(run, args)
+
+if __name__ == "__main__":
+    cli()
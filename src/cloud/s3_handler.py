@@ -1,17 +1,30 @@
 import boto3
 import os
 import time
+import json
+import random
+import hashlib
+import argparse
 from datetime import datetime
-from botocore.exceptions import ClientError
-from config.config import load_config
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
+from boto3.exceptions import S3UploadFailedError
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+from config.config import get_config
+from src import instrumentation
+from src.raw_zone import ENTITIES, FORMATS, latest_parquet_files
 
-# ---------- Load Config ----------
-config = load_config(env=os.environ.get("ENV", "dev"))
-AWS_CONFIG = config["aws"]
+# ---------- Config (read on first use) ----------
+def aws_config():
+    """The `aws` config section; importing this module reads no config."""
+    return get_config()["aws"]
 
-BUCKET_NAME = AWS_CONFIG["bucket"]
-REGION = AWS_CONFIG["region"]
-PROFILE = AWS_CONFIG.get("profile", "default")
+def bucket_name():
+    return aws_config()["bucket"]
+
+def region():
+    return aws_config()["region"]
 
 CSV_PATHS = {
     "customers": "data/raw/customers.csv",
@@ -20,36 +33,91 @@ CSV_PATHS = {
 }
 
 MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds
+RETRY_BASE_DELAY = 1  # seconds, doubled per attempt
+RETRY_MAX_DELAY = 30  # seconds
+
+# ---------- Transfer Settings ----------
+MB = 1024 * 1024
+
+def upload_workers():
+    return aws_config().get("upload_workers", len(CSV_PATHS))  # files in flight
+
+@lru_cache(maxsize=None)
+def get_transfer_config():
+    conf = aws_config()
+    chunk_size = conf.get("multipart_chunk_mb", 16) * MB
+    return TransferConfig(
+        multipart_threshold=chunk_size,
+        multipart_chunksize=chunk_size,
+        max_concurrency=conf.get("max_concurrency", 8),  # parts in flight per file
+        use_threads=True,
+    )
+
+# Pointer objects recording the latest upload of each file type
+LATEST_PREFIX = "meta/latest/"
+HASH_CHUNK_SIZE = 1 << 20
+
+# ---------- S3 Session (created on first use) ----------
+@lru_cache(maxsize=None)
+def get_session():
+    # No profile: env vars / default chain / IAM role
+    return boto3.Session(profile_name=aws_config().get("profile"))
+
+@lru_cache(maxsize=None)
+def get_s3_client():
+    # endpoint_url: e.g. a local MinIO / moto server
+    return get_session().client("s3", region_name=region(),
+                                endpoint_url=aws_config().get("endpoint_url"))
 
-# ---------- Initialize S3 Session ----------
-session = boto3.Session(profile_name=PROFILE)
-s3_client = session.client("s3", region_name=REGION)
-s3_resource = session.resource("s3", region_name=REGION)
+@lru_cache(maxsize=None)
+def get_s3_resource():
+    return get_session().resource("s3", region_name=region(),
+                                  endpoint_url=aws_config().get("endpoint_url"))
+
+_LAZY_ATTRIBUTES = {
+    "session": get_session, "s3_client": get_s3_client, "s3_resource": get_s3_resource,
+    "config": get_config, "AWS_CONFIG": aws_config, "BUCKET_NAME": bucket_name,
+    "REGION": region, "PROFILE": lambda: aws_config().get("profile"),
+    "ENDPOINT_URL": lambda: aws_config().get("endpoint_url"),
+    "UPLOAD_WORKERS": upload_workers, "TRANSFER_CONFIG": get_transfer_config,
+}
+
+def __getattr__(name):
+    # Backwards compatibility for the former module-level session/client/resource
+    # and config values
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ---------- Helper: Check/Create Bucket ----------
-def ensure_bucket_exists(bucket_name):
+def ensure_bucket_exists(bucket_name, client=None):
+    client = client or get_s3_client()
     try:
-        s3_client.head_bucket(Bucket=bucket_name)
+        client.head_bucket(Bucket=bucket_name)
         print(f"✅ Bucket '{bucket_name}' already exists.")
     except ClientError as e:
         error_code = e.response["Error"]["Code"]
         if error_code == "404":
             print(f"🪣 Bucket '{bucket_name}' not found. Creating...")
-            s3_client.create_bucket(
-                Bucket=bucket_name,
-                CreateBucketConfiguration={"LocationConstraint": REGION},
-            )
+            # us-east-1 is the default location and rejects an explicit constraint
+            if region() == "us-east-1":
+                client.create_bucket(Bucket=bucket_name)
+            else:
+                client.create_bucket(
+                    Bucket=bucket_name,
+                    CreateBucketConfiguration={"LocationConstraint": region()},
+                )
             print(f"✅ Bucket '{bucket_name}' created.")
         else:
             raise
 
 # ---------- Helper: Enable Versioning ----------
-def ensure_versioning_enabled(bucket_name):
-    versioning = s3_client.get_bucket_versioning(Bucket=bucket_name)
+def ensure_versioning_enabled(bucket_name, client=None):
+    client = client or get_s3_client()
+    versioning = client.get_bucket_versioning(Bucket=bucket_name)
     if versioning.get("Status") != "Enabled":
         print(f"🌀 Enabling versioning on bucket '{bucket_name}'...")
-        s3_client.put_bucket_versioning(
+        client.put_bucket_versioning(
             Bucket=bucket_name,
             VersioningConfiguration={"Status": "Enabled"}
         )
@@ -64,34 +132,140 @@ def get_s3_key(file_type, filename):
     versioned_filename = f"{now.strftime('%H%M%S')}_{filename}"
     return date_path + versioned_filename
 
+# ---------- Helper: Retry Backoff ----------
+def backoff_delay(attempt):
+    """Exponential backoff with full jitter for the given (1-based) attempt."""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+# ---------- Helper: Content Hash ----------
+def file_sha256(local_path):
+    digest = hashlib.sha256()
+    with open(local_path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_latest_upload_hash(pointer_name, client=None):
+    """sha256 of the latest upload behind a pointer, if any.
+
+    Read from the pointer itself: compaction (s3_compaction) deletes the raw
+    uploads pointers refer to, and an unchanged file must still be skipped.
+    """
+    client = client or get_s3_client()
+    try:
+        pointer = client.get_object(Bucket=bucket_name(),
+                                    Key=f"{LATEST_PREFIX}{pointer_name}.json")
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    return json.loads(pointer["Body"].read()).get("sha256")
+
 # ---------- Upload File with Retry ----------
-def upload_file(local_path, file_type):
+def upload_file(local_path, file_type, client=None, force=False, pointer_name=None):
+    """Upload one file unless its content matches the latest upload.
+
+    `pointer_name` identifies the file across uploads (default: `file_type`).
+    Returns a summary dict with the key, bytes, seconds and whether it was skipped.
+    """
+    client = client or get_s3_client()
+    pointer_name = pointer_name or file_type
     filename = os.path.basename(local_path)
+    size = os.path.getsize(local_path)
+    with instrumentation.span("s3_hash", file_type, bytes=size):
+        digest = file_sha256(local_path)
+
+    if not force and get_latest_upload_hash(pointer_name, client) == digest:
+        print(f"⏭️ {filename} unchanged since last upload — skipped")
+        return {"file": filename, "key": None, "bytes": 0, "seconds": 0.0, "skipped": True}
+
     s3_key = get_s3_key(file_type, filename)
+    bucket = bucket_name()
     for attempt in range(1, MAX_RETRIES + 1):
         try:
-            s3_client.upload_file(local_path, BUCKET_NAME, s3_key)
-            print(f"✅ Uploaded {filename} → s3://{BUCKET_NAME}/{s3_key}")
-            return s3_key
-        except ClientError as e:
+            with instrumentation.span("s3_upload", file_type, bytes=size) as timer:
+                client.upload_file(
+                    local_path, bucket, s3_key,
+                    ExtraArgs={"Metadata": {"sha256": digest}},
+                    Config=get_transfer_config(),
+                )
+            elapsed = timer.seconds
+            client.put_object(
+                Bucket=bucket,
+                Key=f"{LATEST_PREFIX}{pointer_name}.json",
+                Body=json.dumps({"key": s3_key, "sha256": digest}).encode(),
+                ContentType="application/json",
+            )
+            rate = size / elapsed / MB if elapsed else float("inf")
+            print(f"✅ Uploaded {filename} → s3://{bucket}/{s3_key} "
+                  f"({size / MB:.2f} MB in {elapsed:.2f}s, {rate:.2f} MB/s)")
+            return {"file": filename, "key": s3_key, "bytes": size,
+                    "seconds": elapsed, "skipped": False}
+        except (ClientError, BotoCoreError, S3UploadFailedError) as e:
             print(f"❌ Attempt {attempt} failed: {e}")
             if attempt < MAX_RETRIES:
-                print(f"Retrying in {RETRY_DELAY} seconds...")
-                time.sleep(RETRY_DELAY)
+                delay = backoff_delay(attempt)
+                print(f"Retrying in {delay:.1f} seconds...")
+                time.sleep(delay)
             else:
                 raise RuntimeError(f"Failed to upload {filename} after {MAX_RETRIES} attempts")
 
-# ---------- Upload All CSVs ----------
-def upload_all():
-    ensure_bucket_exists(BUCKET_NAME)
-    ensure_versioning_enabled(BUCKET_NAME)
+# ---------- Collect Local Files ----------
+def local_uploads(fmt="csv"):
+    """(path, file_type, pointer_name) for every raw file to upload."""
+    uploads = []
+    if fmt == "parquet":
+        for file_type in ENTITIES:
+            paths = latest_parquet_files(file_type)
+            if not paths:
+                print(f"⚠️ No Parquet partition found for {file_type}")
+            for path in paths:
+                uploads.append((path, file_type, f"{file_type}/{os.path.basename(path)}"))
+        return uploads
 
     for file_type, path in CSV_PATHS.items():
         if os.path.exists(path):
-            upload_file(path, file_type)
+            uploads.append((path, file_type, file_type))
         else:
             print(f"⚠️ File not found: {path}")
+    return uploads
+
+# ---------- Upload All Files ----------
+def upload_all(client=None, force=False, workers=None, fmt="csv"):
+    """Upload every raw file concurrently; returns the per-file summaries.
+
+    fmt="parquet" uploads the part files of each entity's latest partition.
+    """
+    client = client or get_s3_client()
+    ensure_bucket_exists(bucket_name(), client)
+    ensure_versioning_enabled(bucket_name(), client)
+
+    with ThreadPoolExecutor(max_workers=workers or upload_workers()) as executor:
+        futures = [executor.submit(upload_file, path, file_type, client, force, pointer_name)
+                   for path, file_type, pointer_name in local_uploads(fmt)]
+        return [future.result() for future in futures]
 
 # ---------- Main ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Upload raw files to S3.")
+    parser.add_argument("--force", action="store_true",
+                        help="upload even when the content matches the latest upload")
+    parser.add_argument("--workers", type=int,
+                        help="files uploaded concurrently (default: upload_workers)")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="upload the CSVs or the latest Parquet partitions")
+    parser.add_argument("--audit", action="store_true",
+                        help="also write the per-stage spans to load_audit")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with instrumentation.run("upload", trace_memory=args.trace_memory) as run:
+        upload_all(force=args.force, workers=args.workers, fmt=args.format)
+    instrumentation.export(run, args)
+    if args.audit:
+        from src.etl.load_to_db import log_spans  # needs the database config
+
+        log_spans(run)
+
 if __name__ == "__main__":
-    upload_all()
+    cli()
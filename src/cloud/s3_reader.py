@@ -0,0 +1,274 @@
+"""
+Read the S3 raw zone directly, without staging files on local disk.
+
+Uploads land under `raw/year=YYYY/month=MM/day=DD/<type>/HHMMSS_<file>`.
+The latest partition holding a file type is found by walking the
+year/month/day prefixes newest first (delimiter listings, so the rest of
+the bucket is never listed), and within it the latest upload of each file
+name is used.
+
+Partitions merged by s3_compaction also hold a manifest, read with one GET.
+A day's uploads newer than its compaction still win. They are only
+listed while the day can receive uploads; a complete manifest needs no
+listing. A month compaction serves the days it merged, after any newer
+day partition.
+
+Objects are read as a stream of ranged GETs issued by a small thread pool.
+A bounded number of ranges is kept in flight ahead of the reader, so the
+download of the next ranges overlaps with parsing and database writes while
+memory stays at most `in_flight * part size`.
+"""
+import io
+import json
+import time
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as date_type
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from src import instrumentation
+from src.cloud.s3_handler import (
+    MAX_RETRIES, MB, aws_config, backoff_delay, bucket_name, get_s3_client
+)
+from src.raw_zone import S3_SCHEME
+
+RAW_PREFIX = "raw/"
+COMPACTED_PREFIX = "compacted/"
+
+# ---------- Download Settings ----------
+# Defaults of the aws download_part_mb / download_concurrency settings
+DOWNLOAD_PART_MB = 8
+DOWNLOAD_CONCURRENCY = 4  # ranges fetched at once
+RANGES_IN_FLIGHT_PER_WORKER = 2  # ranges buffered ahead of the reader, per worker
+
+# ---------- URIs ----------
+def s3_uri(key, bucket=None):
+    return f"{S3_SCHEME}{bucket or bucket_name()}/{key}"
+
+def parse_s3_uri(uri):
+    """(bucket, key) of an s3://bucket/key URI."""
+    if not uri.startswith(S3_SCHEME):
+        raise ValueError(f"Not an S3 URI: {uri}")
+    bucket, _, key = uri[len(S3_SCHEME):].partition("/")
+    return bucket, key
+
+# ---------- Listing ----------
+def _child_prefixes(client, bucket, prefix):
+    """Immediate sub-prefixes of `prefix` (one delimiter listing)."""
+    children = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix, Delimiter="/"):
+        children += [p["Prefix"] for p in page.get("CommonPrefixes", [])]
+    return children
+
+def _list_objects(client, bucket, prefix):
+    objects = []
+    paginator = client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        objects += page.get("Contents", [])
+    return objects
+
+def day_path(day):
+    """Partition path of a day, relative to the raw and compacted roots."""
+    return f"year={day.year}/month={day.month:02d}/day={day.day:02d}/"
+
+def month_path(day):
+    return f"year={day.year}/month={day.month:02d}/"
+
+def day_prefix(day):
+    return f"{RAW_PREFIX}{day_path(day)}"
+
+def _partition_children(client, bucket, path, level):
+    """`level=` sub-partitions of `path` under the raw and compacted roots, newest first."""
+    names = set()
+    for root in (RAW_PREFIX, COMPACTED_PREFIX):
+        names.update(prefix[len(root):] for prefix in _child_prefixes(client, bucket, root + path))
+    return sorted((name for name in names if name[len(path):].startswith(f"{level}=")),
+                  reverse=True)
+
+def partition_paths(client=None, bucket=None):
+    """Partition paths, newest first: each month's days, then the month itself
+    (where month compactions live). Lazily listed."""
+    client = client or get_s3_client()
+    bucket = bucket or bucket_name()
+    for year in _partition_children(client, bucket, "", "year"):
+        for month in _partition_children(client, bucket, year, "month"):
+            yield from _partition_children(client, bucket, month, "day")
+            yield month
+
+# ---------- Manifests ----------
+def manifest_key(path, file_type, fmt="csv"):
+    return f"{COMPACTED_PREFIX}{path}{file_type}/_manifest.{fmt}.json"
+
+def read_manifest(path, file_type, fmt="csv", client=None, bucket=None):
+    """The compaction manifest of a partition (with its "ETag"), or None."""
+    client = client or get_s3_client()
+    bucket = bucket or bucket_name()
+    try:
+        response = client.get_object(Bucket=bucket, Key=manifest_key(path, file_type, fmt))
+    except ClientError as e:
+        if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+            return None
+        raise
+    return {**json.loads(response["Body"].read()), "ETag": response["ETag"]}
+
+def latest_uploads(objects, fmt="csv"):
+    """The latest upload of each file name among listed raw objects, by name."""
+    latest = {}
+    for obj in objects:
+        upload_name = obj["Key"].rsplit("/", 1)[-1]
+        if not upload_name.endswith(f".{fmt}"):
+            continue
+        # HHMMSS_<file>: the same file uploaded later in the day replaces it
+        _, _, filename = upload_name.partition("_")
+        if filename not in latest or obj["Key"] > latest[filename]["Key"]:
+            latest[filename] = obj
+    return [latest[name] for name in sorted(latest)]
+
+def partition_objects(path, file_type, fmt="csv", client=None, bucket=None):
+    """Objects holding a file type's data in one partition; [] when none.
+
+    Uploads newer than the partition's compaction win over its manifest.
+    """
+    client = client or get_s3_client()
+    bucket = bucket or bucket_name()
+    manifest = read_manifest(path, file_type, fmt, client, bucket)
+    if "day=" in path and not (manifest and manifest["complete"]):
+        uploads = latest_uploads(
+            _list_objects(client, bucket, f"{RAW_PREFIX}{path}{file_type}/"), fmt
+        )
+        if uploads:
+            return uploads
+    return manifest["objects"] if manifest else []
+
+def latest_objects(file_type, fmt="csv", day=None, client=None, bucket=None):
+    """Objects of the latest upload of each file of a type, or the compacted
+    objects replacing them, as listed by S3 or the manifest.
+
+    Uses the newest partition holding `.<fmt>` data of the type, or the
+    partition of `day` (a date or YYYY-MM-DD) when given, falling back to
+    its month's compaction. Returns entries (Key, Size, ETag...) sorted by
+    file name; [] when none exist.
+    """
+    client = client or get_s3_client()
+    bucket = bucket or bucket_name()
+    if isinstance(day, str):
+        day = date_type.fromisoformat(day)
+    paths = [day_path(day), month_path(day)] if day else partition_paths(client, bucket)
+
+    for path in paths:
+        objects = partition_objects(path, file_type, fmt, client, bucket)
+        if objects:
+            return objects
+    return []
+
+def latest_uris(file_type, fmt="csv", day=None, client=None, bucket=None):
+    bucket = bucket or bucket_name()
+    return [s3_uri(obj["Key"], bucket)
+            for obj in latest_objects(file_type, fmt, day, client, bucket)]
+
+def fingerprint_objects(uris, client=None):
+    """(fingerprint, total size) of S3 objects from their ETags.
+
+    ETags change with the content, so this detects a changed source without
+    reading any data.
+    """
+    client = client or get_s3_client()
+    digest = hashlib.sha256()
+    size = 0
+    for uri in uris:
+        bucket, key = parse_s3_uri(uri)
+        head = client.head_object(Bucket=bucket, Key=key)
+        digest.update(f"{key}:{head['ETag']}\n".encode())
+        size += head["ContentLength"]
+    return "s3:" + digest.hexdigest(), size
+
+# ---------- Streaming Reads ----------
+class ObjectStream(io.RawIOBase):
+    """Sequential, read-only stream of one S3 object fetched in ranged GETs.
+
+    Ranges are requested on a thread pool in order and buffered up to
+    `in_flight` ahead of the reader. Every GET is pinned to the ETag seen at
+    open time, so an object replaced mid-read fails instead of mixing
+    versions.
+    """
+
+    def __init__(self, uri, client=None, part_size=None, workers=None, in_flight=None):
+        super().__init__()
+        self.uri = uri
+        self.bucket, self.key = parse_s3_uri(uri)
+        self.name = "/".join(self.key.split("/")[-2:])  # <type>/<upload name>
+        self.client = client or get_s3_client()
+        head = self.client.head_object(Bucket=self.bucket, Key=self.key)
+        self.size = head["ContentLength"]
+        self.etag = head["ETag"]
+        settings = aws_config()
+        self.part_size = part_size or settings.get("download_part_mb", DOWNLOAD_PART_MB) * MB
+        workers = workers or settings.get("download_concurrency", DOWNLOAD_CONCURRENCY)
+        self.in_flight = in_flight or RANGES_IN_FLIGHT_PER_WORKER * workers
+        self._executor = ThreadPoolExecutor(max_workers=workers)
+        self._pending = deque()
+        self._next_offset = 0
+        self._position = 0
+        self._buffer = memoryview(b"")
+        self._fill()
+
+    def _fill(self):
+        while len(self._pending) < self.in_flight and self._next_offset < self.size:
+            end = min(self._next_offset + self.part_size, self.size) - 1
+            self._pending.append(self._executor.submit(self._get_range, self._next_offset, end))
+            self._next_offset = end + 1
+
+    def _get_range(self, start, end):
+        for attempt in range(1, MAX_RETRIES + 1):
+            try:
+                with instrumentation.span("s3_get", self.name, bytes=end - start + 1):
+                    response = self.client.get_object(
+                        Bucket=self.bucket, Key=self.key,
+                        Range=f"bytes={start}-{end}", IfMatch=self.etag,
+                    )
+                    return response["Body"].read()
+            except (ClientError, BotoCoreError) as e:
+                code = getattr(e, "response", {}).get("Error", {}).get("Code")
+                if code == "PreconditionFailed" or attempt == MAX_RETRIES:
+                    raise RuntimeError(f"Failed to read {self.uri} "
+                                       f"bytes {start}-{end}: {e}") from e
+                time.sleep(backoff_delay(attempt))
+
+    def readable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def readinto(self, b):
+        if not self._buffer:
+            if not self._pending:
+                return 0  # EOF
+            self._buffer = memoryview(self._pending.popleft().result())
+            self._fill()
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        self._position += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._pending.clear()
+        super().close()
+
+def open_object(uri, client=None, **kwargs):
+    """Buffered binary file object streaming an S3 object (see ObjectStream)."""
+    return io.BufferedReader(ObjectStream(uri, client, **kwargs), buffer_size=MB)
+
+def read_object(uri, client=None, **kwargs):
+    """The whole object in memory, fetched with parallel ranged GETs.
+
+    For formats that need random access (Parquet footers).
+    """
+    with open_object(uri, client, **kwargs) as f:
+        return f.read()
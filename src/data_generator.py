@@ -1,8 +1,19 @@
 import os
 import csv
+import json
+import time
 import random
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
 from faker import Faker
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from src import schema
+from src.raw_zone import (
+    ENTITIES, FORMATS, PARQUET_COMPRESSION, STREAM_DIR, parquet_partition_dir,
+    require_pyarrow, stream_batch_path
+)
 
 # Initialize Faker and paths
 fake = Faker()
@@ -14,6 +25,10 @@ N_CUSTOMERS = 1000
 N_PRODUCTS = 500
 N_TRANSACTIONS = 5000
 
+CATEGORIES = ["Electronics", "Clothing", "Books", "Home", "Beauty"]
+SUPPLIERS = ["Supplier A", "Supplier B", "Supplier C"]
+PAYMENT_METHODS = ["Credit Card", "PayPal", "Bank Transfer"]
+
 # --- GENERATE CUSTOMERS ---
 def generate_customers(n=N_CUSTOMERS):
     customers = []
@@ -29,23 +44,20 @@ def generate_customers(n=N_CUSTOMERS):
 
 # --- GENERATE PRODUCTS ---
 def generate_products(n=N_PRODUCTS):
-    categories = ["Electronics", "Clothing", "Books", "Home", "Beauty"]
-    suppliers = ["Supplier A", "Supplier B", "Supplier C"]
     products = []
     for i in range(1, n + 1):
         products.append({
             "id": i,
             "name": fake.word().capitalize(),
-            "category": random.choice(categories),
+            "category": random.choice(CATEGORIES),
             "price": round(random.uniform(5, 500), 2),
-            "supplier": random.choice(suppliers)
+            "supplier": random.choice(SUPPLIERS)
         })
     return products
 
 # --- GENERATE TRANSACTIONS ---
 def generate_transactions(customers, products, n=N_TRANSACTIONS):
     transactions = []
-    payment_methods = ["Credit Card", "PayPal", "Bank Transfer"]
     for i in range(1, n + 1):
         product = random.choice(products)
         transactions.append({
@@ -54,7 +66,7 @@ def generate_transactions(customers, products, n=N_TRANSACTIONS):
             "product_id": product["id"],
             "quantity": random.randint(1, 5),
             "timestamp": fake.date_time_between(start_date="-1y", end_date="now").isoformat(),
-            "payment_method": random.choice(payment_methods)
+            "payment_method": random.choice(PAYMENT_METHODS)
         })
     return transactions
 
@@ -67,11 +79,368 @@ def save_csv(data, filename):
         writer.writerows(data)
     print(f"Saved {filename} ({len(data)} records)")
 
-if __name__ == "__main__":
-    customers = generate_customers()
-    products = generate_products()
-    transactions = generate_transactions(customers, products)
+# --- SAVE TO PARQUET ---
+def to_arrow(df, entity):
+    pa = require_pyarrow()
+    df = df.copy()
+    for col in schema.datetime_columns(entity):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], format="ISO8601")
+    return pa.Table.from_pandas(df, schema=schema.arrow_schema(entity), preserve_index=False)
+
+
+def save_parquet(data, entity, partition_date=None):
+    """Write records as one zstd Parquet file in the entity/date partition."""
+    import pyarrow.parquet as pq
+
+    out_dir = parquet_partition_dir(entity, partition_date or date.today().isoformat())
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, "part-00000.parquet")
+    pq.write_table(to_arrow(pd.DataFrame(data), entity), path, compression=PARQUET_COMPRESSION)
+    print(f"Saved {path} ({len(data)} records)")
+
+# ============================================================
+#                  SCALE-FACTOR MODE (vectorized)
+# ============================================================
+# Scale factor 1 produces N_CUSTOMERS / N_PRODUCTS / N_TRANSACTIONS rows.
+# Numeric and categorical columns come from NumPy; names, emails, countries
+# and product words are drawn from a Faker pool generated once per run.
+POOL_SIZE = 10_000
+BLOCK_SIZE = 100_000  # rows per RNG block
+DEFAULT_SEED = 42
+DEFAULT_END_DATE = "2025-10-01"  # pinned "now" so runs are reproducible
+
+_worker_pool = None
+
+
+def build_faker_pool(seed, size=POOL_SIZE):
+    """Pre-generate the Faker values sampled by the vectorized generators."""
+    pool_fake = Faker()
+    pool_fake.seed_instance(seed)
+    return {
+        "names": np.array([pool_fake.name() for _ in range(size)], dtype=object),
+        "emails": np.array([pool_fake.email() for _ in range(size)], dtype=object),
+        "countries": np.array([pool_fake.country() for _ in range(size)], dtype=object),
+        "words": np.array([pool_fake.word().capitalize() for _ in range(size)], dtype=object),
+    }
+
+
+def entity_counts(scale_factor):
+    return {
+        "customers": max(1, int(N_CUSTOMERS * scale_factor)),
+        "products": max(1, int(N_PRODUCTS * scale_factor)),
+        "transactions": max(1, int(N_TRANSACTIONS * scale_factor)),
+    }
+
+
+def block_rng(seed, entity, block):
+    """RNG for one block of rows.
+
+    Seeding per (seed, entity, block) rather than per shard or worker keeps the
+    output identical whatever the shard and worker counts are.
+    """
+    return np.random.default_rng([seed, ENTITIES.index(entity), block])
+
+
+def customers_block(start, stop, rng, pool, counts, end_date):
+    n = stop - start
+    days_back = rng.integers(0, 3 * 365 + 1, n)
+    registration = np.datetime64(end_date, "D") - days_back.astype("timedelta64[D]")
+    return pd.DataFrame({
+        "id": np.arange(start + 1, stop + 1),
+        "name": pool["names"][rng.integers(0, len(pool["names"]), n)],
+        "email": pool["emails"][rng.integers(0, len(pool["emails"]), n)],
+        "registration_date": registration,
+        "country": pool["countries"][rng.integers(0, len(pool["countries"]), n)],
+    })
+
+
+def products_block(start, stop, rng, pool, counts, end_date):
+    n = stop - start
+    return pd.DataFrame({
+        "id": np.arange(start + 1, stop + 1),
+        "name": pool["words"][rng.integers(0, len(pool["words"]), n)],
+        "category": pd.Categorical.from_codes(rng.integers(0, len(CATEGORIES), n), CATEGORIES),
+        "price": np.round(rng.uniform(5, 500, n), 2),
+        "supplier": pd.Categorical.from_codes(rng.integers(0, len(SUPPLIERS), n), SUPPLIERS),
+    })
+
+
+def transactions_block(start, stop, rng, pool, counts, end_date):
+    n = stop - start
+    micros_back = rng.integers(0, 365 * 24 * 3600 * 10**6, n)
+    timestamps = np.datetime64(end_date, "us") - micros_back.astype("timedelta64[us]")
+    return pd.DataFrame({
+        "id": np.arange(start + 1, stop + 1),
+        "customer_id": rng.integers(1, counts["customers"] + 1, n),
+        "product_id": rng.integers(1, counts["products"] + 1, n),
+        "quantity": rng.integers(1, 6, n),
+        "timestamp": timestamps,
+        "payment_method": pd.Categorical.from_codes(
+            rng.integers(0, len(PAYMENT_METHODS), n), PAYMENT_METHODS
+        ),
+    })
+
+
+BLOCK_BUILDERS = {
+    "customers": customers_block,
+    "products": products_block,
+    "transactions": transactions_block,
+}
+
+
+def _init_worker(pool):
+    global _worker_pool
+    _worker_pool = pool
+
+
+def _blocks(entity, first_block, last_block, counts, seed, end_date):
+    build = BLOCK_BUILDERS[entity]
+    for block in range(first_block, last_block):
+        start, stop = block * BLOCK_SIZE, min((block + 1) * BLOCK_SIZE, counts[entity])
+        yield block, build(start, stop, block_rng(seed, entity, block), _worker_pool, counts, end_date)
+
+
+def write_shard(entity, path, first_block, last_block, counts, seed, end_date, fmt="csv"):
+    """Generate blocks [first_block, last_block) of an entity into one file.
+
+    Parquet shards get one row group per block.
+    """
+    rows = 0
+    blocks = _blocks(entity, first_block, last_block, counts, seed, end_date)
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        with pq.ParquetWriter(path, schema.arrow_schema(entity), compression=PARQUET_COMPRESSION) as writer:
+            for _, df in blocks:
+                writer.write_table(to_arrow(df, entity))
+                rows += len(df)
+        return path, rows
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for block, df in blocks:
+            for col, unit in schema.datetime_columns(entity).items():
+                df[col] = np.datetime_as_string(df[col].to_numpy(f"datetime64[{unit}]"), unit=unit)
+            df.to_csv(f, header=(block == first_block), index=False)
+            rows += len(df)
+    return path, rows
 
-    save_csv(customers, "customers.csv")
-    save_csv(products, "products.csv")
-    save_csv(transactions, "transactions.csv")
+
+def shard_paths(entity, n_shards, out_dir, fmt="csv", partition_date=None):
+    if fmt == "parquet":
+        partition = parquet_partition_dir(entity, partition_date, root=os.path.join(out_dir, "parquet"))
+        os.makedirs(partition, exist_ok=True)
+        return [os.path.join(partition, f"part-{i:05d}.parquet") for i in range(n_shards)]
+    if n_shards == 1:
+        return [os.path.join(out_dir, f"{entity}.csv")]
+    return [os.path.join(out_dir, f"{entity}_{i:05d}.csv") for i in range(n_shards)]
+
+
+def generate_scaled(scale_factor, seed=DEFAULT_SEED, shards=1, workers=None,
+                    end_date=DEFAULT_END_DATE, out_dir=RAW_DATA_DIR, fmt="csv"):
+    """Write customers/products/transactions for a scale factor.
+
+    Each entity is split into up to `shards` files (`<entity>.csv` when 1,
+    `<entity>_00000.csv`... otherwise) written in parallel by `workers`
+    processes. The same scale factor, seed and end date always give the same
+    rows, independently of shards and workers. With fmt="parquet" the shards
+    are `parquet/<entity>/date=<end_date>/part-NNNNN.parquet`.
+    """
+    if fmt == "parquet":
+        require_pyarrow()
+    os.makedirs(out_dir, exist_ok=True)
+    counts = entity_counts(scale_factor)
+    pool = build_faker_pool(seed)
+
+    tasks = []
+    for entity in ENTITIES:
+        n_blocks = -(-counts[entity] // BLOCK_SIZE)
+        n_shards = min(shards, n_blocks)
+        bounds = np.linspace(0, n_blocks, n_shards + 1).astype(int)
+        paths = shard_paths(entity, n_shards, out_dir, fmt, end_date)
+        for path, first, last in zip(paths, bounds, bounds[1:]):
+            tasks.append((entity, path, first, last, counts, seed, end_date, fmt))
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(pool,)) as executor:
+        futures = [executor.submit(write_shard, *task) for task in tasks]
+        for future in futures:
+            path, rows = future.result()
+            print(f"Saved {os.path.relpath(path, out_dir)} ({rows} records)")
+    return counts
+
+
+# ============================================================
+#                  STREAM MODE (micro-batches)
+# ============================================================
+# Transactions are emitted continuously at a target rate, one micro-batch
+# CSV per tick (see raw_zone.stream_batch_path), for the stream loader to
+# tail. A batch is written under a temporary name and renamed into place, so
+# readers never see it half-written. Customer and product ids follow a
+# bounded Zipf law over the keys of a scale factor: a few hot keys receive
+# most of the events. The next sequence number and id are kept in a state
+# file, so a restarted generator continues where it stopped.
+DEFAULT_RATE = 1000  # events per second
+DEFAULT_TICK = 0.5  # seconds per micro-batch
+DEFAULT_ZIPF = 1.1  # skew exponent; 0 is uniform
+STREAM_STATE_FILE = "_state.json"
+STREAM_REPORT_SECONDS = 5
+
+
+def zipf_sampler(n, s, rng):
+    """Return a function drawing `size` ids in 1..n with P(rank k) ~ 1 / k**s.
+
+    Ranks map to ids through a fixed shuffle, so the hot keys are spread
+    over the id range instead of being the lowest ids.
+    """
+    cdf = np.cumsum(1.0 / np.arange(1, n + 1) ** s)
+    cdf /= cdf[-1]
+    ids = rng.permutation(n) + 1
+
+    def draw(size, batch_rng):
+        return ids[np.searchsorted(cdf, batch_rng.random(size), side="right")]
+    return draw
+
+
+def stream_block(start_id, n, window_start, window_end, rng, customers, products):
+    """`n` transactions with ids from `start_id`, timestamped within the window."""
+    span_us = max(1, int((window_end - window_start).total_seconds() * 10**6))
+    offsets = np.sort(rng.integers(0, span_us, n)).astype("timedelta64[us]")
+    return pd.DataFrame({
+        "id": np.arange(start_id, start_id + n),
+        "customer_id": customers(n, rng),
+        "product_id": products(n, rng),
+        "quantity": rng.integers(1, 6, n),
+        "timestamp": np.datetime_as_string(np.datetime64(window_start, "us") + offsets, unit="us"),
+        "payment_method": pd.Categorical.from_codes(
+            rng.integers(0, len(PAYMENT_METHODS), n), PAYMENT_METHODS
+        ),
+    })
+
+
+def _stream_state(out_dir, scale_factor):
+    path = os.path.join(out_dir, STREAM_STATE_FILE)
+    if os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    # New ids follow the batch-generated transactions of the scale factor
+    return {"seq": 0, "next_id": entity_counts(scale_factor)["transactions"] + 1}
+
+
+def _save_stream_state(out_dir, state):
+    path = os.path.join(out_dir, STREAM_STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f)
+    os.replace(path + ".tmp", path)
+
+
+def generate_stream(rate=DEFAULT_RATE, duration=None, max_events=None, tick=DEFAULT_TICK,
+                    zipf=DEFAULT_ZIPF, scale_factor=1, seed=DEFAULT_SEED, out_dir=STREAM_DIR):
+    """Emit transactions at `rate` events/sec as micro-batch files until
+    `duration` seconds or `max_events` events (or Ctrl-C).
+
+    Customer and product ids are drawn from the keys a scale-factor
+    generation creates, so the stream loads on top of it.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    counts = entity_counts(scale_factor)
+    key_rng = np.random.default_rng([seed, ENTITIES.index("transactions")])
+    customers = zipf_sampler(counts["customers"], zipf, key_rng)
+    products = zipf_sampler(counts["products"], zipf, key_rng)
+    state = _stream_state(out_dir, scale_factor)
+
+    started = time.monotonic()
+    window_start = datetime.now()
+    emitted = 0
+    next_report = started + STREAM_REPORT_SECONDS
+    try:
+        while (duration is None or time.monotonic() - started < duration) and \
+                (max_events is None or emitted < max_events):
+            ticks = int((time.monotonic() - started) // tick) + 1
+            due = started + ticks * tick
+            time.sleep(max(0.0, due - time.monotonic()))
+            n = int(rate * ticks * tick) - emitted
+            if max_events is not None:
+                n = min(n, max_events - emitted)
+            window_end = datetime.now()
+            if n <= 0:
+                continue
+
+            state["seq"] += 1
+            rng = np.random.default_rng([seed, ENTITIES.index("transactions"), state["seq"]])
+            df = stream_block(state["next_id"], n, window_start, window_end, rng,
+                              customers, products)
+            path = stream_batch_path(state["seq"], out_dir)
+            df.to_csv(path + ".tmp", index=False)
+            os.replace(path + ".tmp", path)
+            state["next_id"] += n
+            _save_stream_state(out_dir, state)
+            emitted += n
+            window_start = window_end
+
+            if time.monotonic() >= next_report:
+                elapsed = time.monotonic() - started
+                print(f"📤 {emitted} events in {elapsed:.0f}s ({emitted / elapsed:.0f}/s), "
+                      f"last batch {os.path.basename(path)}")
+                next_report += STREAM_REPORT_SECONDS
+    except KeyboardInterrupt:
+        pass
+    elapsed = time.monotonic() - started
+    print(f"📤 Streamed {emitted} events in {elapsed:.1f}s ({emitted / elapsed:.0f}/s) "
+          f"to {out_dir}")
+    return emitted
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Generate synthetic ShopFlow data.")
+    parser.add_argument("--scale-factor", type=float, default=None,
+                        help="vectorized mode: SF x (1000 customers, 500 products, 5000 transactions)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--shards", type=int, default=1, help="files per entity")
+    parser.add_argument("--workers", type=int, default=None, help="generator processes")
+    parser.add_argument("--end-date", default=DEFAULT_END_DATE,
+                        help="latest generated date (YYYY-MM-DD)")
+    parser.add_argument("--out-dir", default=None,
+                        help=f"output directory (default: {RAW_DATA_DIR}, {STREAM_DIR} with --stream)")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="parquet writes zstd files partitioned by entity and date")
+    stream = parser.add_argument_group("stream mode")
+    stream.add_argument("--stream", action="store_true",
+                        help="emit transactions continuously as micro-batch CSVs")
+    stream.add_argument("--rate", type=float, default=DEFAULT_RATE, help="events per second")
+    stream.add_argument("--tick", type=float, default=DEFAULT_TICK,
+                        help="seconds per micro-batch file")
+    stream.add_argument("--zipf", type=float, default=DEFAULT_ZIPF,
+                        help="customer/product popularity skew (0 = uniform)")
+    stream.add_argument("--duration", type=float, default=None,
+                        help="stop after N seconds (default: until Ctrl-C)")
+    stream.add_argument("--max-events", type=int, default=None, help="stop after N events")
+    args = parser.parse_args(argv)
+
+    if args.stream:
+        if args.format != "csv":
+            parser.error("--stream writes CSV micro-batches")
+        generate_stream(rate=args.rate, duration=args.duration, max_events=args.max_events,
+                        tick=args.tick, zipf=args.zipf, scale_factor=args.scale_factor or 1,
+                        seed=args.seed, out_dir=args.out_dir or STREAM_DIR)
+    elif args.scale_factor is not None:
+        generate_scaled(args.scale_factor, seed=args.seed, shards=args.shards,
+                        workers=args.workers, end_date=args.end_date,
+                        out_dir=args.out_dir or RAW_DATA_DIR, fmt=args.format)
+    else:
+        customers = generate_customers()
+        products = generate_products()
+        transactions = generate_transactions(customers, products)
+
+        if args.format == "parquet":
+            save_parquet(customers, "customers")
+            save_parquet(products, "products")
+            save_parquet(transactions, "transactions")
+        else:
+            save_csv(customers, "customers.csv")
+            save_csv(products, "products.csv")
+            save_csv(transactions, "transactions.csv")
+
+
+if __name__ == "__main__":
+    cli()
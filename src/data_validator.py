@@ -1,30 +1,55 @@
 import os
 import re
+import argparse
 import pandas as pd
 import logging
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import lru_cache
+from src import instrumentation, schema
+from src.raw_zone import ENTITIES, FORMATS, iter_parquet_batches, latest_parquet_files
 
 # --- Setup Directories ---
 DATA_DIR = "data/raw"
 LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
 
-# --- Configure Logging ---
-logging.basicConfig(
-    filename=os.path.join(LOG_DIR, "validation.log"),
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# --- Configure Logging (on first message) ---
+@lru_cache(maxsize=None)
+def setup_logging():
+    os.makedirs(LOG_DIR, exist_ok=True)
+    logging.basicConfig(
+        filename=os.path.join(LOG_DIR, "validation.log"),
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+# --- Patterns ---
+EMAIL_PATTERN = r"^[\w\.-]+@[\w\.-]+\.\w+$"
+
+# Canonical ISO dates/datetimes. Strings of this shape are valid for
+# datetime.fromisoformat exactly when pandas can parse them, so only the
+# remaining values need the per-value check.
+ISO_DATE_PATTERN = schema.ISO_DATE_PATTERN
+
+# The null report counts what pandas reads as missing by default ("NA",
+# "None", "null"... as well as empty fields), as it always has. The loader
+# only treats empty fields as missing (schema.CSV_NA_OPTIONS).
+NA_OPTIONS = schema.DEFAULT_NA_OPTIONS
+
+# Chunks in flight per pool worker when validating in chunks
+MAX_PENDING_PER_WORKER = 2
 
 # --- Helper Functions ---
 def log(msg):
+    setup_logging()
     print(msg)
     logging.info(msg)
 
 def validate_email(email):
     """Check if an email address is valid."""
-    pattern = r"^[\w\.-]+@[\w\.-]+\.\w+$"
-    return re.match(pattern, str(email)) is not None
+    return re.match(EMAIL_PATTERN, str(email)) is not None
 
 def validate_date(date_str):
     """Check if date is in valid ISO format (YYYY-MM-DD or with time)."""
@@ -34,44 +59,191 @@ def validate_date(date_str):
     except ValueError:
         return False
 
-# --- Validation Functions ---
-def check_nulls(df, name):
-    null_counts = df.isnull().sum()
+# --- Vectorized Checks ---
+def invalid_email_mask(series):
+    """Boolean mask of values failing validate_email, computed column-wise."""
+    return ~series.astype(str).str.match(EMAIL_PATTERN)
+
+def invalid_date_mask(series):
+    """Boolean mask of values failing validate_date, computed column-wise."""
+    values = series.astype(str)
+    canonical = values.str.fullmatch(ISO_DATE_PATTERN)
+    parsed = pd.to_datetime(values.where(canonical), format="ISO8601", errors="coerce")
+    valid = (canonical & parsed.notna()).to_numpy(dtype=bool)
+
+    # Non-canonical shapes (offsets, odd precision, garbage) get the exact check
+    rest = values[~valid]
+    if not rest.empty:
+        verdicts = {v: validate_date(v) for v in rest.unique()}
+        valid[~valid] = rest.map(verdicts).to_numpy(dtype=bool)
+    return pd.Series(~valid, index=series.index)
+
+def date_columns(df):
+    return [col for col in df.columns if "date" in col or "timestamp" in col]
+
+# --- Reporting ---
+def report_nulls(null_counts, name):
     if null_counts.any():
         log(f"[{name}] ⚠️ Null values found:\n{null_counts[null_counts > 0]}")
     else:
         log(f"[{name}] ✅ No null values detected.")
 
+def report_invalid_emails(count, name):
+    if count:
+        log(f"[{name}] ⚠️ Invalid email formats found: {count}")
+    else:
+        log(f"[{name}] ✅ All email formats valid.")
+
+def report_non_positive_prices(count, name):
+    if count:
+        log(f"[{name}] ⚠️ Non-positive prices found: {count}")
+    else:
+        log(f"[{name}] ✅ All prices are positive.")
+
+def report_invalid_dates(counts, name):
+    for col, count in counts.items():
+        if count:
+            log(f"[{name}] ⚠️ Invalid date formats in column '{col}': {count}")
+        else:
+            log(f"[{name}] ✅ All dates valid in '{col}'.")
+
+# --- Validation Functions ---
+def check_nulls(df, name):
+    with instrumentation.span("validate_nulls", name, rows=len(df)):
+        null_counts = df.isnull().sum()
+    report_nulls(null_counts, name)
+
 def check_email_format(df, name):
     if "email" in df.columns:
-        invalid_emails = df[~df["email"].apply(validate_email)]
-        if not invalid_emails.empty:
-            log(f"[{name}] ⚠️ Invalid email formats found: {len(invalid_emails)}")
-        else:
-            log(f"[{name}] ✅ All email formats valid.")
+        with instrumentation.span("validate_emails", name, rows=len(df)):
+            count = int(invalid_email_mask(df["email"]).sum())
+        report_invalid_emails(count, name)
 
 def check_positive_prices(df, name):
     if "price" in df.columns:
-        invalid_prices = df[df["price"] <= 0]
-        if not invalid_prices.empty:
-            log(f"[{name}] ⚠️ Non-positive prices found: {len(invalid_prices)}")
-        else:
-            log(f"[{name}] ✅ All prices are positive.")
+        with instrumentation.span("validate_prices", name, rows=len(df)):
+            count = int((df["price"] <= 0).sum())
+        report_non_positive_prices(count, name)
 
 def check_date_formats(df, name):
-    date_columns = [col for col in df.columns if "date" in col or "timestamp" in col]
-    for col in date_columns:
-        invalid_dates = df[~df[col].apply(validate_date)]
-        if not invalid_dates.empty:
-            log(f"[{name}] ⚠️ Invalid date formats in column '{col}': {len(invalid_dates)}")
-        else:
-            log(f"[{name}] ✅ All dates valid in '{col}'.")
+    with instrumentation.span("validate_dates", name, rows=len(df)):
+        counts = {col: int(invalid_date_mask(df[col]).sum()) for col in date_columns(df)}
+    report_invalid_dates(counts, name)
+
+# --- Chunk Statistics ---
+def compute_stats(df):
+    """Counts behind every check for one DataFrame (a file or a chunk of one).
+
+    Also returns the seconds spent per check and the peak RSS of the process
+    that ran them, since this may run in a pool worker.
+    """
+    timings = {}
+
+    def timed(check, compute):
+        started = time.perf_counter()
+        value = compute()
+        timings[check] = time.perf_counter() - started
+        return value
+
+    return {
+        "records": len(df),
+        "nulls": timed("nulls", lambda: df.isnull().sum()),
+        "invalid_emails": (timed("emails", lambda: int(invalid_email_mask(df["email"]).sum()))
+                           if "email" in df.columns else None),
+        "non_positive_prices": (timed("prices", lambda: int((df["price"] <= 0).sum()))
+                                if "price" in df.columns else None),
+        "invalid_dates": timed("dates", lambda: {col: int(invalid_date_mask(df[col]).sum())
+                                                 for col in date_columns(df)}),
+        "timings": timings,
+        "peak_memory_bytes": instrumentation.peak_rss_bytes(),
+    }
+
+def merge_stats(a, b):
+    """Combine the stats of two chunks of the same file."""
+    if a is None:
+        return b
+    merged = {
+        "records": a["records"] + b["records"],
+        "nulls": a["nulls"].add(b["nulls"], fill_value=0).astype(int),
+        "invalid_dates": {col: a["invalid_dates"].get(col, 0) + b["invalid_dates"].get(col, 0)
+                          for col in {**a["invalid_dates"], **b["invalid_dates"]}},
+    }
+    for key in ("invalid_emails", "non_positive_prices"):
+        counts = [s[key] for s in (a, b) if s[key] is not None]
+        merged[key] = sum(counts) if counts else None
+    merged["timings"] = {check: a["timings"].get(check, 0) + b["timings"].get(check, 0)
+                         for check in {**a["timings"], **b["timings"]}}
+    merged["peak_memory_bytes"] = max(a["peak_memory_bytes"], b["peak_memory_bytes"])
+    return merged
+
+def record_stats(stats, name):
+    """Record the per-check timings of merged stats as validate_<check> spans."""
+    for check, seconds in stats["timings"].items():
+        instrumentation.record(f"validate_{check}", seconds, name, rows=stats["records"],
+                               peak_memory_bytes=stats["peak_memory_bytes"])
+
+def report_stats(stats, name):
+    log(f"\n🔍 Validating {name} ({stats['records']} records)")
+    report_nulls(stats["nulls"], name)
+    if stats["invalid_emails"] is not None:
+        report_invalid_emails(stats["invalid_emails"], name)
+    if stats["non_positive_prices"] is not None:
+        report_non_positive_prices(stats["non_positive_prices"], name)
+    report_invalid_dates(stats["invalid_dates"], name)
+
+def read_frames(file_path, chunk_size=None, engine=None):
+    """Yield a CSV or Parquet file whole, or in chunks of `chunk_size` rows.
+
+    Columns get the compact dtypes of the file's entity (see src.schema),
+    except dates, which stay as read so their format can be checked.
+    """
+    entity = schema.entity_for_path(file_path)
+    if file_path.endswith(".parquet"):
+        for df in iter_parquet_batches([file_path], chunk_size):
+            yield schema.compact(df, entity, parse_dates=False) if entity else df
+    elif chunk_size:
+        yield from schema.read_csv(file_path, entity, chunk_size, parse_dates=False,
+                                   na_options=NA_OPTIONS)
+    else:
+        yield schema.read_csv(file_path, entity, parse_dates=False, engine=engine,
+                              na_options=NA_OPTIONS)
+
+def file_stats(file_path, engine=None):
+    started = time.perf_counter()
+    df = next(read_frames(file_path, engine=engine))
+    read_seconds = time.perf_counter() - started
+    stats = compute_stats(df)
+    stats["timings"]["read"] = read_seconds
+    return stats
+
+def timed_frames(file_path, chunk_size=None, engine=None):
+    """read_frames, recording each read as a validate_read span."""
+    return instrumentation.timed_chunks(read_frames(file_path, chunk_size, engine),
+                                        "validate_read", display_name(file_path))
+
+def display_name(file_path):
+    return os.path.relpath(file_path, DATA_DIR)
+
+def list_files(fmt="csv"):
+    if fmt == "parquet":
+        return [path for entity in ENTITIES for path in latest_parquet_files(entity)]
+    return [os.path.join(DATA_DIR, filename)
+            for filename in sorted(os.listdir(DATA_DIR))
+            if filename.endswith(".csv")]
 
 # --- Main Validation Process ---
-def validate_file(file_path):
-    name = os.path.basename(file_path)
+def validate_file(file_path, chunk_size=None, engine=None):
+    name = display_name(file_path)
     try:
-        df = pd.read_csv(file_path)
+        if chunk_size:
+            stats = None
+            for chunk in timed_frames(file_path, chunk_size):
+                stats = merge_stats(stats, compute_stats(chunk))
+            stats = stats or file_stats(file_path)  # no chunks: 0 records
+            record_stats(stats, name)
+            report_stats(stats, name)
+            return
+        df = next(timed_frames(file_path, engine=engine))
         log(f"\n🔍 Validating {name} ({len(df)} records)")
         check_nulls(df, name)
         check_email_format(df, name)
@@ -80,14 +252,93 @@ def validate_file(file_path):
     except Exception as e:
         log(f"[{name}] ❌ Validation failed: {e}")
 
-def main():
+def validate_files(file_paths, workers=None, chunk_size=None, engine=None):
+    """Validate several files in a process pool, logging results in file order.
+
+    Without `chunk_size` each file is one task. With it, chunks of every file
+    are read here and fanned out to the workers, with a bounded number in
+    flight so memory stays flat for very large files.
+    """
+    results = {path: None for path in file_paths}
+    errors = {}
+
+    workers = workers or os.cpu_count() or 1
+    max_pending = MAX_PENDING_PER_WORKER * workers
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def drain(limit):
+            while len(pending) > limit:
+                path, future = pending.popleft()
+                try:
+                    results[path] = merge_stats(results[path], future.result())
+                except Exception as e:
+                    errors.setdefault(path, e)
+
+        for path in file_paths:
+            try:
+                if chunk_size:
+                    for chunk in timed_frames(path, chunk_size):
+                        pending.append((path, pool.submit(compute_stats, chunk)))
+                        drain(max_pending)
+                else:
+                    pending.append((path, pool.submit(file_stats, path, engine)))
+            except Exception as e:
+                errors.setdefault(path, e)
+        drain(0)
+
+    # Files that yielded no chunks (header-only Parquet) report 0 records
+    for path in file_paths:
+        if results[path] is None and path not in errors:
+            try:
+                results[path] = file_stats(path, engine)
+            except Exception as e:
+                errors[path] = e
+
+    for path in file_paths:
+        name = display_name(path)
+        if path in errors:
+            log(f"[{name}] ❌ Validation failed: {errors[path]}")
+        else:
+            record_stats(results[path], name)
+            report_stats(results[path], name)
+
+def main(workers=None, chunk_size=None, fmt="csv", engine=None):
     log("=== DATA VALIDATION STARTED ===")
 
-    for filename in os.listdir(DATA_DIR):
-        if filename.endswith(".csv"):
-            validate_file(os.path.join(DATA_DIR, filename))
+    file_paths = list_files(fmt)
+    with instrumentation.run("validate"):
+        if workers == 1:
+            for file_path in file_paths:
+                validate_file(file_path, chunk_size, engine)
+        else:
+            validate_files(file_paths, workers, chunk_size, engine)
 
     log("=== DATA VALIDATION COMPLETED ===\n")
 
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Validate raw data files.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="validation processes (default: CPU count, 1 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="validate each file in chunks of N rows")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="validate the CSVs or the latest Parquet partitions")
+    parser.add_argument("--csv-engine", choices=schema.CSV_ENGINES, default="c",
+                        help="CSV parser for whole-file reads (pyarrow is several times faster)")
+    parser.add_argument("--audit", action="store_true",
+                        help="also write the per-check spans to load_audit")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with instrumentation.run("validate", trace_memory=args.trace_memory) as run:
+        main(workers=args.workers, chunk_size=args.chunk_size, fmt=args.format,
+             engine=args.csv_engine)
+    instrumentation.export(run, args)
+    if args.audit:
+        from src.etl.load_to_db import log_spans  # needs the database config
+
+        log_spans(run)
+
 if __name__ == "__main__":
-    main()
+    cli()
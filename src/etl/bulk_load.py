@@ -0,0 +1,181 @@
+# src/etl/bulk_load.py
+"""
+Bulk initial loads with deferred index and foreign key builds.
+
+A first backfill into the schema created by db_setup maintains every
+secondary index and checks every foreign key row by row. When all the
+target tables are empty, a bulk load instead:
+
+  1. drops the secondary indexes of the loaded and rollup tables and the
+     foreign keys between the loaded tables, recording their definitions
+     in bulk_load_deferred (in the same transaction);
+  2. loads without per-chunk rollup maintenance;
+  3. rebuilds the rollups in one pass, recreates every index (optionally
+     CONCURRENTLY) and re-adds the foreign keys NOT VALID, then validates
+     each in a single scan.
+
+Primary keys and unique constraints stay: they are the arbiters of the
+loader's ON CONFLICT upserts. Rows with unknown keys are quarantined by
+the loader, so the final validation only fails if data was written
+around it; the constraint is then left NOT VALID (still enforced for new
+rows) and reported.
+
+The recorded definitions survive a crash: restore() runs before every load
+and finishes an interrupted bulk load's rebuild.
+"""
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from src.etl import rollups
+from src.instrumentation import span
+from src.scripts.db_setup import PARTITION_KEYS, get_engine, partitioned
+
+DEFERRED_TABLE = "bulk_load_deferred"
+
+# Tables that must be empty for a bulk load, and whose indexes / foreign keys are deferred
+TARGET_TABLES = ["customers", "products", "transactions", "transaction_items"]
+ROLLUP_TABLES = [table.name for table in rollups.ROLLUP_TABLES]
+
+# Deferred objects are rebuilt in this order
+KINDS = ("index", "foreign_key")
+
+
+def create_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {DEFERRED_TABLE} (
+            name TEXT PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            definition TEXT NOT NULL,
+            deferred_at TIMESTAMP DEFAULT NOW()
+        );
+    """))
+
+
+# ---------- Catalog ----------
+def secondary_indexes(conn, tables):
+    """(name, table, CREATE INDEX statement) of the non-unique indexes of
+    `tables` (partition-level copies of partitioned indexes excluded)."""
+    return conn.execute(text("""
+        SELECT ic.relname, tc.relname, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        JOIN pg_class ic ON ic.oid = i.indexrelid
+        JOIN pg_class tc ON tc.oid = i.indrelid
+        WHERE tc.relname = ANY(:tables)
+          AND tc.relnamespace = 'public'::regnamespace
+          AND NOT i.indisunique AND NOT i.indisprimary
+        ORDER BY tc.relname, ic.relname
+    """), {"tables": tables}).fetchall()
+
+
+def foreign_keys(conn, tables):
+    """(name, table, constraint definition) of the foreign keys of `tables`."""
+    return conn.execute(text("""
+        SELECT c.conname, tc.relname, pg_get_constraintdef(c.oid)
+        FROM pg_constraint c
+        JOIN pg_class tc ON tc.oid = c.conrelid
+        WHERE tc.relname = ANY(:tables)
+          AND tc.relnamespace = 'public'::regnamespace
+          AND c.contype = 'f' AND c.conparentid = 0
+        ORDER BY tc.relname, c.conname
+    """), {"tables": tables}).fetchall()
+
+
+def is_empty(conn, tables):
+    return not conn.execute(text(
+        "SELECT " + " OR ".join(f"EXISTS (SELECT 1 FROM {table})" for table in tables)
+    )).scalar()
+
+
+# ---------- Defer ----------
+def begin():
+    """Defer indexes and foreign keys if every target table is empty.
+
+    Returns False (and changes nothing) when a table already holds rows, in
+    which case the load should take the normal path.
+    """
+    with get_engine().begin() as conn:
+        create_table(conn)
+        # Writers wait until the indexes are gone; the emptiness check holds
+        conn.execute(text(f"LOCK TABLE {', '.join(TARGET_TABLES)} IN SHARE MODE"))
+        if not is_empty(conn, TARGET_TABLES + ROLLUP_TABLES):
+            return False
+        with span("bulk_defer"):
+            deferred = [("index", *row)
+                        for row in secondary_indexes(conn, TARGET_TABLES + ROLLUP_TABLES)]
+            deferred += [("foreign_key", *row) for row in foreign_keys(conn, TARGET_TABLES)]
+            for kind, name, table, definition in deferred:
+                conn.execute(
+                    text(f"INSERT INTO {DEFERRED_TABLE} (name, table_name, kind, definition) "
+                         "VALUES (:name, :table, :kind, :definition)"),
+                    {"name": name, "table": table, "kind": kind, "definition": definition},
+                )
+                if kind == "index":
+                    conn.execute(text(f'DROP INDEX "{name}"'))
+                else:
+                    conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+    counts = {kind: sum(1 for d in deferred if d[0] == kind) for kind in KINDS}
+    print(f"🏗️ Bulk load: deferred {counts['index']} indexes and "
+          f"{counts['foreign_key']} foreign keys")
+    return True
+
+
+# ---------- Rebuild ----------
+def _build_index(name, table, definition, concurrently):
+    # Partitioned parents cannot be indexed concurrently
+    if concurrently and not (partitioned() and table in PARTITION_KEYS):
+        definition = definition.replace("CREATE INDEX", "CREATE INDEX CONCURRENTLY", 1)
+    with span("index_build", name):
+        with get_engine().connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f'DROP INDEX IF EXISTS "{name}"'))  # e.g. an INVALID leftover
+            conn.execute(text(definition))
+            conn.execute(text(f"DELETE FROM {DEFERRED_TABLE} WHERE name = :name"),
+                         {"name": name})
+
+
+def _add_foreign_key(name, table, definition):
+    """Add a foreign key NOT VALID, then validate it in one scan. Returns
+    False when existing rows violate it."""
+    # Partitioned tables do not support NOT VALID; they validate on ADD
+    partitioned_table = partitioned() and table in PARTITION_KEYS
+    try:
+        with span("fk_validate", name):
+            with get_engine().begin() as conn:
+                conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{name}"'))
+                conn.execute(text(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}'
+                                  + ("" if partitioned_table else " NOT VALID")))
+                conn.execute(text(f"DELETE FROM {DEFERRED_TABLE} WHERE name = :name"),
+                             {"name": name})
+            if not partitioned_table:
+                with get_engine().begin() as conn:
+                    conn.execute(text(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{name}"'))
+    except DBAPIError as e:
+        state = "still deferred" if partitioned_table else "left NOT VALID"
+        print(f"⚠️ {table}.{name} {state}, existing rows violate it: "
+              f"{str(e.orig).splitlines()[0]}")
+        return False
+    return True
+
+
+def restore(concurrently=False):
+    """Rebuild every recorded deferred index and foreign key."""
+    with get_engine().begin() as conn:
+        create_table(conn)
+        pending = conn.execute(text(
+            f"SELECT kind, name, table_name, definition FROM {DEFERRED_TABLE}"
+        )).fetchall()
+    if not pending:
+        return
+    for kind, name, table, definition in sorted(pending, key=lambda p: KINDS.index(p[0])):
+        if kind == "index":
+            _build_index(name, table, definition, concurrently)
+        else:
+            _add_foreign_key(name, table, definition)
+    print(f"🏗️ Rebuilt {len(pending)} deferred indexes and foreign keys")
+
+
+def finish(concurrently=False):
+    """Complete a bulk load: rebuild the rollups, then the deferred objects."""
+    with span("rollups", "rebuild"), get_engine().begin() as conn:
+        rollups.rebuild_rollups(conn)
+    restore(concurrently)
@@ -0,0 +1,125 @@
+# src/etl/dimensions.py
+"""
+Natural key -> surrogate id resolution for the small lookup tables
+(suppliers, payment_methods).
+
+Unknown keys are inserted and their ids taken from RETURNING; known keys are
+served from a bounded in-process LRU cache, so a load never re-reads a whole
+dimension table. Ids resolved inside a transaction that later rolls back
+would be stale, so callers clear the caches when a load step fails, and
+a reset or snapshot restore clears them once the tables are replaced.
+"""
+import threading
+from collections import OrderedDict
+
+from sqlalchemy import text
+
+DIMENSION_CACHE_SIZE = 10_000  # keys per table
+
+# Dimension table -> natural key column
+DIMENSION_KEYS = {
+    "suppliers": "name",
+    "payment_methods": "method",
+}
+
+
+class KeyCache:
+    """Thread-safe LRU map of natural key -> id with a fixed capacity."""
+
+    def __init__(self, max_size=DIMENSION_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    found[key] = self._entries[key]
+        return found
+
+    def put_many(self, mapping):
+        with self._lock:
+            for key, value in mapping.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_caches = {table: KeyCache() for table in DIMENSION_KEYS}
+
+
+def clear_caches():
+    for cache in _caches.values():
+        cache.clear()
+
+
+def resolve_keys(conn, table, keys):
+    """Map each natural key to its id, inserting the ones not stored yet.
+
+    Runs inside `conn`'s transaction. Cache misses cost one statement that
+    inserts new keys (ids via RETURNING) and reads existing ones by key.
+    """
+    column = DIMENSION_KEYS[table]
+    cache = _caches[table]
+    keys = list(dict.fromkeys(keys))
+    resolved = cache.get_many(keys)
+    missing = [key for key in keys if key not in resolved]
+    if not missing:
+        return resolved
+
+    params = {"keys": missing}
+    fetched = dict(conn.execute(
+        text(f"""
+            WITH inserted AS (
+                INSERT INTO {table} ({column})
+                SELECT unnest(CAST(:keys AS TEXT[]))
+                ON CONFLICT ({column}) DO NOTHING
+                RETURNING {column}, id
+            )
+            SELECT {column}, id FROM inserted
+            UNION ALL
+            SELECT {column}, id FROM {table} WHERE {column} = ANY(:keys)
+        """),
+        params,
+    ).fetchall())
+
+    # Keys inserted by a concurrent transaction that committed after our
+    # snapshot are in neither branch; read them once more.
+    unresolved = [key for key in missing if key not in fetched]
+    if unresolved:
+        fetched.update(conn.execute(
+            text(f"SELECT {column}, id FROM {table} WHERE {column} = ANY(:keys)"),
+            {"keys": unresolved},
+        ).fetchall())
+
+    cache.put_many(fetched)
+    resolved.update(fetched)
+    return resolved
+
+
+def missing_keys(conn, table, ids):
+    """Ids from `ids` that do not exist in `table`, checked as an anti-join."""
+    ids = [int(i) for i in ids]
+    if not ids:
+        return set()
+    rows = conn.execute(
+        text(f"""
+            SELECT DISTINCT s.id
+            FROM unnest(CAST(:ids AS BIGINT[])) AS s(id)
+            LEFT JOIN {table} t ON t.id = s.id
+            WHERE t.id IS NULL
+        """),
+        {"ids": ids},
+    ).fetchall()
+    return {row[0] for row in rows}
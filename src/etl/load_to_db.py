@@ -1,10 +1,28 @@
 # src/etl/load_to_db.py
 
+import argparse
+import gzip
+import hashlib
+import io
 import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import lru_cache, partial
+
 import pandas as pd
-from sqlalchemy import Table, inspect, text
+from sqlalchemy import (
+    Integer, Table, func, inspect, literal_column, or_, select, text, tuple_
+)
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from src.scripts.db_setup import engine, metadata
+from src import instrumentation, schema
+from src.etl import bulk_load, dimensions, quarantine, rollups
+from src.etl.scheduler import run_dag
+from src.instrumentation import span
+from src.raw_zone import FORMATS, is_s3_uri, iter_parquet_batches, latest_parquet_files
+from src.scripts.db_setup import (
+    PARTITION_KEYS, ensure_partitions, get_engine, metadata, partitioned
+)
 
 # ---------- CSV Paths ----------
 CSV_PATHS = {
@@ -13,135 +31,946 @@ CSV_PATHS = {
     "transactions": "data/raw/transactions.csv",
 }
 
-# ---------- Create load_audit table if not exists ----------
-inspector = inspect(engine)
-if not inspector.has_table("load_audit"):
-    with engine.begin() as conn:
-        conn.execute(text("""
-            CREATE TABLE load_audit (
-                id SERIAL PRIMARY KEY,
-                load_timestamp TIMESTAMP DEFAULT NOW(),
-                table_name TEXT NOT NULL,
-                row_count INT,
-                status TEXT
-            );
-        """))
-    print("✅ Created load_audit table.")
+# Columns each source needs; Parquet sources are read with this projection
+SOURCE_COLUMNS = {source: list(columns) for source, columns in schema.COLUMNS.items()}
+
+# Columns added to load_audit after its first release: source fingerprint and
+# high-water marks used by incremental loads, the timing of the load task,
+# and the per-stage metrics of an instrumentation run (see log_spans).
+AUDIT_EXTRA_COLUMNS = {
+    "source_file": "TEXT",
+    "fingerprint": "TEXT",
+    "file_size": "BIGINT",
+    "max_id": "BIGINT",
+    "max_timestamp": "TIMESTAMP",
+    "started_at": "TIMESTAMP",
+    "duration_seconds": "DOUBLE PRECISION",
+    "run_id": "TEXT",
+    "stage": "TEXT",
+    "duration_ms": "DOUBLE PRECISION",
+    "rows_per_sec": "DOUBLE PRECISION",
+    "bytes_processed": "BIGINT",
+    "peak_memory_bytes": "BIGINT",
+    "inserted_count": "INT",
+    "updated_count": "INT",
+    "unchanged_count": "INT",
+}
+
+# Bumped in the transaction of each commit that writes data, so readers
+# (analytics.data_version) see a new version as soon as the data is
+# visible; the load_audit row is only written once the whole load is done.
+DATA_VERSIONS_TABLE = "data_versions"
+
+
+# ---------- Create audit tables on first use ----------
+@lru_cache(maxsize=None)
+def ensure_audit_tables():
+    """Create/extend load_audit, load_checkpoints and load_quarantine once per process."""
+    engine = get_engine()
+    inspector = inspect(engine)
+    if not inspector.has_table("load_audit"):
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE load_audit (
+                    id SERIAL PRIMARY KEY,
+                    load_timestamp TIMESTAMP DEFAULT NOW(),
+                    table_name TEXT NOT NULL,
+                    row_count INT,
+                    status TEXT
+                );
+            """))
+        print("✅ Created load_audit table.")
+
+    existing_audit_columns = {c["name"] for c in inspector.get_columns("load_audit")}
+    missing_audit_columns = [c for c in AUDIT_EXTRA_COLUMNS if c not in existing_audit_columns]
+    if missing_audit_columns:
+        with engine.begin() as conn:  # one ALTER for all of them
+            conn.execute(text("ALTER TABLE load_audit " + ", ".join(
+                f"ADD COLUMN IF NOT EXISTS {column} {AUDIT_EXTRA_COLUMNS[column]}"
+                for column in missing_audit_columns
+            )))
+        print(f"✅ Extended load_audit with {', '.join(missing_audit_columns)}.")
+
+    # One row per source file; lets a chunked load resume after a failure.
+    if not inspector.has_table("load_checkpoints"):
+        with engine.begin() as conn:
+            conn.execute(text("""
+                CREATE TABLE load_checkpoints (
+                    source TEXT PRIMARY KEY,
+                    rows_committed BIGINT NOT NULL DEFAULT 0,
+                    chunks_committed INT NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+            """))
+        print("✅ Created load_checkpoints table.")
+
+    # Per-source change counters, bumped by every commit that writes data
+    if not inspector.has_table(DATA_VERSIONS_TABLE):
+        with engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE TABLE {DATA_VERSIONS_TABLE} (
+                    source TEXT PRIMARY KEY,
+                    version BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                );
+            """))
+        print(f"✅ Created {DATA_VERSIONS_TABLE} table.")
+
+    # Rows rejected by the loader's in-line validation
+    if not inspector.has_table(quarantine.QUARANTINE_TABLE):
+        with engine.begin() as conn:
+            quarantine.create_table(conn)
+        print(f"✅ Created {quarantine.QUARANTINE_TABLE} table.")
+
+
+# ---------- Load Methods ----------
+# "insert": executemany of INSERT ... ON CONFLICT with one bind set per row.
+# "copy":   COPY each chunk into a temp staging table, then merge it into the
+#           target with a single INSERT ... SELECT ... ON CONFLICT.
+DEFAULT_LOAD_METHOD = "insert"
+LOAD_METHODS = {
+    "customers": "copy",
+    "products": "copy",
+    "transactions": "copy",
+    "transaction_items": "copy",
+}
+COPY_CHUNK_SIZE = 100_000
+
+# Upserts only rewrite rows whose values differ from the stored ones, and
+# report how many rows fell into each outcome.
+UPSERT_OUTCOMES = ("inserted", "updated", "unchanged")
+
+
+# ---------- Helper: Transaction Scope ----------
+@contextmanager
+def _begin(conn=None):
+    """Reuse the caller's connection (and transaction), or open a new one."""
+    if conn is not None:
+        yield conn
+    else:
+        with get_engine().begin() as conn:
+            yield conn
 
 
 # ---------- Helper: Upsert Table ----------
-def upsert_table(df, table_name, key_columns):
-    """Perform bulk upsert into PostgreSQL using ON CONFLICT."""
+def upsert_table(df, table_name, key_columns, method=None, conn=None):
+    """Perform bulk upsert into PostgreSQL using ON CONFLICT.
+
+    Conflicting rows are only updated when a column IS DISTINCT FROM the
+    incoming value, so reloading unchanged rows writes nothing (no dead
+    tuples, WAL or index churn). Returns {"inserted", "updated",
+    "unchanged"} row counts, taken from RETURNING (xmax = 0 marks a fresh
+    insert). Partitioned tables cannot return xmax, so there the new keys
+    are counted against the stored ones instead.
+
+    `method` overrides the per-table entry in LOAD_METHODS ("insert" or "copy").
+    Runs inside `conn`'s transaction when given, otherwise in its own.
+    """
     if df.empty:
         print(f"⚠️ Skipping {table_name} — DataFrame empty")
-        return 0
+        return dict.fromkeys(UPSERT_OUTCOMES, 0)
+
+    method = method or LOAD_METHODS.get(table_name, DEFAULT_LOAD_METHOD)
+    table = Table(table_name, metadata, autoload_with=get_engine())
 
-    df = df.where(pd.notnull(df), None)
-    table = Table(table_name, metadata, autoload_with=engine)
+    if method == "copy":
+        return _copy_upsert(df, table, key_columns, conn)
+    if method != "insert":
+        raise ValueError(f"Unknown load method for {table_name}: {method}")
 
+    with span("null_normalization", table_name, rows=len(df)):
+        # With RETURNING the rows go out as multi-row INSERTs, and one ON
+        # CONFLICT statement cannot touch a key twice: later rows win, as in COPY
+        df = df.drop_duplicates(subset=key_columns, keep="last")
+        df = df.where(pd.notnull(df), None)
     insert_stmt = pg_insert(table)
-    update_dict = {c.name: insert_stmt.excluded[c.name]
-                   for c in table.columns if c.name not in key_columns}
+    update_dict = {c: insert_stmt.excluded[c]
+                   for c in _update_columns(df, table, key_columns)}
 
-    upsert_stmt = insert_stmt.on_conflict_do_update(
-        index_elements=key_columns,
-        set_=update_dict
+    if update_dict:
+        upsert_stmt = insert_stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_=update_dict,
+            where=or_(*[table.c[c].is_distinct_from(value) for c, value in update_dict.items()]),
+        )
+    else:
+        upsert_stmt = insert_stmt.on_conflict_do_nothing(index_elements=key_columns)
+    partitioned_table = _is_partitioned_table(table)
+    upsert_stmt = upsert_stmt.returning(
+        literal_column("1" if partitioned_table else "xmax = 0").label("inserted")
     )
 
-    with engine.begin() as conn:
-        conn.execute(upsert_stmt, df.to_dict(orient="records"))
-    return len(df)
+    with span("upsert", table_name, rows=len(df)), _begin(conn) as conn:
+        if partitioned_table:
+            keys = list(df[key_columns].drop_duplicates().itertuples(index=False, name=None))
+            stored = conn.execute(
+                select(func.count()).select_from(table)
+                .where(tuple_(*[table.c[c] for c in key_columns]).in_(keys))
+            ).scalar()
+            inserted = len(keys) - stored
+        written = conn.execute(upsert_stmt, df.to_dict(orient="records")).scalars().all()
+    if not partitioned_table:
+        inserted = sum(written)
+    return {"inserted": inserted, "updated": len(written) - inserted,
+            "unchanged": len(df) - len(written)}
+
+
+def _is_partitioned_table(table):
+    return partitioned() and table.name in PARTITION_KEYS
+
+
+def _update_columns(df, table, key_columns):
+    """Non-key table columns supplied by the DataFrame.
+
+    Columns the frame does not carry (e.g. serial ids) are left untouched on
+    conflict instead of being overwritten with a fresh default.
+    """
+    return [c.name for c in table.columns
+            if c.name in df.columns and c.name not in key_columns]
+
+
+def _copy_upsert(df, table, key_columns, conn=None):
+    """Stream `df` through COPY into a temp staging table and merge it."""
+    quote = get_engine().dialect.identifier_preparer.quote
+    columns = [c.name for c in table.columns if c.name in df.columns]
+    column_list = ", ".join(quote(c) for c in columns)
+    key_list = ", ".join(quote(c) for c in key_columns)
+    staging = quote(f"_stg_{table.name}")
+
+    with span("null_normalization", table.name, rows=len(df)):
+        df = df[columns].copy()
+        for col in table.columns:
+            # Integer columns holding NULLs arrive as float64 ("3.0"), which COPY rejects
+            if col.name in df.columns and isinstance(col.type, Integer):
+                df[col.name] = df[col.name].astype("Int64")
+
+    update_cols = _update_columns(df, table, key_columns)
+    if update_cols:
+        stored = ", ".join(f"{quote(table.name)}.{quote(c)}" for c in update_cols)
+        incoming = ", ".join(f"EXCLUDED.{quote(c)}" for c in update_cols)
+        conflict_action = "DO UPDATE SET " + ", ".join(
+            f"{quote(c)} = EXCLUDED.{quote(c)}" for c in update_cols
+        ) + f" WHERE ROW({stored}) IS DISTINCT FROM ROW({incoming})"
+    else:
+        conflict_action = "DO NOTHING"
+
+    # New keys: from xmax, or (partitioned tables) the keys missing from the
+    # table as of the statement's snapshot, which the insert does not change.
+    if _is_partitioned_table(table):
+        key_match = " AND ".join(f"t.{quote(c)} = s.{quote(c)}" for c in key_columns)
+        inserted_sql = (f"SELECT count(*) FROM source s WHERE NOT EXISTS "
+                        f"(SELECT 1 FROM {quote(table.name)} t WHERE {key_match})")
+        returning = "1"
+    else:
+        inserted_sql = "SELECT count(*) FROM written WHERE inserted"
+        returning = "(xmax = 0) AS inserted"
+
+    # Later rows win on duplicate keys, matching the row-by-row insert path.
+    # Rows skipped by the WHERE are not returned, so they count as unchanged.
+    merge_sql = f"""
+        WITH source AS (
+            SELECT DISTINCT ON ({key_list}) {column_list}
+            FROM {staging}
+            ORDER BY {key_list}, _stg_seq DESC
+        ), written AS (
+            INSERT INTO {quote(table.name)} ({column_list})
+            SELECT {column_list} FROM source
+            ON CONFLICT ({key_list}) {conflict_action}
+            RETURNING {returning}
+        )
+        SELECT (SELECT count(*) FROM source), ({inserted_sql}), (SELECT count(*) FROM written)
+    """
+
+    with _begin(conn) as conn:
+        cursor = conn.connection.cursor()
+        cursor.execute(
+            f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS "
+            f"SELECT {column_list} FROM {quote(table.name)} WITH NO DATA"
+        )
+        cursor.execute(f"ALTER TABLE {staging} ADD COLUMN _stg_seq BIGSERIAL")
+
+        copy_sql = (f"COPY {staging} ({column_list}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '\\N')")
+        with span("copy", table.name, rows=len(df), bytes=0) as copied:
+            for start in range(0, len(df), COPY_CHUNK_SIZE):
+                buffer = io.StringIO()
+                df.iloc[start:start + COPY_CHUNK_SIZE].to_csv(
+                    buffer, index=False, header=False, na_rep="\\N"
+                )
+                copied.bytes += buffer.tell()
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+
+        with span("upsert", table.name, rows=len(df)):
+            cursor.execute(merge_sql)
+            rows, inserted, written = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {staging}")
+        cursor.close()
+    return {"inserted": inserted, "updated": written - inserted, "unchanged": rows - written}
 
 
 # ---------- Helper: Audit Logging ----------
-def log_audit(table_name, row_count, status="success"):
-    with engine.begin() as conn:
+def log_audit(table_name, row_count, status="success", **extra):
+    """Write one load_audit row; `extra` fills columns from AUDIT_EXTRA_COLUMNS."""
+    unknown = set(extra) - set(AUDIT_EXTRA_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown load_audit columns: {sorted(unknown)}")
+    ensure_audit_tables()
+
+    columns = ["table_name", "row_count", "status", *extra]
+    values = {"table_name": table_name, "row_count": row_count, "status": status, **extra}
+    with get_engine().begin() as conn:
         conn.execute(
-            text("INSERT INTO load_audit (table_name, row_count, status) VALUES (:t, :r, :s)"),
-            {"t": table_name, "r": row_count, "s": status},
+            text(f"INSERT INTO load_audit ({', '.join(columns)}) "
+                 f"VALUES ({', '.join(':' + c for c in columns)})"),
+            values,
         )
 
 
-# ---------- ETL Pipeline ----------
-def load_data():
-    # ------------------ 1️⃣ CUSTOMERS ------------------
-    if os.path.exists(CSV_PATHS["customers"]):
-        customers_df = pd.read_csv(CSV_PATHS["customers"])
-        customers_df.columns = [c.strip() for c in customers_df.columns]
-        customers_df["id"] = customers_df["id"].astype(int)
-        customers_df = customers_df.where(pd.notnull(customers_df), None)
-
-        rows = upsert_table(customers_df, "customers", key_columns=["id"])
-        log_audit("customers", rows)
-        print(f"✅ Loaded {rows} customers")
+def log_spans(run):
+    """Write one load_audit row per (stage, table) of an instrumentation run."""
+    rows = [{
+        "table_name": group["table"] or group["stage"], "row_count": group["rows"] or 0,
+        "status": "span", "run_id": run.run_id, "stage": group["stage"],
+        "started_at": run.started_at, "duration_ms": group["seconds"] * 1000,
+        "rows_per_sec": group["rows_per_sec"], "bytes_processed": group["bytes"],
+        "peak_memory_bytes": group["peak_memory_bytes"],
+    } for group in run.summary()]
+    if not rows:
+        return
+    ensure_audit_tables()
+
+    columns = list(rows[0])
+    with get_engine().begin() as conn:  # one statement for the whole run
+        conn.execute(
+            text(f"INSERT INTO load_audit ({', '.join(columns)}) "
+                 f"VALUES ({', '.join(':' + c for c in columns)})"),
+            rows,
+        )
+
+
+def get_last_load(source):
+    """Latest fingerprinted load_audit row for a source file, or None."""
+    with get_engine().connect() as conn:
+        return conn.execute(
+            text("""
+                SELECT fingerprint, file_size, max_id, max_timestamp
+                FROM load_audit
+                WHERE table_name = :t
+                  AND fingerprint IS NOT NULL
+                  AND status IN ('success', 'skipped')
+                ORDER BY id DESC
+                LIMIT 1
+            """),
+            {"t": source},
+        ).fetchone()
+
+
+# ---------- Helper: File Fingerprints ----------
+FINGERPRINT_BLOCK_SIZE = 1 << 20
+
+
+def fingerprint_files(paths):
+    """Combined SHA-256 of several files (a Parquet partition), in path order."""
+    combined = hashlib.sha256()
+    for path in paths:
+        combined.update(fingerprint_file(path)[0].encode())
+    return combined.hexdigest()
+
+
+def fingerprint_file(path, prefix_size=None):
+    """SHA-256 of the file, plus the SHA-256 of its first `prefix_size` bytes.
+
+    The prefix digest is computed in the same pass and lets us tell whether
+    the file is the previously loaded one with rows appended. It is None when
+    the prefix does not end on a line boundary (the last row was extended).
+    """
+    full = hashlib.sha256()
+    prefix_digest = None
+    read = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(FINGERPRINT_BLOCK_SIZE)
+            if not block:
+                break
+            if prefix_size is not None and read < prefix_size <= read + len(block):
+                head = block[:prefix_size - read]
+                full.update(head)
+                if head.endswith(b"\n"):
+                    prefix_digest = full.hexdigest()
+                full.update(block[prefix_size - read:])
+            else:
+                full.update(block)
+            read += len(block)
+    return full.hexdigest(), prefix_digest
+
+
+# ---------- Helper: Data Versions ----------
+def bump_data_version(conn, source):
+    """Count a write of `source`'s data in the caller's transaction."""
+    conn.execute(
+        text(f"""
+            INSERT INTO {DATA_VERSIONS_TABLE} (source, version, updated_at)
+            VALUES (:s, 1, NOW())
+            ON CONFLICT (source) DO UPDATE SET
+                version = {DATA_VERSIONS_TABLE}.version + 1,
+                updated_at = EXCLUDED.updated_at
+        """),
+        {"s": source},
+    )
+
+
+# ---------- Helper: Checkpoints ----------
+def get_checkpoint(source):
+    """(rows, chunks) already committed for `source` by an unfinished chunked load."""
+    with get_engine().connect() as conn:
+        row = conn.execute(
+            text("SELECT rows_committed, chunks_committed, status "
+                 "FROM load_checkpoints WHERE source = :s"),
+            {"s": source},
+        ).fetchone()
+    if row is None or row.status != "in_progress":
+        return 0, 0
+    return row.rows_committed, row.chunks_committed
+
+
+def save_checkpoint(conn, source, rows_committed, chunks_committed, status):
+    conn.execute(
+        text("""
+            INSERT INTO load_checkpoints (source, rows_committed, chunks_committed, status, updated_at)
+            VALUES (:s, :r, :c, :st, NOW())
+            ON CONFLICT (source) DO UPDATE SET
+                rows_committed = EXCLUDED.rows_committed,
+                chunks_committed = EXCLUDED.chunks_committed,
+                status = EXCLUDED.status,
+                updated_at = EXCLUDED.updated_at
+        """),
+        {"s": source, "r": rows_committed, "c": chunks_committed, "st": status},
+    )
+
+
+# ---------- Helper: Source Readers ----------
+def source_files(source, fmt="csv", from_s3=False, s3_day=None):
+    """Files backing a source: its CSV, or its latest Parquet partition.
+
+    With `from_s3` these are s3:// URIs of the latest upload in the newest
+    (or `s3_day`'s) raw-zone day partition instead of local paths.
+    """
+    if from_s3:
+        from src.cloud import s3_reader
+
+        return s3_reader.latest_uris(source, fmt, s3_day)
+    if fmt == "parquet":
+        return latest_parquet_files(source)
+    path = CSV_PATHS[source]
+    return [path] if os.path.exists(path) else []
+
+
+def read_source_chunks(source, files, chunk_size=None, skip_rows=0, byte_offset=0,
+                       columns=None, engine=None):
+    """Yield chunks of a source from CSV or Parquet files.
+
+    Chunks carry the source's compact dtypes (see src.schema). Parquet is
+    read column-projected to `columns` (default SOURCE_COLUMNS); rows
+    skipped for a resume are dropped as batches stream past. Files may be
+    s3:// URIs; Parquet objects are then fetched into memory one at a time,
+    as the format needs random access. `engine` picks the CSV parser.
+    """
+    if not files[0].endswith(".parquet"):
+        if len(files) == 1:
+            yield from read_chunks(files[0], chunk_size, skip_rows, byte_offset, columns,
+                                   source, engine)
+            return
+        # Several CSVs (compacted S3 parts): rows skipped for a resume span files
+        chunks = (chunk for path in files
+                  for chunk in read_chunks(path, chunk_size, usecols=columns,
+                                           entity=source, engine=engine))
+        yield from _skip_rows(chunks, skip_rows)
+        return
+
+    columns = columns or SOURCE_COLUMNS[source]
+    if is_s3_uri(files[0]):
+        from src.cloud import s3_reader
+
+        files = (io.BytesIO(s3_reader.read_object(uri)) for uri in files)
+    batches = iter_parquet_batches(files, chunk_size, columns=columns)
+    for df in _skip_rows(instrumentation.timed_chunks(batches, "parquet_read", source),
+                         skip_rows):
+        yield schema.compact(df, source)
+
+
+def _skip_rows(chunks, skip_rows):
+    """Drop the first `skip_rows` rows of a stream of DataFrames."""
+    for df in chunks:
+        if skip_rows >= len(df):
+            skip_rows -= len(df)
+            continue
+        if skip_rows:
+            df, skip_rows = df.iloc[skip_rows:].reset_index(drop=True), 0
+        yield df
+
+
+def read_chunks(path, chunk_size=None, skip_rows=0, byte_offset=0, usecols=None,
+                entity=None, engine=None):
+    """Yield DataFrames of at most `chunk_size` rows (whole file when None).
+
+    `skip_rows` data rows after the header are skipped without being parsed
+    into memory, which is how a resumed load fast-forwards. A `byte_offset`
+    starts reading at that position instead (the appended tail of a file).
+    `usecols` limits parsing to those columns. Columns are read with the
+    dtypes of `entity` (default: from the file name, see schema.read_csv).
+    Each chunk is recorded as a "csv_read" span with the bytes the reader
+    advanced through the file.
+
+    An s3:// `path` is streamed with parallel ranged GETs (no byte offsets),
+    so the next ranges download while the current chunk is being loaded.
+    `.csv.gz` files are decompressed as they stream.
+    """
+    if is_s3_uri(path):
+        from src.cloud import s3_reader  # boto3 is only needed for S3 sources
+
+        opened = s3_reader.open_object(path)
     else:
-        print("❌ customers.csv not found")
+        opened = open(path, "rb")
+    with opened as raw:
+        f = gzip.GzipFile(fileobj=raw, mode="rb") if path.endswith(".gz") else raw
+        header = f.readline()
+        columns = [c.strip() for c in pd.read_csv(io.BytesIO(header), nrows=0).columns]
+        if byte_offset:
+            f.seek(byte_offset)
+
+        def parse():
+            frames = schema.read_csv(f, entity or schema.entity_for_path(path), chunk_size,
+                                     engine=engine, header=None, names=columns,
+                                     skiprows=skip_rows, usecols=usecols)
+            if chunk_size:
+                yield from frames
+            else:
+                yield frames
+
+        yield from instrumentation.timed_chunks(parse(), "csv_read",
+                                                os.path.basename(path), f.tell)
 
-    # ------------------ 2️⃣ SUPPLIERS + PRODUCTS ------------------
-    if os.path.exists(CSV_PATHS["products"]):
-        df = pd.read_csv(CSV_PATHS["products"])
-        df = df.where(pd.notnull(df), None)
 
-        suppliers_df = pd.DataFrame(df["supplier"].dropna().unique(), columns=["name"])
-        suppliers_df = suppliers_df.drop_duplicates(subset=["name"])
-        rows = upsert_table(suppliers_df, "suppliers", key_columns=["name"])
-        log_audit("suppliers", rows)
-        print(f"✅ Loaded {rows} suppliers")
+# ---------- Load Stages (one chunk, one transaction) ----------
+# `update_rollups=False` skips the incremental rollup maintenance (a bulk
+# load rebuilds the rollups once at the end).
+def load_customers_chunk(df, conn, update_rollups=True):
+    df["id"] = df["id"].astype(int)
+    return {"customers": upsert_table(df, "customers", key_columns=["id"], conn=conn)}
 
-        with engine.connect() as conn:
-            supplier_map = dict(conn.execute(text("SELECT name, id FROM suppliers")).fetchall())
 
+def load_products_chunk(df, conn, update_rollups=True):
+    counts = {}
+    with span("dimension_mapping", "suppliers", rows=len(df)):
+        supplier_map = dimensions.resolve_keys(conn, "suppliers",
+                                               df["supplier"].dropna().unique())
+        counts["suppliers"] = len(supplier_map)
         df["supplier_id"] = df["supplier"].map(supplier_map)
         df = df.drop(columns=["supplier"])
 
-        rows = upsert_table(df, "products", key_columns=["id"])
-        log_audit("products", rows)
-        print(f"✅ Loaded {rows} products")
-    else:
-        print("❌ products.csv not found")
+    repriced = rollups.changed_prices(conn, df) if update_rollups else []
+    counts["products"] = upsert_table(df, "products", key_columns=["id"], conn=conn)
+    if update_rollups:
+        with span("rollups", "products", rows=len(repriced)):
+            rollups.refresh_products(conn, repriced)
+    return counts
 
-    # ------------------ 3️⃣ PAYMENT METHODS + TRANSACTIONS ------------------
-    if os.path.exists(CSV_PATHS["transactions"]):
-        df = pd.read_csv(CSV_PATHS["transactions"])
-        df = df.where(pd.notnull(df), None)
 
-        # 3a. Payment Methods
-        payment_df = pd.DataFrame(df["payment_method"].dropna().unique(), columns=["method"])
-        rows = upsert_table(payment_df, "payment_methods", key_columns=["method"])
-        log_audit("payment_methods", rows)
-        print(f"✅ Loaded {rows} payment methods")
+def load_transactions_chunk(df, conn, update_rollups=True):
+    counts = {}
 
-        with engine.connect() as conn:
-            payment_map = dict(conn.execute(text("SELECT method, id FROM payment_methods")).fetchall())
+    # Payment methods (already upserted by the payment_methods task; cache hits)
+    with span("dimension_mapping", "payment_methods", rows=len(df)):
+        payment_map = dimensions.resolve_keys(conn, "payment_methods",
+                                              df["payment_method"].dropna().unique())
         df["payment_method_id"] = df["payment_method"].map(payment_map)
 
-        # 3b. Transactions
-        transaction_df = df[["id", "customer_id", "timestamp", "payment_method_id"]].drop_duplicates()
+    # Transactions (rows with unknown customers or products were quarantined)
+    transaction_df = df[["id", "customer_id", "timestamp", "payment_method_id"]].drop_duplicates()
 
-        with engine.connect() as conn:
-            existing_customers = {r[0] for r in conn.execute(text("SELECT id FROM customers")).fetchall()}
+    transaction_ids = [int(i) for i in transaction_df["id"].unique()]
+    quantities_before = rollups.item_quantities(conn, transaction_ids) if update_rollups else {}
 
-        missing_ids = set(transaction_df["customer_id"]) - existing_customers
-        if missing_ids:
-            raise ValueError(f"Cannot insert transactions: missing customer IDs: {missing_ids}")
+    transaction_items_df = df[["id", "product_id", "quantity"]].rename(
+        columns={"id": "transaction_id"}
+    )
+    transaction_keys = ["id"]
+    item_keys = ["transaction_id", "product_id"]
+    if partitioned():
+        timestamps = pd.to_datetime(transaction_df["timestamp"], format="ISO8601")
+        ensure_partitions(conn, timestamps.dt.to_pydatetime())
+        _drop_moved_transactions(conn, transaction_df["id"], timestamps)
+        transaction_items_df["transaction_timestamp"] = df["timestamp"]
+        transaction_keys = ["id", "timestamp"]
+        item_keys = ["transaction_id", "product_id", "transaction_timestamp"]
 
-        rows = upsert_table(transaction_df, "transactions", key_columns=["id"])
-        log_audit("transactions", rows)
-        print(f"✅ Loaded {rows} transactions")
+    counts["transactions"] = upsert_table(transaction_df, "transactions",
+                                          key_columns=transaction_keys, conn=conn)
 
-        # 3c. Transaction Items (no price)
-        transaction_items_df = df[["id", "product_id", "quantity"]].rename(
-            columns={"id": "transaction_id"}
-        )
+    # Transaction Items (no price)
+    counts["transaction_items"] = upsert_table(transaction_items_df, "transaction_items",
+                                               key_columns=item_keys, conn=conn)
+
+    # Rollups, from the rows touched by this chunk only
+    if update_rollups:
+        with span("rollups", "transactions", rows=len(transaction_ids)):
+            rollups.apply_product_deltas(conn, quantities_before,
+                                         rollups.item_quantities(conn, transaction_ids))
+            rollups.refresh_orders(conn, transaction_ids)
+    return counts
+
+
+def _drop_moved_transactions(conn, ids, timestamps):
+    """Delete stored transactions (and items) whose timestamp has changed.
+
+    In the partitioned schema a transaction is keyed by (id, timestamp), so a
+    new timestamp would otherwise add a second row in another partition.
+    """
+    params = {"ids": [int(i) for i in ids],
+              "ts": [ts.isoformat() for ts in timestamps.dt.to_pydatetime()]}
+    conn.execute(text("""
+        DELETE FROM transaction_items ti
+        USING unnest(CAST(:ids AS INTEGER[]), CAST(:ts AS TIMESTAMP[])) AS s(id, ts)
+        WHERE ti.transaction_id = s.id AND ti.transaction_timestamp <> s.ts
+    """), params)
+    conn.execute(text("""
+        DELETE FROM transactions t
+        USING unnest(CAST(:ids AS INTEGER[]), CAST(:ts AS TIMESTAMP[])) AS s(id, ts)
+        WHERE t.id = s.id AND t.timestamp <> s.ts
+    """), params)
+
+
+def load_payment_methods(files, chunk_size=None, byte_offset=0):
+    """Upsert the payment methods named in the transactions files.
+
+    Reads only the payment_method column, so the lookup table is filled
+    while customers and products load, ahead of the transactions stage.
+    """
+    methods = set()
+    for chunk in read_source_chunks("transactions", files, chunk_size,
+                                    byte_offset=byte_offset, columns=["payment_method"]):
+        methods.update(chunk["payment_method"].dropna().unique())
+    with get_engine().begin() as conn:
+        resolved = dimensions.resolve_keys(conn, "payment_methods", sorted(methods))
+        bump_data_version(conn, "payment_methods")
+    return {"payment_methods": len(resolved)}
+
+
+# Source file -> stage
+LOAD_STAGES = {
+    "customers": load_customers_chunk,
+    "products": load_products_chunk,
+    "transactions": load_transactions_chunk,
+}
+
+# Load DAG: task -> tasks that must finish first (FK order). Independent
+# branches run concurrently.
+LOAD_DEPENDENCIES = {
+    "customers": [],
+    "products": [],
+    "payment_methods": [],
+    "transactions": ["customers", "products", "payment_methods"],
+}
+
+# High-water mark columns recorded in load_audit per source
+TIMESTAMP_COLUMNS = {
+    "customers": "registration_date",
+    "transactions": "timestamp",
+}
+
+# Sources that only ever grow by appended rows; a changed file whose previous
+# contents are an unchanged prefix is loaded from the old end of file onwards.
+APPEND_ONLY_SOURCES = {"transactions"}
+
+
+# ---------- Incremental Planning ----------
+def plan_load(source, files, full_reload=False):
+    """Decide how to load a source: "skip", "append" or "full".
 
-        rows = upsert_table(transaction_items_df, "transaction_items",
-                            key_columns=["transaction_id", "product_id"])
-        log_audit("transaction_items", rows)
-        print(f"✅ Loaded {rows} transaction_items")
+    Returns (mode, info) where info carries the new fingerprint and size, the
+    byte offset to start from and the previous high-water marks. Appends are
+    only detected for a single local CSV file; S3 objects are fingerprinted
+    by their ETags.
+    """
+    last = None if full_reload else get_last_load(source)
+
+    if is_s3_uri(files[0]):
+        from src.cloud import s3_reader
+
+        (fingerprint, size), prefix_digest = s3_reader.fingerprint_objects(files), None
+    elif len(files) == 1 and files[0].endswith(".csv"):
+        size = os.path.getsize(files[0])
+        prefix_size = last.file_size if (last and source in APPEND_ONLY_SOURCES) else None
+        if prefix_size is not None and not 0 < prefix_size < size:
+            prefix_size = None
+        fingerprint, prefix_digest = fingerprint_file(files[0], prefix_size)
     else:
-        print("❌ transactions.csv not found")
+        size = sum(os.path.getsize(path) for path in files)
+        fingerprint, prefix_digest = fingerprint_files(files), None
+    info = {"fingerprint": fingerprint, "file_size": size, "byte_offset": 0,
+            "max_id": None, "max_timestamp": None}
+
+    if last is None:
+        return "full", info
+    if last.fingerprint == fingerprint:
+        info.update(max_id=last.max_id, max_timestamp=last.max_timestamp)
+        return "skip", info
+    if prefix_digest is not None and prefix_digest == last.fingerprint:
+        info.update(byte_offset=last.file_size,
+                    max_id=last.max_id, max_timestamp=last.max_timestamp)
+        return "append", info
+    return "full", info
+
+
+def _merge_marks(marks, df, source):
+    """Fold a chunk's max id / max timestamp into the running high-water marks."""
+    if df.empty:
+        return
+    chunk_max_id = int(df["id"].max())
+    marks["max_id"] = max(filter(None, [marks["max_id"], chunk_max_id]), default=None)
+
+    ts_column = TIMESTAMP_COLUMNS.get(source)
+    if ts_column and ts_column in df.columns:
+        values = df[ts_column]
+        if not pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.to_datetime(values.astype(str), format="ISO8601", errors="coerce")
+        chunk_max_ts = values.max()
+        if pd.notna(chunk_max_ts):
+            chunk_max_ts = chunk_max_ts.to_pydatetime()
+            marks["max_timestamp"] = max(filter(None, [marks["max_timestamp"], chunk_max_ts]))
+
+
+# ---------- ETL Pipeline ----------
+def load_source(source, files, chunk_size=None, resume=False, byte_offset=0, marks=None,
+                engine=None, update_rollups=True):
+    """Run one source's files through its stage, committing once per chunk.
+
+    Returns the number of rows loaded into each table. With `chunk_size`
+    progress is checkpointed in load_checkpoints, and `resume` continues an
+    interrupted load from the last committed chunk. An append starts at
+    `byte_offset`, the end of the previously loaded (and fingerprinted)
+    contents, so every row after it is new, including items of an already
+    loaded transaction. `marks` holds the previous high-water marks and is
+    updated with the new ones.
+
+    Each chunk is validated in its transaction before the stage runs: rows
+    failing a check go to load_quarantine (counted under that name) and the
+    clean rows are loaded. `update_rollups=False` leaves the rollups to the
+    caller.
+    """
+    ensure_audit_tables()
+    stage = LOAD_STAGES[source]
+    source_file = files[0] if len(files) == 1 else os.path.dirname(files[0])
+    active = instrumentation.current_run()
+    run_id = active.run_id if active is not None else None
+    marks = marks if marks is not None else {"max_id": None, "max_timestamp": None}
+    rows_done, chunks = get_checkpoint(source) if (chunk_size and resume) else (0, 0)
+    if rows_done:
+        print(f"⏩ Resuming {source} after {rows_done} committed rows")
+
+    totals = {}
+    for chunk in read_source_chunks(source, files, chunk_size, skip_rows=rows_done,
+                                    byte_offset=byte_offset, engine=engine):
+        rows_read = len(chunk)
+        try:
+            with get_engine().begin() as conn:
+                chunk, rejected = quarantine.check_chunk(conn, source, chunk)
+                quarantined = quarantine.store(conn, source, rejected, source_file, run_id)
+                _merge_marks(marks, chunk, source)
+                counts = {}
+                if not chunk.empty:
+                    counts = stage(chunk, conn, update_rollups)
+                    bump_data_version(conn, source)
+                rows_done += rows_read
+                chunks += 1
+                if chunk_size:
+                    save_checkpoint(conn, source, rows_done, chunks, "in_progress")
+        except Exception:
+            # Keys cached during the rolled-back transaction may not exist
+            dimensions.clear_caches()
+            raise
+        for table_name, rows in counts.items():
+            totals[table_name] = _add_counts(totals.get(table_name), rows)
+        if quarantined:
+            totals[quarantine.QUARANTINE_TABLE] = (
+                totals.get(quarantine.QUARANTINE_TABLE, 0) + quarantined
+            )
+            reasons = ", ".join(f"{reason}: {n}"
+                                for reason, n in quarantine.summarize(rejected).items())
+            print(f"   🚧 {source}: {quarantined} rows quarantined ({reasons})")
+        if chunk_size:
+            print(f"   ↳ {source}: chunk {chunks} committed ({rows_done} rows)")
+
+    if chunk_size:
+        with get_engine().begin() as conn:
+            save_checkpoint(conn, source, rows_done, chunks, "complete")
+    return totals
+
+
+def _add_counts(total, counts):
+    """Add a row count, or upsert outcome counts outcome by outcome."""
+    if isinstance(counts, dict):
+        total = total or dict.fromkeys(UPSERT_OUTCOMES, 0)
+        return {outcome: total[outcome] + counts[outcome] for outcome in UPSERT_OUTCOMES}
+    return (total or 0) + counts
+
+
+def run_task(name, work, audit=None, marks=None):
+    """Run one load task, then write its load_audit rows with its timing.
+
+    `audit` holds extra load_audit values for the row of the task's own table;
+    `marks` are high-water marks the work fills in, recorded once it is done.
+    """
+    started_at = datetime.now()
+    started = time.perf_counter()
+    totals = work()
+    timing = {"started_at": started_at, "duration_seconds": time.perf_counter() - started}
+    active = instrumentation.current_run()
+    if active is not None:
+        timing["run_id"] = active.run_id
+
+    totals.setdefault(name, 0)
+    lines = []
+    for table_name, rows in totals.items():
+        if table_name == quarantine.QUARANTINE_TABLE:
+            log_audit(table_name, rows, status="quarantined", stage=name, **timing)
+            lines.append(f"🚧 Quarantined {rows} {name} rows")
+            continue
+        extra = ({**(audit or {}), **(marks or {}), **timing}
+                 if table_name == name else timing)
+        detail = ""
+        if isinstance(rows, dict):
+            extra = {**extra, **{f"{outcome}_count": rows[outcome]
+                                 for outcome in UPSERT_OUTCOMES}}
+            detail = " (" + ", ".join(f"{rows[o]} {o}" for o in UPSERT_OUTCOMES) + ")"
+            rows = sum(rows.values())
+        log_audit(table_name, rows, **extra)
+        lines.append(f"✅ Loaded {rows} {table_name}{detail}")
+    lines.append(f"⏱️ {name} task finished in {timing['duration_seconds']:.2f}s")
+    print("\n".join(lines) + "\n", end="")  # one write, so concurrent tasks don't interleave
+    return totals
+
+
+def load_data(chunk_size=None, resume=False, full_reload=False, fmt="csv", workers=None,
+              from_s3=False, s3_day=None, csv_engine=None, bulk=False, concurrently=False):
+    """Load customers, products and transactions, respecting FK order.
+
+    `chunk_size` switches to the streaming mode: each file is processed in
+    chunks of that many rows, so memory stays bounded by the chunk size.
+    Files whose fingerprint matches the last load are skipped and appended
+    rows of append-only files are loaded on their own, unless `full_reload`.
+    `fmt="parquet"` reads the latest Parquet partition of each entity instead
+    of the CSVs. `from_s3` streams the latest uploads straight from the S3
+    raw zone (optionally of day `s3_day`) instead of local files.
+    `csv_engine="pyarrow"` parses whole (unchunked) CSVs with pyarrow. The
+    analytics rollups are updated from the loaded rows.
+    Tasks run as the LOAD_DEPENDENCIES DAG on `workers` threads (default:
+    one per task, 1 = sequential). Per-stage spans are written to
+    load_audit with status "span" under the run's run_id.
+
+    `bulk` loads an empty target with its secondary indexes and foreign
+    keys deferred (see bulk_load), rebuilding them at the end, CONCURRENTLY
+    with `concurrently`; a target holding rows is loaded normally.
+    """
+    ensure_audit_tables()
+    rollups.ensure_rollups()
+    with instrumentation.run("load") as run:
+        bulk_load.restore(concurrently)  # left over by an interrupted bulk load
+        deferred = bulk and bulk_load.begin()
+        if bulk and not deferred:
+            print("⚠️ Bulk load needs empty target tables — loading normally")
+        try:
+            results = _load_tasks(chunk_size, resume, full_reload, fmt, workers,
+                                  from_s3, s3_day, csv_engine, update_rollups=not deferred)
+        finally:
+            if deferred:
+                bulk_load.finish(concurrently)
+    log_spans(run)
+    return results
+
+
+def _load_tasks(chunk_size, resume, full_reload, fmt, workers, from_s3, s3_day, csv_engine,
+                update_rollups=True):
+    tasks = {}
+    for source in LOAD_STAGES:
+        files = source_files(source, fmt, from_s3, s3_day)
+        if not files:
+            print(f"❌ {source} {fmt} source not found" + (" in S3" if from_s3 else ""))
+            continue
+
+        path = files[0] if len(files) == 1 else os.path.dirname(files[0])
+        mode, info = plan_load(source, files, full_reload)
+        marks = {"max_id": info["max_id"], "max_timestamp": info["max_timestamp"]}
+        source_audit = {"source_file": path, "fingerprint": info["fingerprint"],
+                        "file_size": info["file_size"]}
+
+        if mode == "skip":
+            log_audit(source, 0, status="skipped", **source_audit, **marks)
+            print(f"⏭️ {path} unchanged since last load — skipped")
+            continue
+        if mode == "append":
+            print(f"➕ {path} appended — loading from byte {info['byte_offset']}")
+
+        tasks[source] = partial(
+            run_task, source,
+            partial(load_source, source, files, chunk_size, resume,
+                    byte_offset=info["byte_offset"], marks=marks, engine=csv_engine,
+                    update_rollups=update_rollups),
+            audit=source_audit, marks=marks,
+        )
+        # From S3 this would download the transactions a second time; the
+        # transactions stage resolves (and inserts) payment methods itself.
+        if source == "transactions" and not from_s3:
+            tasks["payment_methods"] = partial(
+                run_task, "payment_methods",
+                partial(load_payment_methods, files, chunk_size, info["byte_offset"]),
+            )
+
+    dependencies = {name: [dep for dep in LOAD_DEPENDENCIES[name] if dep in tasks]
+                    for name in tasks}
+    return run_dag(tasks, dependencies, workers)
 
 
 # ---------- MAIN ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Load raw files into PostgreSQL.")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="stream each file in chunks of N rows, committing per chunk")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted chunked load from its last committed chunk")
+    parser.add_argument("--full-reload", action="store_true",
+                        help="ignore fingerprints and high-water marks and reload every file")
+    parser.add_argument("--format", choices=FORMATS, default="csv",
+                        help="read the CSVs or the latest Parquet partitions")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="load tasks run concurrently (default: all ready tasks, 1 = sequential)")
+    parser.add_argument("--from-s3", action="store_true",
+                        help="stream the latest uploads from the S3 raw zone, not local files")
+    parser.add_argument("--s3-day", default=None, metavar="YYYY-MM-DD",
+                        help="with --from-s3, read this day partition instead of the newest")
+    parser.add_argument("--csv-engine", choices=schema.CSV_ENGINES, default="c",
+                        help="CSV parser for unchunked loads (pyarrow is several times faster)")
+    parser.add_argument("--bulk", action="store_true",
+                        help="initial load: defer secondary indexes and foreign keys until the "
+                             "end (only when the target tables are empty)")
+    parser.add_argument("--concurrently", action="store_true",
+                        help="with --bulk, rebuild the indexes with CREATE INDEX CONCURRENTLY")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.s3_day and not args.from_s3:
+        parser.error("--s3-day needs --from-s3")
+    if args.concurrently and not args.bulk:
+        parser.error("--concurrently needs --bulk")
+
+    with instrumentation.run("load", trace_memory=args.trace_memory) as run:
+        load_data(chunk_size=args.chunk_size, resume=args.resume,
+                  full_reload=args.full_reload, fmt=args.format, workers=args.workers,
+                  from_s3=args.from_s3, s3_day=args.s3_day, csv_engine=args.csv_engine,
+                  bulk=args.bulk, concurrently=args.concurrently)
+    instrumentation.export(run, args)
+
+
 if __name__ == "__main__":
-    load_data()
\ No newline at end of file
+    cli()
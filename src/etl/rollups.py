@@ -0,0 +1,225 @@
+# src/etl/rollups.py
+"""
+Incremental maintenance of the analytics rollup tables.
+
+order_values holds one row per transaction (customer, day, value at current
+product prices). daily_revenue and customer_spend are re-aggregated from
+order_values for just the days / customers a load touched, and
+product_sales is adjusted by quantity deltas. Every function runs inside the
+caller's transaction, so rollups commit atomically with the loaded chunk.
+
+Loads may run concurrently (a stream next to a batch load), so rows are
+upserted rather than deleted and re-inserted, and re-aggregating a day or
+customer first takes a transaction-level advisory lock on it: a second load
+waits for the first to commit, then aggregates including its rows.
+"""
+from sqlalchemy import text
+from src.scripts.db_setup import (
+    Base, CustomerSpend, DailyRevenue, OrderValue, ProductSales, get_engine
+)
+
+ROLLUP_TABLES = [
+    OrderValue.__table__,
+    DailyRevenue.__table__,
+    CustomerSpend.__table__,
+    ProductSales.__table__,
+]
+
+ORDER_VALUES_SQL = """
+    INSERT INTO order_values (transaction_id, customer_id, order_date, order_value)
+    SELECT t.id, t.customer_id, t.timestamp::date, SUM(ti.quantity * p.price)
+    FROM transactions t
+    JOIN transaction_items ti ON t.id = ti.transaction_id
+    JOIN products p ON ti.product_id = p.id
+    {where}
+    GROUP BY t.id, t.customer_id, t.timestamp::date
+    ON CONFLICT (transaction_id) DO UPDATE SET
+        customer_id = EXCLUDED.customer_id,
+        order_date = EXCLUDED.order_date,
+        order_value = EXCLUDED.order_value
+"""
+
+DAILY_REVENUE_SQL = """
+    INSERT INTO daily_revenue (day, revenue, order_count)
+    SELECT order_date, SUM(order_value), COUNT(*)
+    FROM order_values
+    {where}
+    GROUP BY order_date
+    ON CONFLICT (day) DO UPDATE SET
+        revenue = EXCLUDED.revenue,
+        order_count = EXCLUDED.order_count
+"""
+
+CUSTOMER_SPEND_SQL = """
+    INSERT INTO customer_spend (customer_id, total_spent, order_count)
+    SELECT customer_id, SUM(order_value), COUNT(*)
+    FROM order_values
+    {where}
+    GROUP BY customer_id
+    ON CONFLICT (customer_id) DO UPDATE SET
+        total_spent = EXCLUDED.total_spent,
+        order_count = EXCLUDED.order_count
+"""
+
+# Advisory lock namespaces (first key of pg_advisory_xact_lock(int, int))
+DAY_LOCK = 1
+CUSTOMER_LOCK = 2
+
+PRODUCT_SALES_SQL = """
+    INSERT INTO product_sales (product_id, total_quantity)
+    SELECT product_id, SUM(quantity)
+    FROM transaction_items
+    GROUP BY product_id
+"""
+
+
+# ---------- Setup ----------
+def ensure_rollups():
+    """Create missing rollup tables and backfill them once from existing data."""
+    engine = get_engine()
+    Base.metadata.create_all(engine, tables=ROLLUP_TABLES)
+    with engine.begin() as conn:
+        needs_backfill = conn.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM transaction_items) "
+            "AND NOT EXISTS (SELECT 1 FROM order_values)"
+        )).scalar()
+        if needs_backfill:
+            print("🧮 Backfilling rollup tables from existing data...")
+            rebuild_rollups(conn)
+
+
+def rebuild_rollups(conn):
+    """Recompute every rollup from the base tables."""
+    conn.execute(text(
+        "TRUNCATE order_values, daily_revenue, customer_spend, product_sales"
+    ))
+    conn.execute(text(ORDER_VALUES_SQL.format(where="")))
+    conn.execute(text(DAILY_REVENUE_SQL.format(where="")))
+    conn.execute(text(CUSTOMER_SPEND_SQL.format(where="")))
+    conn.execute(text(PRODUCT_SALES_SQL))
+
+
+# ---------- Incremental Updates ----------
+def item_quantities(conn, transaction_ids):
+    """Quantity per product over the items of the given transactions."""
+    rows = conn.execute(
+        text("""
+            SELECT product_id, SUM(quantity)
+            FROM transaction_items
+            WHERE transaction_id = ANY(:ids)
+            GROUP BY product_id
+        """),
+        {"ids": transaction_ids},
+    ).fetchall()
+    return dict(rows)
+
+
+def apply_product_deltas(conn, before, after):
+    """Add the quantity change between two item_quantities() snapshots.
+
+    Products whose quantity nets to zero are deleted, as rebuild_rollups
+    would have no row for them.
+    """
+    deltas = {pid: after.get(pid, 0) - before.get(pid, 0) for pid in {*before, *after}}
+    deltas = {pid: delta for pid, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    conn.execute(
+        text("""
+            INSERT INTO product_sales (product_id, total_quantity)
+            SELECT * FROM unnest(CAST(:pids AS INTEGER[]), CAST(:deltas AS BIGINT[]))
+            ON CONFLICT (product_id) DO UPDATE
+            SET total_quantity = product_sales.total_quantity + EXCLUDED.total_quantity
+        """),
+        {"pids": [int(p) for p in deltas], "deltas": [int(d) for d in deltas.values()]},
+    )
+    conn.execute(
+        text("DELETE FROM product_sales WHERE product_id = ANY(:pids) AND total_quantity = 0"),
+        {"pids": [int(p) for p in deltas]},
+    )
+
+
+def lock_rollup_keys(conn):
+    """Lock the days, then the customers, of _rollup_keys, each in sorted
+    order so concurrent loads cannot deadlock on them."""
+    conn.execute(text("""
+        SELECT pg_advisory_xact_lock(:namespace, day - DATE '2000-01-01')
+        FROM (SELECT DISTINCT order_date AS day FROM _rollup_keys ORDER BY 1) days
+    """), {"namespace": DAY_LOCK})
+    conn.execute(text("""
+        SELECT pg_advisory_xact_lock(:namespace, customer_id)
+        FROM (SELECT DISTINCT customer_id FROM _rollup_keys ORDER BY 1) customers
+    """), {"namespace": CUSTOMER_LOCK})
+
+
+def refresh_orders(conn, transaction_ids):
+    """Recompute order_values for the given transactions, then re-aggregate
+    daily_revenue and customer_spend for every day and customer they touched
+    before or after the change."""
+    if not transaction_ids:
+        return
+    params = {"ids": transaction_ids}
+    conn.execute(text("""
+        CREATE TEMP TABLE _rollup_keys ON COMMIT DROP AS
+        SELECT order_date, customer_id FROM order_values WHERE transaction_id = ANY(:ids)
+    """), params)
+    conn.execute(text(ORDER_VALUES_SQL.format(where="WHERE t.id = ANY(:ids)")), params)
+    conn.execute(text("""
+        DELETE FROM order_values o
+        WHERE o.transaction_id = ANY(:ids)
+          AND NOT EXISTS (SELECT 1 FROM transaction_items ti
+                          WHERE ti.transaction_id = o.transaction_id)
+    """), params)
+    conn.execute(text("""
+        INSERT INTO _rollup_keys
+        SELECT order_date, customer_id FROM order_values WHERE transaction_id = ANY(:ids)
+    """), params)
+    lock_rollup_keys(conn)
+
+    conn.execute(text(DAILY_REVENUE_SQL.format(
+        where="WHERE order_date IN (SELECT order_date FROM _rollup_keys)"
+    )))
+    conn.execute(text("""
+        DELETE FROM daily_revenue d
+        WHERE d.day IN (SELECT order_date FROM _rollup_keys)
+          AND NOT EXISTS (SELECT 1 FROM order_values o WHERE o.order_date = d.day)
+    """))
+    conn.execute(text(CUSTOMER_SPEND_SQL.format(
+        where="WHERE customer_id IN (SELECT customer_id FROM _rollup_keys)"
+    )))
+    conn.execute(text("""
+        DELETE FROM customer_spend c
+        WHERE c.customer_id IN (SELECT customer_id FROM _rollup_keys)
+          AND NOT EXISTS (SELECT 1 FROM order_values o WHERE o.customer_id = c.customer_id)
+    """))
+    conn.execute(text("DROP TABLE _rollup_keys"))
+
+
+def refresh_products(conn, product_ids):
+    """Re-value the orders containing products whose price changed."""
+    if not product_ids:
+        return
+    transaction_ids = [r[0] for r in conn.execute(
+        text("SELECT DISTINCT transaction_id FROM transaction_items WHERE product_id = ANY(:ids)"),
+        {"ids": product_ids},
+    ).fetchall()]
+    refresh_orders(conn, transaction_ids)
+
+
+def changed_prices(conn, df):
+    """Ids of products in `df` whose price differs from the stored one."""
+    stored = dict(conn.execute(
+        text("SELECT id, price FROM products WHERE id = ANY(:ids)"),
+        {"ids": [int(i) for i in df["id"]]},
+    ).fetchall())
+    return [int(pid) for pid, price in zip(df["id"], df["price"])
+            if int(pid) in stored and stored[int(pid)] != price]
+
+
+# ---------- CLI ----------
+if __name__ == "__main__":
+    engine = get_engine()
+    Base.metadata.create_all(engine, tables=ROLLUP_TABLES)
+    with engine.begin() as conn:
+        rebuild_rollups(conn)
+    print("✅ Rollup tables rebuilt.")
@@ -0,0 +1,58 @@
+# src/etl/scheduler.py
+"""
+Minimal DAG runner for load tasks.
+
+Tasks are callables keyed by name; `dependencies` maps a task to the tasks
+that must finish first. Ready tasks run concurrently on a thread pool (the
+work is database round-trips and pandas parsing, which release the GIL).
+When a task fails nothing new is started, running tasks are allowed to
+finish, and the first error is raised.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def check_dag(tasks, dependencies):
+    """Raise ValueError for unknown dependencies or cycles."""
+    for name, deps in dependencies.items():
+        unknown = set(deps) - set(tasks)
+        if unknown:
+            raise ValueError(f"Task {name} depends on unknown tasks: {sorted(unknown)}")
+
+    done, remaining = set(), set(tasks)
+    while remaining:
+        ready = {name for name in remaining if set(dependencies.get(name, ())) <= done}
+        if not ready:
+            raise ValueError(f"Dependency cycle among tasks: {sorted(remaining)}")
+        done |= ready
+        remaining -= ready
+
+
+def run_dag(tasks, dependencies, workers=None):
+    """Run every task once its dependencies are done; returns {name: result}."""
+    check_dag(tasks, dependencies)
+    results = {}
+    pending = dict(tasks)
+    running = {}
+    error = None
+
+    with ThreadPoolExecutor(max_workers=workers or len(tasks) or 1) as executor:
+        while pending or running:
+            if error is None:
+                for name in [n for n in pending
+                             if set(dependencies.get(n, ())) <= results.keys()]:
+                    running[executor.submit(pending.pop(name))] = name
+            if not running:
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    error = error or e
+                    pending.clear()
+
+    if error is not None:
+        raise error
+    return results
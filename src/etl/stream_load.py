@@ -0,0 +1,277 @@
+# src/etl/stream_load.py
+"""
+Continuous loading of the transaction micro-batch stream.
+
+`python -m src generate --stream` emits transactions as numbered CSV
+micro-batches (raw_zone.stream_batch_path). The stream loader tails that
+directory and commits the batches through the regular transactions stage:
+in-line quarantine, upserts and incremental rollups, in one transaction per
+commit.
+
+Files that arrive close together are coalesced into one commit, which
+amortizes the commit and rollup costs under load. A commit happens when
+the pending rows reach `max_batch_rows`, or when the first pending file
+has waited `max_latency` seconds, which bounds the time between an
+arrival and its commit. The sequence number of the last committed file
+is saved in stream_offsets in the same transaction, so a restarted loader
+continues exactly after the last commit.
+
+Every `report_seconds` the loader prints the sustained throughput and the
+end-to-end lag (commit time minus event timestamp) of the interval, and
+writes a load_audit row for it, which also refreshes the analytics cache.
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+
+from src import instrumentation, schema
+from src.etl import dimensions, quarantine, rollups
+from src.etl.load_to_db import (
+    bump_data_version, ensure_audit_tables, load_transactions_chunk, log_audit, log_spans
+)
+from src.instrumentation import span
+from src.raw_zone import STREAM_DIR, stream_batch_seq, stream_batches
+from src.scripts.db_setup import get_engine
+
+OFFSETS_TABLE = "stream_offsets"
+SOURCE = "transactions"
+
+DEFAULT_MAX_LATENCY = 1.0  # seconds a received file may wait for its commit
+DEFAULT_MAX_BATCH_ROWS = 50_000
+DEFAULT_REPORT_SECONDS = 10
+POLL_SECONDS = 0.1
+
+
+def create_table(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {OFFSETS_TABLE} (
+            stream TEXT PRIMARY KEY,
+            last_seq BIGINT NOT NULL,
+            rows_committed BIGINT NOT NULL,
+            updated_at TIMESTAMP DEFAULT NOW()
+        );
+    """))
+
+
+# ---------- Offsets ----------
+def get_offset(stream):
+    """(last committed file sequence number, rows committed) of a stream."""
+    with get_engine().begin() as conn:
+        create_table(conn)
+        row = conn.execute(
+            text(f"SELECT last_seq, rows_committed FROM {OFFSETS_TABLE} WHERE stream = :s"),
+            {"s": stream},
+        ).fetchone()
+    return (row.last_seq, row.rows_committed) if row else (0, 0)
+
+
+def save_offset(conn, stream, last_seq, rows_committed):
+    conn.execute(
+        text(f"""
+            INSERT INTO {OFFSETS_TABLE} (stream, last_seq, rows_committed, updated_at)
+            VALUES (:s, :seq, :r, NOW())
+            ON CONFLICT (stream) DO UPDATE SET
+                last_seq = EXCLUDED.last_seq,
+                rows_committed = EXCLUDED.rows_committed,
+                updated_at = EXCLUDED.updated_at
+        """),
+        {"s": stream, "seq": last_seq, "r": rows_committed},
+    )
+
+
+# ---------- Metrics ----------
+class StreamStats:
+    """Throughput and lag of the commits since the last report."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.started = time.monotonic()
+        self.totals = {"events": 0, "commits": 0, "quarantined": 0}
+        self.max_lag = 0.0
+        self._reset()
+
+    def _reset(self):
+        self.interval_started = time.monotonic()
+        self.interval_started_at = datetime.now()
+        self.events = 0
+        self.commits = 0
+        self.max_id = None
+        self.lags = []
+
+    def add(self, events, quarantined, lags, max_id):
+        self.events += events
+        self.commits += 1
+        self.lags.append(lags)
+        if max_id is not None:
+            self.max_id = max(max_id, self.max_id or max_id)
+        self.totals["events"] += events
+        self.totals["commits"] += 1
+        self.totals["quarantined"] += quarantined
+        if len(lags):
+            self.max_lag = max(self.max_lag, float(lags.max()))
+
+    def report(self, backlog):
+        """Print and audit the interval, then start a new one."""
+        seconds = time.monotonic() - self.interval_started
+        if self.commits:
+            lags = np.concatenate(self.lags)
+            lag = (f"lag p50 {np.percentile(lags, 50):.2f}s p95 {np.percentile(lags, 95):.2f}s "
+                   f"max {lags.max():.2f}s" if len(lags) else "lag n/a")
+            print(f"📈 {self.events} events in {seconds:.1f}s ({self.events / seconds:.0f}/s), "
+                  f"{self.commits} commits, {lag}, backlog {backlog} files")
+            active = instrumentation.current_run()
+            log_audit(SOURCE, self.events, source_file=self.stream,
+                      max_id=self.max_id, started_at=self.interval_started_at,
+                      duration_seconds=seconds, rows_per_sec=self.events / seconds,
+                      stage="stream", run_id=active.run_id if active else None)
+        self._reset()
+
+    def summary(self):
+        seconds = time.monotonic() - self.started
+        return (f"📊 Stream: {self.totals['events']} events in {seconds:.1f}s "
+                f"({self.totals['events'] / seconds:.0f}/s), {self.totals['commits']} commits, "
+                f"{self.totals['quarantined']} quarantined, max lag {self.max_lag:.2f}s")
+
+
+# ---------- Commits ----------
+def _event_lags(df, committed_at):
+    """Seconds between each event's timestamp and its commit."""
+    timestamps = pd.to_datetime(df["timestamp"], format="ISO8601", errors="coerce")
+    return ((committed_at - timestamps).dt.total_seconds()).dropna().to_numpy()
+
+
+def commit_batch(stream, paths, frames, rows_committed, stats, remove_loaded=False):
+    """Load pending micro-batches in one transaction, with the new offset.
+
+    Returns the stream's new committed row count.
+    """
+    df = pd.concat(frames, ignore_index=True)
+    active = instrumentation.current_run()
+    last_seq = stream_batch_seq(paths[-1])
+    try:
+        with span("stream_commit", SOURCE, rows=len(df)), get_engine().begin() as conn:
+            chunk, rejected = quarantine.check_chunk(conn, SOURCE, df)
+            quarantined = quarantine.store(conn, SOURCE, rejected, stream,
+                                           active.run_id if active else None)
+            if not chunk.empty:
+                load_transactions_chunk(chunk, conn)
+                bump_data_version(conn, SOURCE)
+            save_offset(conn, stream, last_seq, rows_committed + len(df))
+    except Exception:
+        # Keys cached during the rolled-back transaction may not exist
+        dimensions.clear_caches()
+        raise
+    ids = pd.to_numeric(chunk["id"], errors="coerce")
+    stats.add(len(df), quarantined, _event_lags(chunk, datetime.now()),
+              int(ids.max()) if ids.notna().any() else None)
+    if quarantined:
+        reasons = ", ".join(f"{reason}: {n}"
+                            for reason, n in quarantine.summarize(rejected).items())
+        print(f"   🚧 {SOURCE}: {quarantined} rows quarantined ({reasons})")
+    if remove_loaded:
+        for path in paths:
+            os.remove(path)
+    return rows_committed + len(df)
+
+
+# ---------- Tail ----------
+def follow(stream_dir=STREAM_DIR, max_latency=DEFAULT_MAX_LATENCY,
+           max_batch_rows=DEFAULT_MAX_BATCH_ROWS, report_seconds=DEFAULT_REPORT_SECONDS,
+           duration=None, idle_timeout=None, remove_loaded=False):
+    """Tail `stream_dir` and commit its micro-batches until `duration`
+    seconds have passed, no file arrived for `idle_timeout` seconds, or
+    Ctrl-C. Pending files are committed before returning.
+
+    Returns the number of events committed.
+    """
+    ensure_audit_tables()
+    rollups.ensure_rollups()
+    stream = os.path.normpath(stream_dir)
+    last_seq, rows_committed = get_offset(stream)
+    if last_seq:
+        print(f"⏩ Resuming {stream} after batch {last_seq} ({rows_committed} rows)")
+    stats = StreamStats(stream)
+    read_seq = last_seq  # last file read, committed or pending
+    paths, frames, pending_rows, first_arrival = [], [], 0, None
+    started = last_arrival = time.monotonic()
+    next_report = started + report_seconds
+
+    def flush():
+        nonlocal paths, frames, pending_rows, first_arrival, rows_committed
+        if paths:
+            rows_committed = commit_batch(stream, paths, frames, rows_committed, stats,
+                                          remove_loaded)
+        paths, frames, pending_rows, first_arrival = [], [], 0, None
+
+    try:
+        while True:
+            arrived = stream_batches(stream_dir, after=read_seq)
+            for path in arrived:
+                with span("csv_read", SOURCE) as timer:
+                    df = schema.read_csv(path, entity=SOURCE)
+                    timer.rows, timer.bytes = len(df), os.path.getsize(path)
+                read_seq = stream_batch_seq(path)
+                paths.append(path)
+                frames.append(df)
+                pending_rows += len(df)
+                first_arrival = first_arrival or time.monotonic()
+                if pending_rows >= max_batch_rows:
+                    flush()
+
+            now = time.monotonic()
+            if arrived:
+                last_arrival = now
+            if first_arrival is not None and now - first_arrival >= max_latency:
+                flush()
+            if now >= next_report:
+                stats.report(len(stream_batches(stream_dir, after=read_seq)))
+                next_report += report_seconds
+            if (duration is not None and now - started >= duration) or \
+                    (idle_timeout is not None and now - last_arrival >= idle_timeout):
+                break
+            if not arrived:
+                time.sleep(POLL_SECONDS)
+    except KeyboardInterrupt:
+        pass
+    flush()
+    stats.report(len(stream_batches(stream_dir, after=read_seq)))
+    print(stats.summary())
+    return stats.totals["events"]
+
+
+# ---------- MAIN ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Tail the transaction micro-batch stream into PostgreSQL.")
+    parser.add_argument("--stream-dir", default=STREAM_DIR)
+    parser.add_argument("--max-latency", type=float, default=DEFAULT_MAX_LATENCY,
+                        help="seconds a received batch may wait to be coalesced before commit")
+    parser.add_argument("--max-batch-rows", type=int, default=DEFAULT_MAX_BATCH_ROWS,
+                        help="commit as soon as this many rows are pending")
+    parser.add_argument("--report-seconds", type=float, default=DEFAULT_REPORT_SECONDS,
+                        help="throughput/lag report interval")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="stop after N seconds (default: until Ctrl-C)")
+    parser.add_argument("--idle-timeout", type=float, default=None,
+                        help="stop when no batch arrived for N seconds")
+    parser.add_argument("--remove-loaded", action="store_true",
+                        help="delete micro-batch files once committed")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    with instrumentation.run("stream", trace_memory=args.trace_memory) as run:
+        follow(stream_dir=args.stream_dir, max_latency=args.max_latency,
+               max_batch_rows=args.max_batch_rows, report_seconds=args.report_seconds,
+               duration=args.duration, idle_timeout=args.idle_timeout,
+               remove_loaded=args.remove_loaded)
+    log_spans(run)
+    instrumentation.export(run, args)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,346 @@
+# src/export.py
+"""
+Stream warehouse tables and analytics queries to CSV or Parquet files.
+
+Rows are read through a server-side cursor (stream_results, i.e. a
+psycopg2 named cursor) in batches of `batch_size` and written as they
+arrive, so client memory stays bounded by one batch whatever the size of
+the result.
+
+With `parallel` > 1 the rows are split into ranges of an integer key and
+the ranges are exported concurrently, one connection and one part file
+each. The workers all read the snapshot exported by a coordinating
+transaction (pg_export_snapshot, as pg_dump -j does), so the parts are
+consistent with each other even while loads are running.
+"""
+import os
+import re
+import csv
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from sqlalchemy import inspect, text
+
+from src import instrumentation
+from src.raw_zone import FORMATS, PARQUET_COMPRESSION, require_pyarrow
+
+EXPORT_DIR = os.path.join("data", "exports")
+EXPORT_BATCH_SIZE = 50_000  # rows fetched from the cursor and written at once
+
+# Named exports: name -> (sql, key column, sql returning the key's min and max)
+EXPORT_QUERIES = {
+    # Per-transaction order values (the inner query of "Average Order Value by Country")
+    "order-values": ("""
+        SELECT
+            t.id AS transaction_id,
+            t.customer_id,
+            c.country,
+            t.timestamp,
+            SUM(ti.quantity * p.price) AS order_value
+        FROM transactions t
+        JOIN customers c ON t.customer_id = c.id
+        JOIN transaction_items ti ON t.id = ti.transaction_id
+        JOIN products p ON ti.product_id = p.id
+        GROUP BY t.id, t.customer_id, c.country, t.timestamp
+    """, "transaction_id", "SELECT MIN(id), MAX(id) FROM transactions"),
+    # One row per transaction item, with its customer and product attributes
+    "sales-lines": ("""
+        SELECT
+            ti.transaction_id,
+            t.timestamp,
+            t.customer_id,
+            c.country,
+            ti.product_id,
+            p.category,
+            ti.quantity,
+            p.price,
+            ti.quantity * p.price AS line_value,
+            pm.method AS payment_method
+        FROM transaction_items ti
+        JOIN transactions t ON t.id = ti.transaction_id
+        JOIN customers c ON t.customer_id = c.id
+        JOIN products p ON ti.product_id = p.id
+        LEFT JOIN payment_methods pm ON t.payment_method_id = pm.id
+    """, "transaction_id", "SELECT MIN(id), MAX(id) FROM transactions"),
+}
+
+
+# ---------- Sources ----------
+def table_source(table):
+    """(sql, key, bounds sql) exporting a whole table, keyed on its primary key."""
+    from src.scripts.db_setup import get_engine
+
+    quote = get_engine().dialect.identifier_preparer.quote
+    inspector = inspect(get_engine())
+    if not inspector.has_table(table):
+        raise ValueError(f"Unknown table: {table}")
+    primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+    key = primary_key[0] if primary_key else None
+    bounds = (f"SELECT MIN({quote(key)}), MAX({quote(key)}) FROM {quote(table)}"
+              if key else None)
+    return f"SELECT * FROM {quote(table)}", key, bounds
+
+
+def sql_file_source(path, title=None):
+    """(sql, None, None) for a query of a SQL file, picked by its title when
+    the file holds several."""
+    from src.analytics import sql_queries
+
+    queries = sql_queries(path)
+    if title is not None:
+        queries = [(t, sql) for t, sql in queries if t == title]
+    if len(queries) != 1:
+        titles = ", ".join(f"'{t}'" for t, _ in sql_queries(path))
+        raise ValueError(f"Pick one query of {path} with a title: {titles}")
+    return queries[0][1], None, None
+
+
+# ---------- Writers ----------
+def _arrow_type(pa, type_code):
+    """Arrow type for a Postgres type OID; other types are exported as strings."""
+    types = {
+        16: pa.bool_(), 20: pa.int64(), 21: pa.int16(), 23: pa.int32(),
+        700: pa.float32(), 701: pa.float64(), 1700: pa.float64(),  # numeric
+        1082: pa.date32(), 1114: pa.timestamp("us"), 1184: pa.timestamp("us", tz="UTC"),
+    }
+    return types.get(type_code, pa.string())
+
+
+class CsvWriter:
+    """CSV with a header row; NULLs are empty fields, as in the raw zone."""
+
+    def __init__(self, path, description):
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self.tmp_path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column.name for column in description])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self.tmp_path)
+
+
+class ParquetWriter:
+    """Parquet file with one row group per batch, typed from the cursor."""
+
+    def __init__(self, path, description):
+        pa = self._pa = require_pyarrow()
+        import pyarrow.parquet as pq
+
+        self.path = path
+        self.tmp_path = f"{path}.{os.getpid()}.tmp"
+        self.schema = pa.schema([(column.name, _arrow_type(pa, column.type_code))
+                                 for column in description])
+        self._writer = pq.ParquetWriter(self.tmp_path, self.schema,
+                                        compression=PARQUET_COMPRESSION)
+
+    def _array(self, values, field):
+        pa = self._pa
+        if pa.types.is_floating(field.type):
+            values = [None if v is None else float(v) for v in values]  # Decimal
+        elif pa.types.is_string(field.type):
+            values = [None if v is None else str(v) for v in values]
+        return pa.array(values, type=field.type)
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._array(values, field) for values, field in zip(columns, self.schema)],
+            schema=self.schema,
+        ))
+        return os.path.getsize(self.tmp_path)
+
+    def close(self):
+        self._writer.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self._writer.close()
+        os.remove(self.tmp_path)
+
+
+WRITERS = {"csv": CsvWriter, "parquet": ParquetWriter}
+
+
+# ---------- Export ----------
+def stream_to_file(conn, sql, params, path, fmt="csv", batch_size=EXPORT_BATCH_SIZE):
+    """Stream a query's rows into one file; returns (rows, bytes).
+
+    The file appears (atomically) only once every row is written.
+    """
+    result = conn.execution_options(stream_results=True).execute(text(sql), params)
+    name = os.path.basename(path)
+    writer = WRITERS[fmt](path, result.cursor.description)
+    rows = size = 0
+    try:
+        batches = result.yield_per(batch_size).partitions()
+        for batch in instrumentation.timed_chunks(batches, "export_fetch", name):
+            with instrumentation.span("export_write", name, rows=len(batch)) as timer:
+                written = writer.write(batch)
+                timer.bytes = written - size
+            rows, size = rows + len(batch), written
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        result.close()
+    writer.close()
+    return rows, os.path.getsize(path)
+
+
+def key_ranges(low, high, parts):
+    """Up to `parts` contiguous [start, stop) ranges covering low..high."""
+    step = -(-(high - low + 1) // parts)
+    return [(start, min(start + step, high + 1)) for start in range(low, high + 1, step)]
+
+
+def _range_sql(sql, key, last):
+    """`sql` restricted to one key range; the last range also takes NULL keys."""
+    condition = "q.{key} >= :start AND q.{key} < :stop".format(key=key)
+    if last:
+        condition = f"({condition}) OR q.{key} IS NULL"
+    return f"SELECT * FROM ({sql}) AS q WHERE {condition}"
+
+
+def _init_worker():
+    from src.scripts.db_setup import get_engine
+
+    # Forked workers must not reuse the parent's pooled connections
+    get_engine().dispose(close=False)
+
+
+def _export_range(snapshot, sql, params, path, fmt, batch_size):
+    """Export one key range in a worker process; returns (rows, bytes,
+    seconds, peak RSS) for the parent to record."""
+    from src.scripts.db_setup import get_engine
+
+    started = time.perf_counter()
+    with get_engine().connect() as conn:
+        conn.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"))
+        conn.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot}'"))
+        rows, size = stream_to_file(conn, sql, params, path, fmt, batch_size)
+    return rows, size, time.perf_counter() - started, instrumentation.peak_rss_bytes()
+
+
+def export(sql, path, fmt="csv", batch_size=EXPORT_BATCH_SIZE, parallel=1, key=None,
+           bounds_sql=None):
+    """Export the rows of `sql` to `path`; returns [(part path, rows, bytes)].
+
+    With `parallel` > 1, `path` is a directory receiving part-NNNNN files,
+    one per range of the integer column `key`, written by a pool of
+    processes (fetching and encoding rows is CPU-bound on the client);
+    `bounds_sql` returns the key's min and max cheaply (by default they are
+    computed over `sql`).
+    """
+    from src.scripts.db_setup import get_engine
+
+    if parallel <= 1:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with get_engine().connect() as conn:
+            return [(path, *stream_to_file(conn, sql, {}, path, fmt, batch_size))]
+    if key is None:
+        raise ValueError("A parallel export needs a key column to split on")
+
+    quote = get_engine().dialect.identifier_preparer.quote
+    key = quote(key)
+    os.makedirs(path, exist_ok=True)
+    for stale in glob.glob(os.path.join(path, f"part-*.{fmt}")):
+        os.remove(stale)
+
+    with get_engine().connect() as coordinator:
+        coordinator.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ"))
+        snapshot = coordinator.execute(text("SELECT pg_export_snapshot()")).scalar()
+        low, high = coordinator.execute(text(
+            bounds_sql or f"SELECT MIN(q.{key}), MAX(q.{key}) FROM ({sql}) AS q"
+        )).one()
+        ranges = key_ranges(low, high, parallel) if low is not None else [(0, 0)]
+
+        with ProcessPoolExecutor(max_workers=parallel, initializer=_init_worker) as pool:
+            futures = []
+            for i, (start, stop) in enumerate(ranges):
+                part = os.path.join(path, f"part-{i:05d}.{fmt}")
+                part_sql = _range_sql(sql, key, last=(i == len(ranges) - 1))
+                futures.append((part, pool.submit(
+                    _export_range, snapshot, part_sql, {"start": start, "stop": stop},
+                    part, fmt, batch_size,
+                )))
+            parts = []
+            for part, future in futures:
+                rows, size, seconds, peak_memory = future.result()
+                instrumentation.record("export_part", seconds, os.path.basename(part),
+                                       rows=rows, bytes=size, peak_memory_bytes=peak_memory)
+                parts.append((part, rows, size))
+            return parts
+
+
+# ---------- CLI ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Stream a table or an analytics query to CSV/Parquet."
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--table", default=None, help="export this table")
+    source.add_argument("--query", choices=EXPORT_QUERIES, default=None,
+                        help="export a named query")
+    source.add_argument("--sql-file", default=None,
+                        help="export a query of this SQL file (see --title)")
+    parser.add_argument("--title", default=None,
+                        help="with --sql-file, the header comment of the query to export")
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", default=None,
+                        help=f"file, or directory with --parallel (default: {EXPORT_DIR}/<name>)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE,
+                        help="rows fetched from the server-side cursor at a time")
+    parser.add_argument("--parallel", type=int, default=1,
+                        help="export N key ranges concurrently into part files")
+    parser.add_argument("--key", default=None,
+                        help="integer column to split on (default: the table's primary "
+                             "key or the named query's key)")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+
+    try:
+        if args.table:
+            name, (sql, key, bounds_sql) = args.table, table_source(args.table)
+        elif args.query:
+            name, (sql, key, bounds_sql) = args.query, EXPORT_QUERIES[args.query]
+        else:
+            name = os.path.splitext(os.path.basename(args.sql_file))[0]
+            if args.title:
+                name = re.sub(r"[^a-z0-9]+", "-", args.title.lower()).strip("-")
+            sql, key, bounds_sql = sql_file_source(args.sql_file, args.title)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.key and args.key != key:
+        key, bounds_sql = args.key, None
+    if args.parallel > 1 and key is None:
+        parser.error("--parallel needs --key for this source")
+
+    output = args.output or os.path.join(
+        EXPORT_DIR, name if args.parallel > 1 else f"{name}.{args.format}"
+    )
+    with instrumentation.run("export", trace_memory=args.trace_memory) as run:
+        with instrumentation.span("export", name) as total:
+            parts = export(sql, output, args.format, args.batch_size, args.parallel, key,
+                           bounds_sql)
+            total.rows = sum(rows for _, rows, _ in parts)
+            total.bytes = sum(size for _, _, size in parts)
+    print(f"📤 Exported {total.rows} {name} rows to {output} "
+          f"({len(parts)} file{'s' if len(parts) > 1 else ''}, {total.bytes / 2**20:.1f} MB, "
+          f"{total.seconds:.2f}s)")
+    instrumentation.export(run, args)
+
+
+if __name__ == "__main__":
+    cli()
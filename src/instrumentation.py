@@ -0,0 +1,273 @@
+# src/instrumentation.py
+"""
+Lightweight per-stage instrumentation for the pipeline.
+
+A *run* (one load, validation or upload) collects *spans*: timed sections
+such as a CSV read, null normalization, dimension mapping, an upsert, a
+validation check or an S3 upload, each with the rows and bytes it handled
+and the peak memory seen when it ended. Spans are summarized per
+(stage, table) and can be persisted to load_audit (see
+load_to_db.log_spans), written as a Prometheus textfile for the
+node_exporter textfile collector, or as a JSON trace in Chrome trace-event
+format (chrome://tracing, Perfetto).
+
+Peak memory is the process RSS high-water mark by default. With
+trace_memory=True, tracemalloc's peak of Python allocations since the span
+started is used instead; spans running concurrently in threads share that
+peak, so it is an upper bound there.
+
+Outside a run, span() is a no-op apart from the timer, so library code can
+be instrumented unconditionally.
+"""
+import os
+import json
+import time
+import uuid
+import resource
+import threading
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+
+PROMETHEUS_PREFIX = "shopflow"
+
+_current = None
+_current_lock = threading.Lock()
+
+
+# ---------- Measurements ----------
+def peak_rss_bytes():
+    """High-water RSS of this process (ru_maxrss is in KiB on Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Span:
+    """One timed section; set `rows` / `bytes` while it runs if not known upfront."""
+
+    def __init__(self, stage, table=None, rows=None, bytes=None):
+        self.stage = stage
+        self.table = table
+        self.rows = rows
+        self.bytes = bytes
+        self.started_at = None
+        self.seconds = None
+        self.peak_memory_bytes = None
+        self.thread = threading.get_ident()
+
+
+class Run:
+    """Spans collected for one pipeline run."""
+
+    def __init__(self, name, trace_memory=False):
+        self.name = name
+        self.run_id = uuid.uuid4().hex[:12]
+        self.trace_memory = trace_memory
+        self.started_at = datetime.now()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        """Spans aggregated per (stage, table), in first-seen order."""
+        groups = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            group = groups.setdefault((span.stage, span.table), {
+                "stage": span.stage, "table": span.table, "calls": 0, "seconds": 0.0,
+                "rows": None, "bytes": None, "peak_memory_bytes": None,
+            })
+            group["calls"] += 1
+            group["seconds"] += span.seconds
+            for key in ("rows", "bytes"):
+                value = getattr(span, key)
+                if value is not None:
+                    group[key] = (group[key] or 0) + int(value)
+            if span.peak_memory_bytes is not None:
+                group["peak_memory_bytes"] = max(group["peak_memory_bytes"] or 0,
+                                                 span.peak_memory_bytes)
+        for group in groups.values():
+            group["rows_per_sec"] = (group["rows"] / group["seconds"]
+                                     if group["rows"] and group["seconds"] else None)
+        return list(groups.values())
+
+
+# ---------- Runs ----------
+def current_run():
+    return _current
+
+
+@contextmanager
+def run(name, trace_memory=False):
+    """Collect the spans recorded until the block exits into a new Run.
+
+    Nested calls reuse the active run, so an instrumented entry point can
+    open a run whether or not its caller already did.
+    """
+    global _current
+    with _current_lock:
+        outer = _current
+        if outer is None:
+            _current = Run(name, trace_memory)
+    if outer is not None:
+        yield outer
+        return
+
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    try:
+        yield _current
+    finally:
+        with _current_lock:
+            _current = None
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def span(stage, table=None, rows=None, bytes=None):
+    """Time a stage section and record it in the active run, if any."""
+    active = _current
+    item = Span(stage, table, rows, bytes)
+    memory_traced = active is not None and active.trace_memory and tracemalloc.is_tracing()
+    if memory_traced:
+        tracemalloc.reset_peak()
+    item.started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield item
+    finally:
+        item.seconds = time.perf_counter() - started
+        if active is not None:
+            item.peak_memory_bytes = (tracemalloc.get_traced_memory()[1] if memory_traced
+                                        else peak_rss_bytes())
+            active.add(item)
+
+
+def record(stage, seconds, table=None, rows=None, bytes=None, peak_memory_bytes=None):
+    """Add a span measured elsewhere (e.g. in a worker process)."""
+    active = _current
+    if active is None:
+        return
+    item = Span(stage, table, rows, bytes)
+    item.started_at = time.time() - seconds
+    item.seconds = seconds
+    item.peak_memory_bytes = peak_memory_bytes
+    active.add(item)
+
+
+def timed_chunks(chunks, stage, table=None, position=None):
+    """Yield from `chunks`, recording each step as a span.
+
+    `position`, when given, returns the byte offset of the underlying file;
+    its advance is recorded as the bytes of each span.
+    """
+    iterator = iter(chunks)
+    while True:
+        with span(stage, table) as timer:
+            before = position() if position else None
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                timer.rows = 0
+                break
+            timer.rows = len(chunk)
+            if position:
+                timer.bytes = position() - before
+        yield chunk
+
+
+# ---------- Export ----------
+def _labels(run_, group):
+    labels = {"run": run_.name, "stage": group["stage"]}
+    if group["table"]:
+        labels["table"] = group["table"]
+    return ",".join(f'{k}="{v}"' for k, v in labels.items())
+
+
+def write_prometheus(run_, path):
+    """Write the run summary as a Prometheus textfile (atomically, as the
+    textfile collector may read it at any time)."""
+    metrics = [
+        ("stage_duration_seconds", "gauge", "Wall time spent in the stage", "seconds"),
+        ("stage_calls", "gauge", "Spans recorded for the stage", "calls"),
+        ("stage_rows", "gauge", "Rows processed by the stage", "rows"),
+        ("stage_rows_per_second", "gauge", "Stage throughput", "rows_per_sec"),
+        ("stage_bytes", "gauge", "Bytes processed by the stage", "bytes"),
+        ("stage_peak_memory_bytes", "gauge", "Peak memory seen by the stage",
+         "peak_memory_bytes"),
+    ]
+    summary = run_.summary()
+    lines = []
+    for name, kind, help_text, key in metrics:
+        metric = f"{PROMETHEUS_PREFIX}_{name}"
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} {kind}"]
+        for group in summary:
+            if group[key] is not None:
+                lines.append(f"{metric}{{{_labels(run_, group)}}} {group[key]}")
+    metric = f"{PROMETHEUS_PREFIX}_run_timestamp_seconds"
+    lines += [f"# HELP {metric} Start of the last run",
+              f"# TYPE {metric} gauge",
+              f'{metric}{{run="{run_.name}"}} {run_.started_at.timestamp()}']
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, path)
+
+
+def write_trace(run_, path):
+    """Write every span as a Chrome trace-event JSON file."""
+    with run_._lock:
+        spans = list(run_.spans)
+    events = [{
+        "name": s.stage if not s.table else f"{s.stage}:{s.table}",
+        "cat": run_.name,
+        "ph": "X",
+        "ts": s.started_at * 1e6,
+        "dur": s.seconds * 1e6,
+        "pid": os.getpid(),
+        "tid": s.thread,
+        "args": {"rows": s.rows, "bytes": s.bytes, "peak_memory_bytes": s.peak_memory_bytes},
+    } for s in spans]
+    with open(path, "w") as f:
+        json.dump({"traceEvents": events, "otherData": {"run": run_.name,
+                                                          "run_id": run_.run_id}}, f)
+
+
+def print_summary(run_):
+    print(f"\n📈 {run_.name} run {run_.run_id}")
+    for g in run_.summary():
+        rate = f"{g['rows_per_sec']:,.0f} rows/s" if g["rows_per_sec"] else ""
+        memory = f"{g['peak_memory_bytes'] / 2**20:.0f} MB" if g["peak_memory_bytes"] else ""
+        name = f"{g['stage']}:{g['table']}" if g["table"] else g["stage"]
+        print(f"   {name:<40} {g['seconds']:>8.3f}s {rate:>18} {memory:>8}")
+
+
+# ---------- CLI Helpers ----------
+def add_arguments(parser):
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--metrics-file", default=None,
+                       help="write stage metrics as a Prometheus textfile")
+    group.add_argument("--trace-file", default=None,
+                       help="write spans as a Chrome trace-event JSON file")
+    group.add_argument("--trace-memory", action="store_true",
+                       help="measure peak memory with tracemalloc instead of RSS")
+    group.add_argument("--print-spans", action="store_true",
+                       help="print the per-stage summary at the end")
+
+
+def export(run_, args):
+    """Write the exports requested on the command line."""
+    if args.metrics_file:
+        write_prometheus(run_, args.metrics_file)
+        print(f"📝 Metrics written to {args.metrics_file}")
+    if args.trace_file:
+        write_trace(run_, args.trace_file)
+        print(f"📝 Trace written to {args.trace_file}")
+    if args.print_spans:
+        print_summary(run_)
@@ -0,0 +1,92 @@
+"""
+Local raw-zone layout shared by the generator, validator, loader and uploader.
+
+CSV files live directly in data/raw/. The optional columnar copy is written as
+compressed Parquet partitioned by entity and ingest date:
+
+    data/raw/parquet/<entity>/date=YYYY-MM-DD/part-00000.parquet
+
+Uploaded copies are addressed as s3://bucket/key URIs (src/cloud/s3_reader.py).
+
+In stream mode the generator appends transactions as numbered micro-batch
+CSVs, which the stream loader tails in name order:
+
+    data/stream/transactions-0000000001.csv
+"""
+import os
+import glob
+
+RAW_DATA_DIR = os.path.join("data", "raw")
+PARQUET_DIR = os.path.join(RAW_DATA_DIR, "parquet")
+PARQUET_COMPRESSION = "zstd"
+FORMATS = ["csv", "parquet"]
+ENTITIES = ["customers", "products", "transactions"]
+S3_SCHEME = "s3://"
+STREAM_DIR = os.path.join("data", "stream")
+STREAM_PREFIX = "transactions-"
+
+
+def is_s3_uri(path):
+    return path.startswith(S3_SCHEME)
+
+
+def require_pyarrow():
+    """Import pyarrow for the Parquet path, with a clear error when missing."""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError as e:
+        raise RuntimeError(
+            "The Parquet raw zone needs pyarrow: pip install pyarrow"
+        ) from e
+    return pyarrow
+
+
+def parquet_partition_dir(entity, date, root=PARQUET_DIR):
+    """Directory of one entity/date partition (`date` as YYYY-MM-DD)."""
+    return os.path.join(root, entity, f"date={date}")
+
+
+def latest_parquet_files(entity, root=PARQUET_DIR):
+    """Part files of the most recent date partition of an entity."""
+    partitions = sorted(glob.glob(os.path.join(root, entity, "date=*")))
+    if not partitions:
+        return []
+    return sorted(glob.glob(os.path.join(partitions[-1], "*.parquet")))
+
+
+def iter_parquet_batches(paths, batch_size=None, columns=None):
+    """Yield DataFrames from Parquet files, reading only `columns`.
+
+    `paths` may also hold file objects. Without `batch_size` each file is
+    read whole.
+    """
+    require_pyarrow()
+    import pyarrow.parquet as pq
+
+    for path in paths:
+        parquet_file = pq.ParquetFile(path)
+        if batch_size:
+            for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+                yield batch.to_pandas()
+        else:
+            yield parquet_file.read(columns=columns).to_pandas()
+
+
+def stream_batch_path(seq, root=STREAM_DIR):
+    """Path of micro-batch number `seq`; zero-padded so names sort in order."""
+    return os.path.join(root, f"{STREAM_PREFIX}{seq:010d}.csv")
+
+
+def stream_batch_seq(path):
+    return int(os.path.basename(path)[len(STREAM_PREFIX):].split(".")[0])
+
+
+def stream_batches(root=STREAM_DIR, after=0):
+    """Complete micro-batch files numbered above `after`, in order.
+
+    Writers rename finished batches into place, so temporary files are
+    never listed.
+    """
+    paths = glob.glob(os.path.join(root, f"{STREAM_PREFIX}*.csv"))
+    return sorted(path for path in paths if stream_batch_seq(path) > after)
@@ -1,9 +1,90 @@
 # src/scripts/reset_db.py
-from src.scripts.db_setup import Base, engine
+"""
+Reset the database to empty tables.
+
+"truncate" empties every table with one TRUNCATE ... RESTART IDENTITY
+CASCADE. The tables, indexes and partitions stay, so no DDL is reissued.
+It only applies while the tables in the database match the models.
+"drop" drops and recreates all tables. "auto" (the default) truncates
+when it can and drops otherwise.
+
+The loader's state tables are emptied too, so the next load reads every
+file again instead of skipping the ones loaded before the reset.
+Definitions deferred by an unfinished bulk load are kept when truncating;
+the next load rebuilds them.
+"""
+import argparse
+
+from sqlalchemy import text
+
+from src.etl import dimensions
+from src.scripts.db_setup import Base, get_engine, schema_matches
+
+RESET_MODES = ["auto", "truncate", "drop"]
+
+# Tables the pipeline creates on first use (load_to_db, quarantine,
+# bulk_load, stream_load), outside the models
+STATE_TABLES = ["load_audit", "load_checkpoints", "load_quarantine", "stream_offsets",
+                "data_versions"]
+DEFERRED_TABLE = "bulk_load_deferred"
+
+
+def existing_tables(conn, tables):
+    return [table for table in tables
+            if conn.execute(text("SELECT to_regclass(:t)"), {"t": table}).scalar()]
+
+
+def truncate(conn, tables):
+    """Empty `tables` (the existing ones) in one statement and restart their ids."""
+    tables = existing_tables(conn, tables)
+    if tables:
+        conn.execute(text(f"TRUNCATE {', '.join(tables)} RESTART IDENTITY CASCADE"))
+
+
+def truncate_all(conn):
+    """Empty the model tables and the state tables."""
+    truncate(conn, [table.name for table in Base.metadata.sorted_tables] + STATE_TABLES)
+
+
+def reset_db(mode="auto"):
+    engine = get_engine()
+    if mode != "drop":
+        with engine.begin() as conn:
+            matches = schema_matches(conn)
+            if matches:
+                print("🧹 Truncating all tables...")
+                truncate_all(conn)
+        if matches:
+            dimensions.clear_caches()  # the cached ids are gone
+            print("✅ Database reset complete.")
+            return "truncate"
+        if mode == "truncate":
+            raise RuntimeError("The database schema does not match the models; "
+                               "reset with --mode drop")
+        print("⚠️ Schema changed — recreating the tables")
 
-if __name__ == "__main__":
     print("⚠️ Dropping all tables...")
     Base.metadata.drop_all(engine)
     print("🧱 Recreating all tables...")
     Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        truncate(conn, STATE_TABLES + [DEFERRED_TABLE])
+    dimensions.clear_caches()
     print("✅ Database reset complete.")
+    return "drop"
+
+
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Empty or recreate all tables.")
+    parser.add_argument("--mode", choices=RESET_MODES, default="auto",
+                        help="truncate keeps the schema (only when it matches the models), "
+                             "drop recreates it; auto picks truncate when possible")
+    args = parser.parse_args(argv)
+    try:
+        reset_db(args.mode)
+    except RuntimeError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    cli()
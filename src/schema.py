@@ -0,0 +1,205 @@
+# src/schema.py
+"""
+Column schema of the raw entities, shared by the generator, validator and loader.
+
+Every column has a *kind* that fixes its compact in-memory dtype:
+
+    id         int32 (the database keys are INTEGER)
+    small_int  int16
+    float      float64
+    string     Python strings (free text: names, emails)
+    category   pandas categorical (low-cardinality labels)
+    date       datetime64, stored at day precision
+    timestamp  datetime64, stored at microsecond precision
+
+CSVs are read with explicit dtypes for the string columns, so labels are
+interned as categoricals while parsing instead of held as one Python
+string per row. Numeric columns are parsed natively and narrowed after the
+read, and dates are parsed column-wise. Conversions only happen when every
+value of a column converts: a column holding a malformed value keeps what
+was read, so validation still sees (and reports) the original text.
+
+The pyarrow CSV engine can be used for whole-file reads; pandas does not
+support it with `chunksize`, so chunked reads always use the C engine.
+"""
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = {
+    "customers": {
+        "id": "id",
+        "name": "string",
+        "email": "string",
+        "registration_date": "date",
+        "country": "category",
+    },
+    "products": {
+        "id": "id",
+        "name": "string",
+        "category": "category",
+        "price": "float",
+        "supplier": "category",
+    },
+    "transactions": {
+        "id": "id",
+        "customer_id": "id",
+        "product_id": "id",
+        "quantity": "small_int",
+        "timestamp": "timestamp",
+        "payment_method": "category",
+    },
+}
+
+INTEGER_DTYPES = {"id": "int32", "small_int": "int16"}
+# Precision of the datetime kinds in CSV text and Parquet
+DATETIME_UNITS = {"date": "D", "timestamp": "us"}
+
+# Only empty fields count as nulls; pandas' defaults would also turn
+# generated names such as "None" or "NA" into NULLs
+CSV_NA_OPTIONS = {"keep_default_na": False, "na_values": [""]}
+# pandas' defaults: empty fields and tokens such as "NA", "None" or "null"
+DEFAULT_NA_OPTIONS = {"keep_default_na": True}
+
+CSV_ENGINES = ["c", "pyarrow"]
+
+# Canonical ISO dates/datetimes. Strings of this shape are valid for
+# datetime.fromisoformat exactly when pandas can parse them.
+ISO_DATE_PATTERN = (
+    r"[0-9]{4}-(0[1-9]|1[0-2])-(0[1-9]|[12][0-9]|3[01])"
+    r"([T ]([01][0-9]|2[0-3]):[0-5][0-9]:[0-5][0-9](\.([0-9]{3}|[0-9]{6}))?)?"
+)
+
+
+# ---------- Lookups ----------
+def columns_of_kind(entity, *kinds):
+    return [column for column, kind in COLUMNS[entity].items() if kind in kinds]
+
+
+def datetime_columns(entity):
+    """{column: unit} of the date and timestamp columns of an entity."""
+    return {column: DATETIME_UNITS[kind] for column, kind in COLUMNS[entity].items()
+            if kind in DATETIME_UNITS}
+
+
+def entity_for_path(path):
+    """Entity a raw file belongs to (`customers.csv`, `customers_00001.csv`,
+    `parquet/customers/date=.../part-*.parquet`), or None."""
+    parts = path.replace("\\", "/").split("/")
+    for entity in COLUMNS:
+        if entity in parts[:-1] or parts[-1].split(".")[0].split("_")[0] == entity:
+            return entity
+    return None
+
+
+# ---------- Arrow ----------
+def arrow_schema(entity):
+    """Parquet schema of an entity (labels stay plain strings on disk)."""
+    from src.raw_zone import require_pyarrow
+
+    pa = require_pyarrow()
+    types = {
+        "id": pa.int64(), "small_int": pa.int16(), "float": pa.float64(),
+        "string": pa.string(), "category": pa.string(),
+        "date": pa.date32(), "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(column, types[kind]) for column, kind in COLUMNS[entity].items()])
+
+
+# ---------- Reading ----------
+def csv_read_options(entity, usecols=None, parse_dates=True, na_options=CSV_NA_OPTIONS):
+    """pd.read_csv keyword arguments for a file of `entity`.
+
+    String and category columns get explicit dtypes. Without `parse_dates`
+    date columns are read as strings too, never inferred. `na_options`
+    decides which fields are missing values.
+    """
+    kinds = ("string", "category") + (() if parse_dates else tuple(DATETIME_UNITS))
+    dtype = {column: ("category" if COLUMNS[entity][column] == "category" else "object")
+             for column in columns_of_kind(entity, *kinds)
+             if usecols is None or column in usecols}
+    return {"dtype": dtype, **na_options}
+
+
+@lru_cache(maxsize=None)
+def _has_pyarrow():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def csv_engine(engine=None, chunk_size=None):
+    """The requested engine, falling back to C for chunked reads or when
+    pyarrow is not installed."""
+    if engine == "pyarrow" and not chunk_size and _has_pyarrow():
+        return "pyarrow"
+    return "c"
+
+
+def read_csv(path, entity=None, chunk_size=None, parse_dates=True, engine=None,
+             na_options=CSV_NA_OPTIONS, **kwargs):
+    """pd.read_csv with the entity's dtypes; a DataFrame, or an iterator of
+    DataFrames when `chunk_size` is given.
+
+    `entity` defaults to the one the file name belongs to; files of unknown
+    entities are read without a schema.
+    """
+    entity = entity or (entity_for_path(path) if isinstance(path, str) else None)
+    if entity is None:
+        options = dict(na_options)
+    else:
+        options = csv_read_options(entity, kwargs.get("usecols"), parse_dates, na_options)
+    frames = pd.read_csv(path, chunksize=chunk_size,
+                         engine=csv_engine(engine, chunk_size), **options, **kwargs)
+    if entity is None:
+        return frames
+    if chunk_size:
+        return (compact(df, entity, parse_dates) for df in frames)
+    return compact(frames, entity, parse_dates)
+
+
+# ---------- Compaction ----------
+def _narrow_integers(series, dtype):
+    if not pd.api.types.is_integer_dtype(series) or series.dtype == dtype:
+        return series
+    info = np.iinfo(dtype)
+    if series.empty or (info.min <= series.min() and series.max() <= info.max):
+        return series.astype(dtype)
+    return series
+
+
+def _parse_datetimes(series):
+    """Parsed datetimes when every non-null value is a canonical ISO date,
+    else the series unchanged."""
+    if pd.api.types.is_datetime64_any_dtype(series) or series.dtype != object:
+        return series
+    present = series.notna()
+    values = series[present]
+    if _has_pyarrow():
+        values = values.astype("string[pyarrow]")  # matched with RE2, several times faster
+    if not values.str.fullmatch(ISO_DATE_PATTERN).all():
+        return series
+    parsed = pd.to_datetime(series, format="ISO8601", errors="coerce")
+    return parsed if (parsed.notna() == present).all() else series
+
+
+def compact(df, entity, parse_dates=True):
+    """Convert the columns of a frame to their compact dtypes, in place.
+
+    Used on CSV chunks after parsing and on frames built or read from
+    Parquet. Columns that do not convert cleanly are left as they are.
+    """
+    for column, kind in COLUMNS[entity].items():
+        if column not in df.columns:
+            continue
+        if kind in INTEGER_DTYPES:
+            df[column] = _narrow_integers(df[column], INTEGER_DTYPES[kind])
+        elif kind == "category" and df[column].dtype == object:
+            df[column] = df[column].astype("category")
+        elif kind in DATETIME_UNITS and parse_dates:
+            df[column] = _parse_datetimes(df[column])
+    return df
+
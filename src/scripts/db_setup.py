@@ -1,127 +1,217 @@
-import os
-from sqlalchemy import (
-    create_engine, Column, Integer, UniqueConstraint, String, Float, DateTime,
-    ForeignKey, Index, func
-)
-from sqlalchemy.orm import relationship, declarative_base
-from config.config import load_config
-
-# ---------- Load Configuration ----------
-config = load_config(env=os.environ.get("ENV", "dev"))
-db_conf = config["database"]
-
-DB_URL = (
-    f"postgresql+psycopg2://{db_conf['user']}:{db_conf['password']}@"
-    f"{db_conf['host']}:{db_conf['port']}/{db_conf['name']}"
-)
-# ---------- Initialize Engine and Base ----------
-engine = create_engine(DB_URL, echo=False)
-Base = declarative_base()
-metadata = Base.metadata
-
-# ============================================================
-#                        MODELS
-# ============================================================
-
-# ---------- Suppliers ----------
-class Supplier(Base):
-    __tablename__ = "suppliers"
-
-    id = Column(Integer, primary_key=True)
-    name = Column(String(100), unique=True, nullable=False)
-
-    products = relationship("Product", back_populates="supplier")
-
-
-# ---------- Payment Methods ----------
-class PaymentMethod(Base):
-    __tablename__ = "payment_methods"
-
-    id = Column(Integer, primary_key=True)
-    method = Column(String(100), unique=True, nullable=False)
-
-    transactions = relationship("Transaction", back_populates="payment_method")
-
-
-# ---------- Customers ----------
-class Customer(Base):
-    __tablename__ = "customers"
-
-    id = Column(Integer, primary_key=True)
-    name = Column(String(100), nullable=False)
-    email = Column(String(100), nullable=False)
-    registration_date = Column(DateTime, default=func.now())
-    country = Column(String(100))
-
-    transactions = relationship("Transaction", back_populates="customer")
-
-
-# ---------- Products ----------
-class Product(Base):
-    __tablename__ = "products"
+import re
+import argparse
+from datetime import date
+from functools import lru_cache
+from sqlalchemy import create_engine, text, inspect
+from config.config import get_config
+
+# ---------- Configuration (read on first use) ----------
+def db_config():
+    """The `database` config section; importing this module reads no config."""
+    return get_config()["database"]
+
+
+def db_url():
+    conf = db_config()
+    return (
+        f"postgresql+psycopg2://{conf['user']}:{conf['password']}@"
+        f"{conf['host']}:{conf['port']}/{conf['name']}"
+    )
 
-    id = Column(Integer, primary_key=True)
-    name = Column(String(100), nullable=False)
-    category = Column(String(100), index=True)
-    price = Column(Float, nullable=False)
-    supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=False)
 
-    supplier = relationship("Supplier", back_populates="products")
-    transaction_items = relationship("TransactionItem", back_populates="product")
+def partitioned():
+    """Whether transactions are partitioned by month (see src/scripts/models.py)."""
+    return bool(db_config().get("partition_transactions", False))
 
 
-# ---------- Transactions ----------
-class Transaction(Base):
-    __tablename__ = "transactions"
+# ---------- Engine (created on first use) ----------
+@lru_cache(maxsize=None)
+def get_engine():
+    """The shared engine; importing this module opens no connections."""
+    return create_engine(db_url(), echo=False)
 
-    id = Column(Integer, primary_key=True)
-    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
-    timestamp = Column(DateTime, default=func.now(), index=True)
-    payment_method_id = Column(Integer, ForeignKey("payment_methods.id"))
 
-    customer = relationship("Customer", back_populates="transactions")
-    payment_method = relationship("PaymentMethod", back_populates="transactions")
-    items = relationship("TransactionItem", back_populates="transaction")
+# ---------- Models (src/scripts/models.py, imported on first use) ----------
+MODELS = {
+    "Base", "metadata", "Supplier", "PaymentMethod", "Customer", "Product", "Transaction",
+    "TransactionItem", "OrderValue", "DailyRevenue", "CustomerSpend", "ProductSales",
+}
 
+_LAZY_ATTRIBUTES = {"engine": get_engine, "config": get_config, "db_conf": db_config,
+                    "DB_URL": db_url, "PARTITIONED": partitioned}
 
-# ---------- Transaction Items ----------
-class TransactionItem(Base):
-    __tablename__ = "transaction_items"
 
-    id = Column(Integer, primary_key=True)
-    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=False)
-    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
-    quantity = Column(Integer, nullable=False)
+def __getattr__(name):
+    # Backwards compatibility for the former module-level engine, config
+    # values and models, e.g. `from src.scripts.db_setup import Base`
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    if name in MODELS:
+        from src.scripts import models
 
-    # ⚠ Add UNIQUE constraint for upsert
-    __table_args__ = (
-        UniqueConstraint('transaction_id', 'product_id', name='uix_transaction_product'),
-    )
+        return getattr(models, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    transaction = relationship("Transaction", back_populates="items")
-    product = relationship("Product", back_populates="transaction_items")
 
+# ============================================================
+#                  PARTITION MANAGEMENT
+# ============================================================
 
+# Partitioned table -> partition key column; both share monthly bounds
+PARTITION_KEYS = {
+    "transactions": "timestamp",
+    "transaction_items": "transaction_timestamp",
+}
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})(?P<month>\d{2})$")
+
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def next_month(month):
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+
+def is_partitioned(conn, table="transactions"):
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:t))"),
+        {"t": table},
+    ).scalar()
+
+
+def ensure_partitions(conn, months):
+    """Create the monthly partitions covering `months` (dates or datetimes)."""
+    for month in sorted({month_start(m) for m in months}):
+        for table in PARTITION_KEYS:
+            conn.execute(text(
+                f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} "
+                f"PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month}') TO ('{next_month(month)}')"
+            ))
+
+
+def list_partitions(conn, table):
+    """(partition name, first day of month) of a table's monthly partitions."""
+    rows = conn.execute(
+        text("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(:t)
+        """),
+        {"t": table},
+    ).fetchall()
+    partitions = []
+    for (name,) in rows:
+        match = PARTITION_NAME.match(name)
+        if match and match["table"] == table:
+            partitions.append((name, date(int(match["year"]), int(match["month"]), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def retire_partitions(before, drop=False):
+    """Detach (or drop) the monthly partitions of months before `before`'s month.
+
+    Items partitions go first so no remaining row references a retired
+    transaction, and a detached partition loses its foreign key to
+    transactions. Detached partitions stay as standalone tables for
+    archiving; Postgres only lets referenced partitions be dropped once
+    detached, so dropping detaches first too. Rollup tables keep the retired
+    months until rebuilt (python -m src.etl.rollups).
+    """
+    cutoff = month_start(before)
+    retired = []
+    with get_engine().begin() as conn:
+        for table in reversed(list(PARTITION_KEYS)):
+            for name, month in list_partitions(conn, table):
+                if month >= cutoff:
+                    continue
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+                foreign_keys = conn.execute(
+                    text("""
+                        SELECT conname FROM pg_constraint
+                        WHERE conrelid = to_regclass(:t) AND contype = 'f'
+                          AND confrelid = 'transactions'::regclass
+                    """),
+                    {"t": name},
+                ).scalars().all()
+                for constraint in foreign_keys:
+                    conn.execute(text(f'ALTER TABLE {name} DROP CONSTRAINT "{constraint}"'))
+                retired.append(name)
+        if drop:
+            for name in retired:
+                conn.execute(text(f"DROP TABLE {name}"))
+    action = "Dropped" if drop else "Detached"
+    print(f"🗄️ {action} {len(retired)} partitions: {', '.join(retired) or '-'}")
+    return retired
 
-# ---------- Indexes ----------
-Index("idx_transactions_customer", Transaction.customer_id)
-Index("idx_transactions_timestamp", Transaction.timestamp)
-Index("idx_transaction_items_product", TransactionItem.product_id)
 
 # ============================================================
 #                      INITIALIZATION
 # ============================================================
 
 def init_db():
-    """Create all tables and indexes in the target PostgreSQL database."""
+    """Create all tables and indexes in the target PostgreSQL database.
+
+    With partitioning enabled the partitions for the current and next month
+    are created too; the loader adds the ones its data needs.
+    """
+    from src.scripts.models import Base
+
     print("🚀 Connecting to database...")
-    print(f"🔗 {DB_URL}")
+    print(f"🔗 {db_url()}")
+    engine = get_engine()
     Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        if is_partitioned(conn) != partitioned():
+            raise RuntimeError(
+                "transactions partitioning does not match the partition_transactions "
+                "setting; reset the schema (python -m src.reset_db) to switch"
+            )
+        if partitioned():
+            this_month = month_start(date.today())
+            ensure_partitions(conn, [this_month, next_month(this_month)])
     print("✅ Database schema created successfully!")
 
+
+def schema_matches(conn):
+    """Whether the database holds every model table with the model's columns
+    and partitioning, so its tables can be emptied instead of recreated."""
+    from src.scripts.models import Base
+
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            return False
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        if columns != {column.name for column in table.columns}:
+            return False
+    return is_partitioned(conn) == partitioned()
+
 # ============================================================
 #                        MAIN
 # ============================================================
 
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Create the database schema.")
+    parser.add_argument("--detach-before", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="detach monthly partitions of months before this date")
+    parser.add_argument("--drop-before", type=date.fromisoformat, metavar="YYYY-MM-DD",
+                        help="drop monthly partitions of months before this date")
+    args = parser.parse_args(argv)
+
+    if args.detach_before or args.drop_before:
+        if not partitioned():
+            parser.error("partition retention needs partition_transactions enabled")
+        retire_partitions(args.drop_before or args.detach_before, drop=bool(args.drop_before))
+    else:
+        init_db()
+
+
 if __name__ == "__main__":
-    init_db()
+    cli()
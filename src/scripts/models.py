@@ -0,0 +1,172 @@
+"""
+The ORM models of the schema.
+
+The partition_transactions setting shapes the transactions tables, so the
+config is read when this module is imported. src.scripts.db_setup imports
+it on first access to a model (`from src.scripts.db_setup import Base`
+still works), which keeps importing db_setup itself free of config reads.
+"""
+from sqlalchemy import (
+    Column, Integer, BigInteger, UniqueConstraint, String, Float, Date, DateTime, ForeignKey,
+    ForeignKeyConstraint, Index, func
+)
+from sqlalchemy.orm import relationship, declarative_base
+from src.scripts.db_setup import partitioned
+
+# ---------- Declarative Base ----------
+Base = declarative_base()
+metadata = Base.metadata
+
+# ---------- Partitioning ----------
+# With `partition_transactions: true` under `database`, transactions and
+# transaction_items are RANGE-partitioned by month on the transaction time.
+# Postgres needs the partition key in every unique key, so the keys become
+# (id, timestamp) and (transaction_id, product_id, transaction_timestamp),
+# and each item carries its transaction's timestamp.
+PARTITIONED = partitioned()
+
+# ============================================================
+#                        MODELS
+# ============================================================
+
+# ---------- Suppliers ----------
+class Supplier(Base):
+    __tablename__ = "suppliers"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+
+    products = relationship("Product", back_populates="supplier")
+
+
+# ---------- Payment Methods ----------
+class PaymentMethod(Base):
+    __tablename__ = "payment_methods"
+
+    id = Column(Integer, primary_key=True)
+    method = Column(String(100), unique=True, nullable=False)
+
+    transactions = relationship("Transaction", back_populates="payment_method")
+
+
+# ---------- Customers ----------
+class Customer(Base):
+    __tablename__ = "customers"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    email = Column(String(100), nullable=False)
+    registration_date = Column(DateTime, default=func.now())
+    country = Column(String(100))
+
+    transactions = relationship("Transaction", back_populates="customer")
+
+
+# ---------- Products ----------
+class Product(Base):
+    __tablename__ = "products"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    category = Column(String(100), index=True)
+    price = Column(Float, nullable=False)
+    supplier_id = Column(Integer, ForeignKey("suppliers.id"), nullable=False)
+
+    supplier = relationship("Supplier", back_populates="products")
+    transaction_items = relationship("TransactionItem", back_populates="product")
+
+
+# ---------- Transactions ----------
+class Transaction(Base):
+    __tablename__ = "transactions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    customer_id = Column(Integer, ForeignKey("customers.id"), nullable=False)
+    timestamp = Column(DateTime, default=func.now(), index=True, primary_key=PARTITIONED)
+    payment_method_id = Column(Integer, ForeignKey("payment_methods.id"))
+
+    if PARTITIONED:
+        __table_args__ = {"postgresql_partition_by": "RANGE (timestamp)"}
+
+    customer = relationship("Customer", back_populates="transactions")
+    payment_method = relationship("PaymentMethod", back_populates="transactions")
+    items = relationship("TransactionItem", back_populates="transaction")
+
+
+# ---------- Transaction Items ----------
+class TransactionItem(Base):
+    __tablename__ = "transaction_items"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    transaction_id = Column(Integer, nullable=False)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+    # ⚠ Add UNIQUE constraint for upsert
+    if PARTITIONED:
+        transaction_timestamp = Column(DateTime, primary_key=True)
+        __table_args__ = (
+            ForeignKeyConstraint(["transaction_id", "transaction_timestamp"],
+                                 ["transactions.id", "transactions.timestamp"]),
+            UniqueConstraint('transaction_id', 'product_id', 'transaction_timestamp',
+                             name='uix_transaction_product'),
+            {"postgresql_partition_by": "RANGE (transaction_timestamp)"},
+        )
+    else:
+        __table_args__ = (
+            ForeignKeyConstraint(["transaction_id"], ["transactions.id"]),
+            UniqueConstraint('transaction_id', 'product_id', name='uix_transaction_product'),
+        )
+
+    transaction = relationship("Transaction", back_populates="items")
+    product = relationship("Product", back_populates="transaction_items")
+
+
+# ============================================================
+#                   ROLLUPS (analytics summaries)
+# ============================================================
+# Maintained incrementally by src/etl/rollups.py from the rows touched in
+# each load; read by sql/rollup_analytics.sql.
+
+# ---------- Per-Transaction Order Value ----------
+class OrderValue(Base):
+    __tablename__ = "order_values"
+
+    transaction_id = Column(Integer, primary_key=True)
+    customer_id = Column(Integer, nullable=False, index=True)
+    order_date = Column(Date, nullable=False, index=True)
+    order_value = Column(Float, nullable=False)
+
+
+# ---------- Daily Revenue ----------
+class DailyRevenue(Base):
+    __tablename__ = "daily_revenue"
+
+    day = Column(Date, primary_key=True)
+    revenue = Column(Float, nullable=False)
+    order_count = Column(Integer, nullable=False)
+
+
+# ---------- Per-Customer Spend ----------
+class CustomerSpend(Base):
+    __tablename__ = "customer_spend"
+
+    customer_id = Column(Integer, primary_key=True)
+    total_spent = Column(Float, nullable=False, index=True)
+    order_count = Column(Integer, nullable=False)
+
+
+# ---------- Per-Product Sales ----------
+# Revenue is total_quantity * the current price, computed when queried, so
+# price changes never make this table stale.
+class ProductSales(Base):
+    __tablename__ = "product_sales"
+
+    product_id = Column(Integer, primary_key=True)
+    total_quantity = Column(BigInteger, nullable=False)
+
+
+# ---------- Indexes ----------
+Index("idx_transactions_customer", Transaction.customer_id)
+Index("idx_transactions_timestamp", Transaction.timestamp)
+Index("idx_transaction_items_product", TransactionItem.product_id)
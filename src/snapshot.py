@@ -0,0 +1,265 @@
+# src/snapshot.py
+"""
+Snapshots of a loaded database, restored in seconds instead of re-ingested.
+
+A snapshot is a directory under SNAPSHOT_DIR holding a binary COPY dump
+of every table and a manifest.json with the columns and row counts of
+each table and the months of the transaction partitions. The tables are
+the models plus the loader's state tables (load_audit etc.). Keeping
+those means a load after a restore skips the files the snapshot already
+holds. All tables are dumped in one REPEATABLE READ transaction, so the
+snapshot is consistent even while a load is running.
+
+A restore works in a single transaction:
+
+  1. TRUNCATE every table and drop the secondary indexes and foreign keys;
+  2. COPY the dumps back in foreign key order;
+  3. recreate the indexes and foreign keys, and move the id sequences past
+     the restored ids.
+
+COPY into a table truncated in the same transaction uses FREEZE, so the
+rows need no later vacuum pass. A restore that fails leaves the previous
+contents in place. When the database schema no longer matches the models,
+the tables are recreated first (reset_db --mode drop).
+
+    python -m src snapshot save sf10
+    python -m src snapshot restore sf10
+"""
+import os
+import json
+import shutil
+import argparse
+from datetime import date, datetime
+
+from sqlalchemy import inspect, text
+
+from src import instrumentation
+from src.instrumentation import span
+
+SNAPSHOT_DIR = os.path.join("data", "snapshots")
+MANIFEST_FILE = "manifest.json"
+ACTIONS = ["save", "restore", "list", "delete"]
+
+
+def snapshot_path(name, root=SNAPSHOT_DIR):
+    return os.path.join(root, name)
+
+
+def read_manifest(name, root=SNAPSHOT_DIR):
+    path = os.path.join(snapshot_path(name, root), MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise RuntimeError(f"No snapshot named {name!r} in {root}")
+    with open(path) as f:
+        return json.load(f)
+
+
+def snapshot_tables(conn):
+    """Model tables in foreign key order, then the existing state tables."""
+    from src.reset_db import STATE_TABLES, existing_tables
+    from src.scripts.db_setup import Base
+
+    return ([table.name for table in Base.metadata.sorted_tables]
+            + existing_tables(conn, STATE_TABLES))
+
+
+def _column_list(columns):
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+# ---------- Save ----------
+def save(name, root=SNAPSHOT_DIR, overwrite=False):
+    """Dump every table into snapshot `name`; returns its manifest."""
+    from src.scripts.db_setup import PARTITIONED, get_engine, list_partitions
+
+    target = snapshot_path(name, root)
+    if os.path.exists(target) and not overwrite:
+        raise RuntimeError(f"Snapshot {name!r} already exists (overwrite to replace it)")
+    staging = target + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    tables = []
+    with get_engine().connect() as conn:
+        conn.execute(text("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"))
+        inspector = inspect(conn)
+        cursor = conn.connection.cursor()
+        for table in snapshot_tables(conn):
+            columns = [column["name"] for column in inspector.get_columns(table)]
+            path = os.path.join(staging, f"{table}.copy")
+            with span("snapshot_dump", table) as timer, open(path, "wb") as f:
+                # A query, since COPY TO cannot read a partitioned table directly
+                cursor.copy_expert(
+                    f"COPY (SELECT {_column_list(columns)} FROM {table}) "
+                    f"TO STDOUT WITH (FORMAT binary)", f
+                )
+                timer.rows, timer.bytes = cursor.rowcount, f.tell()
+            tables.append({"name": table, "columns": columns,
+                           "rows": timer.rows, "bytes": timer.bytes})
+        months = ([month.isoformat() for _, month in list_partitions(conn, "transactions")]
+                  if PARTITIONED else [])
+        conn.rollback()
+
+    manifest = {"name": name, "created_at": datetime.now().isoformat(timespec="seconds"),
+                "partitioned": PARTITIONED, "partitions": months, "tables": tables}
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    rows = sum(table["rows"] for table in tables)
+    size = sum(table["bytes"] for table in tables)
+    print(f"📸 Saved snapshot {name}: {len(tables)} tables, {rows} rows, "
+          f"{size / 1e6:.1f} MB in {target}")
+    return manifest
+
+
+# ---------- Restore ----------
+def _create_state_tables(tables):
+    """Create the state tables a snapshot holds that this database lacks."""
+    from src.etl import load_to_db, stream_load
+    from src.scripts.db_setup import get_engine
+
+    load_to_db.ensure_audit_tables()
+    if stream_load.OFFSETS_TABLE in tables:
+        with get_engine().begin() as conn:
+            stream_load.create_table(conn)
+
+
+def reset_sequences(conn, tables):
+    """Move each serial column's sequence past the largest restored id."""
+    serials = conn.execute(text("""
+        SELECT table_name, column_name,
+               pg_get_serial_sequence(quote_ident(table_name), column_name) AS sequence
+        FROM information_schema.columns
+        WHERE table_schema = 'public' AND table_name = ANY(:tables)
+          AND column_default LIKE 'nextval(%'
+    """), {"tables": tables}).fetchall()
+    for table, column, sequence in serials:
+        conn.execute(text(
+            f"SELECT setval(:sequence, COALESCE((SELECT MAX({column}) FROM {table}), 0) + 1, false)"
+        ), {"sequence": sequence})
+
+
+def drop_secondary_objects(conn, tables):
+    """Drop the secondary indexes and foreign keys of `tables`; returns the
+    statements recreating them, indexes first."""
+    from src.etl import bulk_load
+
+    recreate = []
+    for name, _, definition in bulk_load.secondary_indexes(conn, tables):
+        conn.execute(text(f'DROP INDEX "{name}"'))
+        recreate.append(definition)
+    for name, table, definition in bulk_load.foreign_keys(conn, tables):
+        conn.execute(text(f'ALTER TABLE {table} DROP CONSTRAINT "{name}"'))
+        recreate.append(f'ALTER TABLE {table} ADD CONSTRAINT "{name}" {definition}')
+    return recreate
+
+
+def restore(name, root=SNAPSHOT_DIR):
+    """Replace the contents of the database with snapshot `name`."""
+    from src.etl import bulk_load, dimensions, load_to_db
+    from src.reset_db import reset_db, truncate_all
+    from src.scripts.db_setup import (
+        PARTITION_KEYS, PARTITIONED, ensure_partitions, get_engine, schema_matches
+    )
+
+    manifest = read_manifest(name, root)
+    if manifest["partitioned"] != PARTITIONED:
+        raise RuntimeError(f"Snapshot {name!r} was taken with partition_transactions="
+                           f"{manifest['partitioned']}; it does not fit this schema")
+    with get_engine().connect() as conn:
+        matches = schema_matches(conn)
+    if not matches:
+        reset_db("drop")
+    tables = [table["name"] for table in manifest["tables"]]
+    _create_state_tables(tables)
+
+    directory = snapshot_path(name, root)
+    with get_engine().begin() as conn:
+        truncate_all(conn)
+        # Built once after the COPY instead of maintained row by row; the
+        # foreign keys are checked in one scan each when re-added
+        recreate = drop_secondary_objects(conn, tables)
+        if PARTITIONED:
+            ensure_partitions(conn, [date.fromisoformat(m) for m in manifest["partitions"]])
+        cursor = conn.connection.cursor()
+        for table in manifest["tables"]:
+            # FREEZE needs a plain table truncated in this transaction
+            freeze = "" if (PARTITIONED and table["name"] in PARTITION_KEYS) else ", FREEZE"
+            with span("snapshot_restore", table["name"], rows=table["rows"],
+                      bytes=table["bytes"]), \
+                    open(os.path.join(directory, f"{table['name']}.copy"), "rb") as f:
+                cursor.copy_expert(
+                    f"COPY {table['name']} ({_column_list(table['columns'])}) "
+                    f"FROM STDIN WITH (FORMAT binary{freeze})", f
+                )
+        with span("snapshot_rebuild"):
+            for statement in recreate:
+                conn.execute(text(statement))
+        reset_sequences(conn, tables)
+        # The restored counters may repeat a version readers already cached
+        load_to_db.bump_data_version(conn, "snapshot")
+    dimensions.clear_caches()  # ids cached before the restore may now differ
+    with span("analyze"), get_engine().connect() as conn:
+        conn.execute(text(f"ANALYZE {', '.join(tables)}"))
+        conn.commit()
+    bulk_load.restore()  # indexes an interrupted bulk load had deferred
+    print(f"♻️ Restored snapshot {name} "
+          f"({sum(table['rows'] for table in manifest['tables'])} rows, "
+          f"taken {manifest['created_at']})")
+    return manifest
+
+
+# ---------- Listing ----------
+def list_snapshots(root=SNAPSHOT_DIR):
+    """Manifests of the snapshots under `root`, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    manifests = [read_manifest(name, root) for name in os.listdir(root)
+                 if os.path.exists(os.path.join(root, name, MANIFEST_FILE))]
+    return sorted(manifests, key=lambda manifest: manifest["created_at"])
+
+
+def delete(name, root=SNAPSHOT_DIR):
+    read_manifest(name, root)
+    shutil.rmtree(snapshot_path(name, root))
+    print(f"🗑️ Deleted snapshot {name}")
+
+
+# ---------- MAIN ----------
+def cli(argv=None, prog=None):
+    parser = argparse.ArgumentParser(
+        prog=prog, description="Save and restore database snapshots (binary COPY dumps)."
+    )
+    parser.add_argument("action", choices=ACTIONS)
+    parser.add_argument("name", nargs="?", default=None, help="snapshot name, e.g. sf10")
+    parser.add_argument("--dir", default=SNAPSHOT_DIR, help="directory holding the snapshots")
+    parser.add_argument("--overwrite", action="store_true",
+                        help="with save, replace an existing snapshot of that name")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.action != "list" and not args.name:
+        parser.error(f"{args.action} needs a snapshot name")
+
+    if args.action == "list":
+        for manifest in list_snapshots(args.dir):
+            rows = sum(table["rows"] for table in manifest["tables"])
+            size = sum(table["bytes"] for table in manifest["tables"])
+            print(f"{manifest['name']:<20} {manifest['created_at']}  "
+                  f"{rows:>12} rows  {size / 1e6:>9.1f} MB")
+        return
+
+    with instrumentation.run(f"snapshot-{args.action}", trace_memory=args.trace_memory) as run:
+        try:
+            if args.action == "save":
+                save(args.name, args.dir, overwrite=args.overwrite)
+            elif args.action == "restore":
+                restore(args.name, args.dir)
+            else:
+                delete(args.name, args.dir)
+        except RuntimeError as e:
+            parser.error(str(e))
+    instrumentation.export(run, args)
+
+
+if __name__ == "__main__":
+    cli()
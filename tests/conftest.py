@@ -0,0 +1,116 @@
+# tests/conftest.py
+"""
+Shared fixtures.
+
+Tests use config/bench.yaml: S3 is moto's in-memory stand-in and the
+database is a throwaway one (BENCH_DB_NAME, default shopflow_test) on the
+Postgres server of the BENCH_DB_* variables, default localhost. Tests that
+need the database are skipped when the server is unreachable.
+"""
+import os
+
+# Before any src module reads the config
+os.environ["ENV"] = "bench"
+for key, value in {"BENCH_DB_USER": "postgres", "BENCH_DB_PASSWORD": "postgres",
+                   "BENCH_DB_HOST": "localhost", "BENCH_DB_PORT": "5432",
+                   "BENCH_DB_NAME": "shopflow_test"}.items():
+    os.environ.setdefault(key, value)
+# moto accepts any credentials; never fall back to a real profile
+for key in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+    os.environ[key] = "testing"
+os.environ.pop("AWS_PROFILE", None)
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+
+# ---------- S3 ----------
+def _clear_s3_caches():
+    from src.cloud import s3_handler
+
+    for factory in (s3_handler.get_session, s3_handler.get_s3_client,
+                    s3_handler.get_s3_resource):
+        factory.cache_clear()
+
+
+@pytest.fixture
+def s3():
+    """A client of an empty, versioned moto bucket (s3_handler.bucket_name())."""
+    from moto import mock_aws
+    from src.cloud import s3_handler
+
+    with mock_aws():
+        _clear_s3_caches()
+        client = s3_handler.get_s3_client()
+        s3_handler.ensure_bucket_exists(s3_handler.bucket_name(), client)
+        s3_handler.ensure_versioning_enabled(s3_handler.bucket_name(), client)
+        yield client
+    _clear_s3_caches()
+
+
+# ---------- Raw files ----------
+CUSTOMERS = """\
+id,name,email,registration_date,country
+1,Ann,ann@example.com,2024-01-01,Malta
+2,Bob,bob@example.com,2024-01-02,Malta
+"""
+
+PRODUCTS = """\
+id,name,category,price,supplier
+1,Book,Books,10.0,Supplier A
+2,Lamp,Home,25.0,Supplier B
+"""
+
+TRANSACTIONS = """\
+id,customer_id,product_id,quantity,timestamp,payment_method
+1,1,1,1,2026-03-14T10:00:00,Credit Card
+2,2,1,2,2026-03-14T11:00:00,Bank Transfer
+"""
+
+
+@pytest.fixture
+def sources(tmp_path, monkeypatch):
+    """Local CSVs of every source, in place of the loader's data/raw files."""
+    from src.etl import load_to_db
+
+    paths = {}
+    for source, content in {"customers": CUSTOMERS, "products": PRODUCTS,
+                            "transactions": TRANSACTIONS}.items():
+        path = tmp_path / f"{source}.csv"
+        path.write_text(content)
+        paths[source] = str(path)
+    monkeypatch.setattr(load_to_db, "CSV_PATHS", paths)
+    return paths
+
+
+# ---------- Database ----------
+@pytest.fixture(scope="session")
+def _test_database():
+    """Create the test database (once) with the current schema."""
+    from src.reset_db import reset_db
+    from src.scripts import db_setup
+
+    server = db_setup.db_url().rsplit("/", 1)[0] + "/postgres"
+    try:
+        engine = create_engine(server, isolation_level="AUTOCOMMIT")
+        with engine.connect() as conn:
+            name = db_setup.db_config()["name"]
+            exists = conn.execute(text("SELECT 1 FROM pg_database WHERE datname = :n"),
+                                  {"n": name}).scalar()
+            if not exists:
+                conn.execute(text(f'CREATE DATABASE "{name}"'))
+        engine.dispose()
+    except OperationalError as e:
+        pytest.skip(f"Postgres not reachable: {e.orig}")
+    reset_db("drop")
+
+
+@pytest.fixture
+def database(_test_database):
+    """The test database, emptied before each test."""
+    from src.reset_db import reset_db
+    from src.scripts.db_setup import get_engine
+
+    reset_db("truncate")
+    return get_engine()
@@ -0,0 +1,28 @@
+# tests/test_analytics.py
+"""Cached analytics results follow the data as soon as it is committed."""
+import pytest
+
+from src import analytics
+from src.etl import load_to_db
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics, "_memory_cache", analytics.ResultCache())
+    monkeypatch.setattr(analytics, "_disk_cache", analytics.DiskCache(str(tmp_path / "cache")))
+
+
+def spend(df):
+    return dict(zip(df["customer_name"], df["total_spent"].astype(float)))
+
+
+def test_cache_sees_chunks_committed_before_the_audit_row(database, sources, caches):
+    load_to_db.load_data(workers=1)
+    assert spend(analytics.top_customers()) == {"Ann": 10.0, "Bob": 20.0}
+
+    with open(sources["transactions"], "a") as f:
+        f.write("3,1,2,4,2026-03-15T09:00:00,Credit Card\n")
+    # The loader's chunks are committed; its load_audit row is not written yet
+    load_to_db.load_source("transactions", [sources["transactions"]], chunk_size=1)
+
+    assert spend(analytics.top_customers()) == {"Ann": 110.0, "Bob": 20.0}
@@ -0,0 +1,84 @@
+# tests/test_bulk_load.py
+"""Bulk initial loads: deferred indexes and foreign keys are restored."""
+import pytest
+from sqlalchemy import text
+
+from src.etl import bulk_load, load_to_db
+
+TABLES = bulk_load.TARGET_TABLES + bulk_load.ROLLUP_TABLES
+
+
+def catalog(conn):
+    """Secondary indexes and foreign keys of the bulk-loaded tables, and
+    whether every foreign key is validated."""
+    validated = conn.execute(text("""
+        SELECT bool_and(convalidated) FROM pg_constraint
+        WHERE contype = 'f' AND conrelid::regclass::text = ANY(:tables)
+    """), {"tables": bulk_load.TARGET_TABLES}).scalar()
+    return (bulk_load.secondary_indexes(conn, TABLES),
+            bulk_load.foreign_keys(conn, bulk_load.TARGET_TABLES), validated)
+
+
+def deferred(conn):
+    return conn.execute(text(
+        f"SELECT kind, COUNT(*) FROM {bulk_load.DEFERRED_TABLE} GROUP BY kind ORDER BY kind"
+    )).fetchall()
+
+
+@pytest.mark.parametrize("concurrently", [False, True])
+def test_bulk_load_restores_indexes_and_foreign_keys(database, sources, monkeypatch,
+                                                     concurrently):
+    load_to_db.ensure_audit_tables()
+    with database.connect() as conn:
+        before = catalog(conn)
+    assert before[0] and before[1] and before[2]
+
+    during = []
+    stage = load_to_db.LOAD_STAGES["transactions"]
+
+    def inspect_then_load(df, conn, update_rollups=True):
+        during.append((catalog(conn)[:2], deferred(conn), update_rollups))
+        return stage(df, conn, update_rollups)
+
+    monkeypatch.setitem(load_to_db.LOAD_STAGES, "transactions", inspect_then_load)
+    load_to_db.load_data(workers=1, bulk=True, concurrently=concurrently)
+
+    # Loaded without the deferred objects or the per-chunk rollups
+    assert during == [(([], []), [("foreign_key", len(before[1])),
+                                  ("index", len(before[0]))], False)]
+    with database.connect() as conn:
+        assert catalog(conn) == before
+        assert deferred(conn) == []
+        assert conn.execute(text("SELECT COUNT(*) FROM transaction_items")).scalar() == 2
+        # The rollups were rebuilt in one pass
+        assert conn.execute(text(
+            "SELECT product_id, total_quantity FROM product_sales ORDER BY 1"
+        )).fetchall() == [(1, 3)]
+
+
+def test_bulk_load_of_a_loaded_target_loads_normally(database, sources):
+    load_to_db.load_data(workers=1)
+    assert bulk_load.begin() is False
+
+    with open(sources["transactions"], "a") as f:
+        f.write("3,1,2,4,2026-03-15T09:00:00,Cash\n")
+    load_to_db.load_data(workers=1, bulk=True)
+
+    with database.connect() as conn:
+        assert deferred(conn) == []
+        assert conn.execute(text(
+            "SELECT product_id, total_quantity FROM product_sales ORDER BY 1"
+        )).fetchall() == [(1, 3), (2, 4)]
+
+
+def test_interrupted_bulk_load_is_finished_by_the_next_load(database, sources):
+    load_to_db.ensure_audit_tables()
+    with database.connect() as conn:
+        before = catalog(conn)
+    assert bulk_load.begin() is True  # then the process dies
+
+    load_to_db.load_data(workers=1)
+
+    with database.connect() as conn:
+        assert catalog(conn) == before
+        assert deferred(conn) == []
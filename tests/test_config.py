@@ -0,0 +1,35 @@
+# tests/test_config.py
+"""Modules read the config when first used, not when imported."""
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+IMPORT_WITHOUT_CONFIG = """
+import config.config
+
+def get_config(env=None):
+    raise AssertionError("config read at import")
+
+config.config.get_config = get_config
+import src.scripts.db_setup, src.cloud.s3_handler, src.cloud.s3_reader, src.cloud.s3_compaction
+"""
+
+
+def test_import_reads_no_config():
+    result = subprocess.run([sys.executable, "-c", IMPORT_WITHOUT_CONFIG], cwd=ROOT,
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+
+def test_lazy_attributes_match_the_config():
+    from config.config import get_config
+    from src.cloud import s3_handler
+    from src.scripts import db_setup
+
+    config = get_config()
+    assert s3_handler.BUCKET_NAME == config["aws"]["bucket"]
+    assert s3_handler.TRANSFER_CONFIG is s3_handler.get_transfer_config()
+    assert db_setup.DB_URL.endswith(f"/{config['database']['name']}")
+    assert db_setup.Base.metadata.tables["transactions"] is db_setup.Transaction.__table__
@@ -0,0 +1,113 @@
+# tests/test_data_validator.py
+"""The vectorized validator reports what the original row-by-row checks did."""
+import pandas as pd
+import pytest
+
+from src import data_validator, schema
+
+CUSTOMERS = """\
+id,name,email,registration_date,country
+1,None,NA,2024-01-01,Namibia
+2,Ann,ann@example.com,null,NA
+3,Bob,bob@example.com,2024-01-02,
+4,NA,n/a@example.com,2024-01-03,None
+5,Eve,eve@example.com,2024-01-04,Malta
+"""
+
+
+@pytest.fixture
+def customers_csv(tmp_path):
+    path = tmp_path / "customers.csv"
+    path.write_text(CUSTOMERS)
+    return str(path)
+
+
+def stats(path, **kwargs):
+    frames = list(data_validator.read_frames(path, **kwargs))
+    return [data_validator.compute_stats(df) for df in frames]
+
+
+# ---------- Nulls ----------
+@pytest.mark.parametrize("options", [{}, {"chunk_size": 2}, {"engine": "pyarrow"}])
+def test_nulls_match_pandas_defaults(customers_csv, options):
+    if options.get("engine") == "pyarrow":
+        pytest.importorskip("pyarrow")
+    merged = None
+    for chunk_stats in stats(customers_csv, **options):
+        merged = data_validator.merge_stats(merged, chunk_stats)
+
+    # The original validator: pd.read_csv(file_path).isnull().sum()
+    expected = pd.read_csv(customers_csv).isnull().sum()
+    assert merged["nulls"].astype(int).to_dict() == expected.to_dict()
+    assert expected.to_dict() == {"id": 0, "name": 2, "email": 1, "registration_date": 1,
+                                  "country": 3}
+
+
+def test_loader_keeps_null_like_names(customers_csv):
+    df = schema.read_csv(customers_csv, "customers")
+    assert df["name"].tolist()[:4] == ["None", "Ann", "Bob", "NA"]
+    assert df.isnull().sum().to_dict() == {"id": 0, "name": 0, "email": 0,
+                                           "registration_date": 0, "country": 1}
+
+
+# ---------- Vectorized checks ----------
+EMAILS = [
+    "ann@example.com", "first.last-1@mail.example.co", "a@b.c", "a@b", "@b.c", "a b@c.de",
+    "ann@example.com\n", "ann@exa mple.com", "anné@example.com", "", "NA", None, float("nan"),
+    42, "ann@@example.com", "ann@example.c_m",
+]
+
+DATES = [
+    # canonical
+    "2024-01-01", "2024-02-29", "2024-01-01T10:00:00", "2024-01-01 23:59:59",
+    "2024-01-01T10:00:00.123", "2024-01-01T10:00:00.123456",
+    # valid ISO shapes outside the canonical pattern
+    "20240101", "2024-01-01T10", "2024-01-01T10:00", "2024-01-01T10:00:00Z",
+    "2024-01-01T10:00:00+02:00", "2024-01-01T10:00:00.1", "2024-01-01T10:00:00.1234567",
+    "2024-W01-1", "2024-001", "2024-01-01T24:00:00",
+    # invalid
+    "2023-02-29", "2024-13-01", "2024-1-1", "01/02/2024", " 2024-01-01", "2024-01-01 ",
+    "2024-01-01T25:00:00", "", "nan", "NA", None, float("nan"), 20240101,
+]
+
+
+@pytest.mark.parametrize("dtype", [object, "category"])
+def test_email_mask_matches_validate_email(dtype):
+    series = pd.Series(EMAILS, dtype=dtype)
+    expected = ~series.astype(object).apply(data_validator.validate_email)
+    assert data_validator.invalid_email_mask(series).tolist() == expected.tolist()
+
+
+def test_date_mask_matches_validate_date():
+    series = pd.Series(DATES * 2, dtype=object)
+    expected = ~series.apply(data_validator.validate_date)
+    assert data_validator.invalid_date_mask(series).tolist() == expected.tolist()
+
+
+def test_date_mask_on_parsed_column():
+    series = pd.Series(pd.to_datetime(["2024-01-01 10:00", None, "2024-03-01"],
+                                      format="ISO8601"))
+    expected = ~series.apply(data_validator.validate_date)
+    assert data_validator.invalid_date_mask(series).tolist() == expected.tolist()
+
+
+# ---------- Empty files ----------
+def test_files_without_chunks_report_zero_records(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    messages = []
+    monkeypatch.setattr(data_validator, "log", messages.append)
+    header_only = tmp_path / "customers" / "part-0.parquet"
+    header_only.parent.mkdir()
+    pq.write_table(schema.arrow_schema("customers").empty_table(), header_only)
+    empty = tmp_path / "products.csv"
+    empty.write_text("")
+    paths = [str(header_only), str(empty)]
+
+    data_validator.validate_files(paths, workers=1, chunk_size=10)
+    data_validator.validate_file(str(header_only), chunk_size=10)
+
+    validating = [m for m in messages if "Validating" in m]
+    assert len(validating) == 2 and all("(0 records)" in m for m in validating)
+    assert sum("❌ Validation failed" in m for m in messages) == 1
@@ -0,0 +1,63 @@
+# tests/test_dimensions.py
+"""Dimension key resolution and the anti-join foreign key check."""
+from sqlalchemy import event, text
+
+from src.etl import dimensions
+
+
+def statements(conn):
+    """SQL statements `conn` runs from now on."""
+    executed = []
+    event.listen(conn, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: executed.append(statement))
+    return executed
+
+
+def test_key_cache_evicts_least_recently_used():
+    cache = dimensions.KeyCache(max_size=2)
+    cache.put_many({"a": 1, "b": 2})
+    assert cache.get_many(["a"]) == {"a": 1}  # b is now the oldest
+    cache.put_many({"c": 3})
+    assert cache.get_many(["a", "b", "c"]) == {"a": 1, "c": 3} and len(cache) == 2
+
+
+def test_resolve_keys_inserts_new_keys_and_caches_ids(database):
+    with database.begin() as conn:
+        conn.execute(text("INSERT INTO payment_methods (method) VALUES ('Cash')"))
+
+    with database.begin() as conn:
+        executed = statements(conn)
+        resolved = dimensions.resolve_keys(conn, "payment_methods",
+                                           ["Cash", "Credit Card", "Cash"])
+        assert len(executed) == 1
+        stored = dict(conn.execute(text("SELECT method, id FROM payment_methods")).fetchall())
+        assert resolved == stored and set(stored) == {"Cash", "Credit Card"}
+
+    with database.begin() as conn:
+        executed = statements(conn)
+        assert dimensions.resolve_keys(conn, "payment_methods", ["Credit Card"]) \
+            == {"Credit Card": stored["Credit Card"]}
+        assert executed == []  # served from the cache
+
+
+def test_rolled_back_keys_are_resolved_again(database):
+    with database.connect() as conn:
+        with conn.begin() as transaction:
+            dimensions.resolve_keys(conn, "suppliers", ["Supplier A"])
+            transaction.rollback()
+    dimensions.clear_caches()  # as the loader does when a step fails
+
+    with database.begin() as conn:
+        resolved = dimensions.resolve_keys(conn, "suppliers", ["Supplier A"])
+        assert conn.execute(text("SELECT id FROM suppliers")).scalar() \
+            == resolved["Supplier A"]
+
+
+def test_missing_keys_is_an_anti_join(database):
+    with database.begin() as conn:
+        conn.execute(text("""
+            INSERT INTO customers (id, name, email)
+            VALUES (1, 'Ann', 'ann@example.com'), (2, 'Bob', 'bob@example.com')
+        """))
+        assert dimensions.missing_keys(conn, "customers", [1, 3, 3, 2, 4]) == {3, 4}
+        assert dimensions.missing_keys(conn, "customers", []) == set()
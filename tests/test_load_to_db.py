@@ -0,0 +1,129 @@
+# tests/test_load_to_db.py
+"""Loads into the test database: upserts, incremental and resumed loads."""
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from src.etl import load_to_db
+
+
+def append(path, rows):
+    with open(path, "a") as f:
+        f.write("".join(f"{row}\n" for row in rows))
+
+
+def customers(names):
+    return pd.DataFrame({
+        "id": range(1, len(names) + 1), "name": names,
+        "email": [f"c{i}@example.com" for i in range(1, len(names) + 1)],
+        "registration_date": pd.Timestamp("2024-01-01"), "country": "Malta",
+    })
+
+
+def items(conn):
+    return conn.execute(text(
+        "SELECT transaction_id, product_id, quantity FROM transaction_items ORDER BY 1, 2"
+    )).fetchall()
+
+
+# ---------- Upserts ----------
+@pytest.mark.parametrize("method", ["insert", "copy"])
+def test_upsert_methods_agree(database, method):
+    first = load_to_db.upsert_table(customers(["Ann", "Bob"]), "customers", ["id"], method)
+    second = load_to_db.upsert_table(customers(["Ann", "Rob", "Cy"]), "customers", ["id"],
+                                     method)
+
+    assert first == {"inserted": 2, "updated": 0, "unchanged": 0}
+    assert second == {"inserted": 1, "updated": 1, "unchanged": 1}
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT id, name FROM customers ORDER BY id")).fetchall() \
+            == [(1, "Ann"), (2, "Rob"), (3, "Cy")]
+
+
+@pytest.mark.parametrize("method", ["insert", "copy"])
+def test_unchanged_rows_are_not_rewritten(database, method):
+    frame = customers(["Ann", "Bob", "Cy"])
+    load_to_db.upsert_table(frame, "customers", ["id"], method)
+    with database.connect() as conn:
+        versions = conn.execute(text("SELECT id, xmin::text FROM customers")).fetchall()
+
+    # Duplicate keys in one frame: the last row wins
+    again = load_to_db.upsert_table(pd.concat([frame.assign(name="old"), frame]),
+                                    "customers", ["id"], method)
+
+    assert again == {"inserted": 0, "updated": 0, "unchanged": 3}
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT id, xmin::text FROM customers")).fetchall() \
+            == versions
+
+
+def test_audit_records_upsert_outcomes(database, sources):
+    load_to_db.load_data(workers=1)
+    load_to_db.load_data(full_reload=True, workers=1)
+
+    with database.connect() as conn:
+        assert conn.execute(text("""
+            SELECT inserted_count, updated_count, unchanged_count FROM load_audit
+            WHERE table_name = 'customers' AND status = 'success' ORDER BY id
+        """)).fetchall() == [(2, 0, 0), (0, 0, 2)]
+
+
+# ---------- Incremental loads ----------
+def test_append_loads_items_of_loaded_transactions(database, sources):
+    load_to_db.load_data(workers=1)
+    # A second item of transaction 2, and a new transaction
+    append(sources["transactions"], ["2,2,2,1,2026-03-14T11:00:00,Bank Transfer",
+                                     "3,1,2,4,2026-03-15T09:00:00,Credit Card"])
+
+    results = load_to_db.load_data(workers=1)
+
+    # Only the two appended rows are read
+    assert set(results) == {"transactions", "payment_methods"}
+    assert results["transactions"]["transactions"] == {"inserted": 1, "updated": 0,
+                                                       "unchanged": 1}
+    assert results["transactions"]["transaction_items"]["inserted"] == 2
+    with database.connect() as conn:
+        assert items(conn) == [(1, 1, 1), (2, 1, 2), (2, 2, 1), (3, 2, 4)]
+
+
+
+def test_unchanged_files_are_skipped(database, sources):
+    load_to_db.load_data(workers=1)
+
+    assert load_to_db.load_data(workers=1) == {}
+    with database.connect() as conn:
+        assert conn.execute(text(
+            "SELECT table_name FROM load_audit WHERE status = 'skipped' ORDER BY 1"
+        )).scalars().all() == ["customers", "products", "transactions"]
+    # Unless forced
+    results = load_to_db.load_data(full_reload=True, workers=1)
+    assert results["customers"]["customers"] == {"inserted": 0, "updated": 0,
+                                                 "unchanged": 2}
+
+
+# ---------- Resumed loads ----------
+def test_interrupted_chunked_load_resumes_after_last_commit(database, sources, monkeypatch):
+    append(sources["transactions"], [f"{i},1,2,{i},2026-03-15T09:00:00,Credit Card"
+                                     for i in range(3, 8)])
+    stage = load_to_db.LOAD_STAGES["transactions"]
+    loaded = []
+
+    def load_then_fail(df, conn, update_rollups=True):
+        if len(loaded) == 3:
+            raise RuntimeError("killed")
+        loaded.append(df["id"].tolist())
+        return stage(df, conn, update_rollups)
+
+    monkeypatch.setitem(load_to_db.LOAD_STAGES, "transactions", load_then_fail)
+    with pytest.raises(RuntimeError, match="killed"):
+        load_to_db.load_data(chunk_size=2, workers=1)
+    assert load_to_db.get_checkpoint("transactions") == (6, 3)
+
+    loaded.clear()
+    load_to_db.load_data(chunk_size=2, resume=True, workers=1)
+
+    assert loaded == [[7]]
+    assert load_to_db.get_checkpoint("transactions") == (0, 0)  # complete
+    with database.connect() as conn:
+        assert [row[0] for row in items(conn)] == list(range(1, 8))
+        assert conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 7
@@ -0,0 +1,110 @@
+# tests/test_partitions.py
+"""Monthly partitions of transactions and transaction_items.
+
+The test database is not partitioned, so these run against partitioned
+copies of the two tables in their own schema, put first on the search path.
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
+
+from src.scripts import db_setup
+
+SCHEMA = "partition_test"
+
+
+@pytest.fixture
+def partitioned(database, monkeypatch):
+    """An engine whose unqualified transactions tables are partitioned."""
+    engine = create_engine(db_setup.db_url(),
+                           connect_args={"options": f"-csearch_path={SCHEMA}"})
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text("""
+            CREATE TABLE transactions (
+                id INTEGER NOT NULL,
+                customer_id INTEGER NOT NULL,
+                timestamp TIMESTAMP NOT NULL,
+                payment_method_id INTEGER,
+                PRIMARY KEY (id, timestamp)
+            ) PARTITION BY RANGE (timestamp)
+        """))
+        conn.execute(text("""
+            CREATE TABLE transaction_items (
+                id SERIAL,
+                transaction_id INTEGER NOT NULL,
+                product_id INTEGER NOT NULL,
+                quantity INTEGER NOT NULL,
+                transaction_timestamp TIMESTAMP NOT NULL,
+                PRIMARY KEY (id, transaction_timestamp),
+                FOREIGN KEY (transaction_id, transaction_timestamp)
+                    REFERENCES transactions (id, timestamp),
+                CONSTRAINT uix_transaction_product
+                    UNIQUE (transaction_id, product_id, transaction_timestamp)
+            ) PARTITION BY RANGE (transaction_timestamp)
+        """))
+    monkeypatch.setattr(db_setup, "get_engine", lambda: engine)
+    yield engine
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    engine.dispose()
+
+
+def add_order(conn, transaction_id, timestamp):
+    conn.execute(text("INSERT INTO transactions VALUES (:id, 1, :ts, NULL)"),
+                 {"id": transaction_id, "ts": timestamp})
+    conn.execute(text("""
+        INSERT INTO transaction_items (transaction_id, product_id, quantity, transaction_timestamp)
+        VALUES (:id, 1, 1, :ts)
+    """), {"id": transaction_id, "ts": timestamp})
+
+
+def test_ensure_partitions_covers_every_month(partitioned):
+    with partitioned.begin() as conn:
+        assert db_setup.is_partitioned(conn)
+        db_setup.ensure_partitions(conn, [date(2026, 1, 31), date(2026, 3, 1),
+                                          date(2026, 1, 1)])
+        db_setup.ensure_partitions(conn, [date(2026, 3, 15)])  # already there
+        add_order(conn, 1, "2026-01-31 23:59:59")
+        add_order(conn, 2, "2026-03-01 00:00:00")
+
+        for table in db_setup.PARTITION_KEYS:
+            assert db_setup.list_partitions(conn, table) == [
+                (f"{table}_p202601", date(2026, 1, 1)), (f"{table}_p202603", date(2026, 3, 1)),
+            ]
+        assert conn.execute(text("SELECT COUNT(*) FROM transactions_p202601")).scalar() == 1
+        with pytest.raises(IntegrityError, match="no partition"):
+            with conn.begin_nested():
+                add_order(conn, 3, "2026-02-10 12:00:00")
+
+
+@pytest.mark.parametrize("drop", [False, True])
+def test_retire_partitions_before_a_month(partitioned, drop):
+    with partitioned.begin() as conn:
+        db_setup.ensure_partitions(conn, [date(2026, 1, 1), date(2026, 2, 1), date(2026, 3, 1)])
+        add_order(conn, 1, "2026-01-10 10:00:00")
+        add_order(conn, 2, "2026-03-10 10:00:00")
+
+    retired = db_setup.retire_partitions(date(2026, 2, 14), drop=drop)
+
+    assert retired == ["transaction_items_p202601", "transactions_p202601"]
+    with partitioned.connect() as conn:
+        for table in db_setup.PARTITION_KEYS:
+            assert [name for name, _ in db_setup.list_partitions(conn, table)] \
+                == [f"{table}_p202602", f"{table}_p202603"]
+        assert conn.execute(text("SELECT id FROM transactions")).scalars().all() == [2]
+        detached = conn.execute(text(
+            "SELECT to_regclass('transactions_p202601') IS NOT NULL"
+        )).scalar()
+        assert detached is not drop
+        if not drop:
+            # Kept for archiving, without the foreign key to the live table
+            assert conn.execute(text("SELECT COUNT(*) FROM transaction_items_p202601")).scalar() \
+                == 1
+            assert conn.execute(text("""
+                SELECT COUNT(*) FROM pg_constraint
+                WHERE conrelid = 'transaction_items_p202601'::regclass AND contype = 'f'
+            """)).scalar() == 0
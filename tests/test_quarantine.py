@@ -0,0 +1,70 @@
+# tests/test_quarantine.py
+"""Row-level validation of loader chunks and the quarantine table."""
+import pandas as pd
+from sqlalchemy import text
+
+from src.etl import load_to_db, quarantine
+
+# id, customer_id, product_id, quantity, timestamp
+ROWS = [
+    ("1", "1", "1", "1", "2026-03-14T10:00:00"),
+    ("2", "9", "1", "2", "2026-03-14T11:00:00"),   # unknown customer
+    ("3", "2", "2", "0", "2026-03-14T12:00:00"),   # zero quantity
+    ("4", "2", None, "1.5", "14/03/2026"),         # three problems
+    ("5", "2", "2", "3", "2026-03-15T09:00:00"),
+]
+
+
+def transactions(rows):
+    return pd.DataFrame(rows, columns=["id", "customer_id", "product_id", "quantity",
+                                       "timestamp"]).assign(payment_method="Cash")
+
+
+def test_check_chunk_splits_and_stores_rejected_rows(database, sources):
+    load_to_db.load_data(workers=1)
+
+    with database.begin() as conn:
+        clean, rejected = quarantine.check_chunk(conn, "transactions", transactions(ROWS))
+        assert clean["id"].tolist() == [1, 5]
+        assert clean["quantity"].tolist() == [1, 3]
+        assert dict(zip(rejected["id"], rejected["reasons"])) == {
+            "2": "unknown customer_id",
+            "3": "non-positive quantity",
+            "4": "null product_id; invalid quantity; invalid timestamp",
+        }
+        assert quarantine.summarize(rejected)["invalid quantity"] == 1
+
+        assert quarantine.store(conn, "transactions", rejected, "t.csv", "run-1") == 3
+        assert quarantine.store(conn, "transactions", rejected.iloc[:0]) == 0
+
+    with database.connect() as conn:
+        stored = conn.execute(text(f"""
+            SELECT run_id, source, source_file, reasons, record
+            FROM {quarantine.QUARANTINE_TABLE} ORDER BY id
+        """)).fetchall()
+    assert [row[:3] for row in stored] == [("run-1", "transactions", "t.csv")] * 3
+    # The original values, as read
+    assert stored[2].record == {"id": "4", "customer_id": "2", "product_id": None,
+                                "quantity": "1.5", "timestamp": "14/03/2026",
+                                "payment_method": "Cash"}
+
+
+def test_bad_rows_are_quarantined_and_the_rest_loaded(database, sources):
+    with open(sources["transactions"], "a") as f:
+        f.write("3,9,1,1,2026-03-15T09:00:00,Cash\n"
+                "4,1,2,-1,2026-03-15T10:00:00,Cash\n"
+                "5,2,2,1,2026-03-15T11:00:00,Cash\n")
+
+    results = load_to_db.load_data(workers=1)
+
+    assert results["transactions"][quarantine.QUARANTINE_TABLE] == 2
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT id FROM transactions ORDER BY id")).scalars().all() \
+            == [1, 2, 5]
+        assert conn.execute(text(f"""
+            SELECT record->>'id', reasons FROM {quarantine.QUARANTINE_TABLE} ORDER BY id
+        """)).fetchall() == [("3", "unknown customer_id"), ("4", "non-positive quantity")]
+        assert conn.execute(text("""
+            SELECT row_count FROM load_audit
+            WHERE table_name = 'load_quarantine' AND status = 'quarantined'
+        """)).scalar() == 2
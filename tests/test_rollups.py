@@ -0,0 +1,125 @@
+# tests/test_rollups.py
+"""Incremental rollups under concurrent loads."""
+import threading
+import time
+from datetime import date
+
+from sqlalchemy import text
+
+from src.etl import rollups
+
+DAY = "2026-03-14"
+
+
+def seed(conn):
+    conn.execute(text("INSERT INTO suppliers (id, name) VALUES (1, 'Supplier A')"))
+    conn.execute(text("""
+        INSERT INTO products (id, name, category, price, supplier_id)
+        VALUES (1, 'Book', 'Books', 10.0, 1)
+    """))
+    conn.execute(text("""
+        INSERT INTO customers (id, name, email, country)
+        VALUES (1, 'Ann', 'ann@example.com', 'Malta'), (2, 'Bob', 'bob@example.com', 'Malta')
+    """))
+
+
+def add_order(conn, transaction_id, customer_id, quantity, day=DAY):
+    conn.execute(text("""
+        INSERT INTO transactions (id, customer_id, timestamp)
+        VALUES (:id, :customer, :timestamp)
+    """), {"id": transaction_id, "customer": customer_id, "timestamp": f"{day} 10:00:00"})
+    conn.execute(text("""
+        INSERT INTO transaction_items (transaction_id, product_id, quantity)
+        VALUES (:id, 1, :quantity)
+    """), {"id": transaction_id, "quantity": quantity})
+    rollups.refresh_orders(conn, [transaction_id])
+
+
+def test_concurrent_loads_of_one_day(database):
+    rollups.ensure_rollups()
+    with database.begin() as conn:
+        seed(conn)
+
+    errors = []
+
+    def second_load():
+        try:
+            with database.begin() as conn:
+                add_order(conn, 2, 2, quantity=2)
+        except Exception as e:  # reported by the assertion below
+            errors.append(e)
+
+    with database.connect() as first:
+        with first.begin():
+            add_order(first, 1, 1, quantity=1)
+            thread = threading.Thread(target=second_load)
+            thread.start()
+            time.sleep(0.5)
+            # The second load waits for this one's lock on the day
+            assert thread.is_alive()
+    thread.join(timeout=30)
+
+    assert errors == []
+    with database.connect() as conn:
+        assert conn.execute(text(
+            "SELECT revenue, order_count FROM daily_revenue WHERE day = :day"
+        ), {"day": DAY}).one() == (30.0, 2)
+        assert conn.execute(text(
+            "SELECT customer_id, total_spent FROM customer_spend ORDER BY customer_id"
+        )).fetchall() == [(1, 10.0), (2, 20.0)]
+
+
+def test_moved_order_leaves_no_empty_day(database):
+    rollups.ensure_rollups()
+    with database.begin() as conn:
+        seed(conn)
+        add_order(conn, 1, 1, quantity=1)
+        conn.execute(text("UPDATE transactions SET timestamp = '2026-03-15 09:00' WHERE id = 1"))
+        rollups.refresh_orders(conn, [1])
+
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT day, order_count FROM daily_revenue")).fetchall() \
+            == [(date(2026, 3, 15), 1)]
+        assert conn.execute(text("SELECT order_count FROM customer_spend")).scalar() == 1
+
+
+def change_items(conn, transaction_ids, *statements):
+    """Run `statements` on the items of `transaction_ids`, updating the
+    rollups the way the loader does."""
+    before = rollups.item_quantities(conn, transaction_ids)
+    for statement in statements:
+        conn.execute(text(statement))
+    rollups.apply_product_deltas(conn, before, rollups.item_quantities(conn, transaction_ids))
+    rollups.refresh_orders(conn, transaction_ids)
+
+
+def rollup_rows(conn):
+    return {table.name: sorted(conn.execute(table.select()).fetchall())
+            for table in rollups.ROLLUP_TABLES}
+
+
+def test_incremental_rollups_match_a_rebuild(database):
+    rollups.ensure_rollups()
+    with database.begin() as conn:
+        seed(conn)
+        conn.execute(text("""
+            INSERT INTO products (id, name, category, price, supplier_id)
+            VALUES (2, 'Lamp', 'Home', 25.0, 1)
+        """))
+        conn.execute(text("""
+            INSERT INTO transactions (id, customer_id, timestamp)
+            VALUES (1, 1, '2026-03-14 10:00'), (2, 2, '2026-03-15 10:00')
+        """))
+        change_items(conn, [1, 2], """
+            INSERT INTO transaction_items (transaction_id, product_id, quantity)
+            VALUES (1, 1, 1), (1, 2, 2), (2, 1, 3)
+        """)
+        change_items(conn, [2],
+                     "UPDATE transaction_items SET quantity = 1 WHERE transaction_id = 2")
+        # The only Lamp sold goes away: its quantity nets to zero
+        change_items(conn, [1], "DELETE FROM transaction_items WHERE product_id = 2")
+        incremental = rollup_rows(conn)
+
+        rollups.rebuild_rollups(conn)
+        assert incremental == rollup_rows(conn)
+        assert incremental["product_sales"] == [(1, 2)]
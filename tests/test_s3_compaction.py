@@ -0,0 +1,248 @@
+# tests/test_s3_compaction.py
+"""Compaction of the S3 raw zone and how s3_reader picks its sources."""
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from src import schema
+from src.cloud import s3_compaction, s3_handler, s3_reader
+from src.cloud.s3_handler import BUCKET_NAME
+
+DAY = "2026-03-14"
+NEXT_DAY = "2026-03-15"
+CLOSED = datetime(2026, 4, 2, tzinfo=timezone.utc)  # after March and its settle time
+
+
+# ---------- Helpers ----------
+def customers(names):
+    return pd.DataFrame({
+        "id": range(1, len(names) + 1), "name": names,
+        "email": [f"c{i}@example.com" for i in range(1, len(names) + 1)],
+        "registration_date": "2024-01-01", "country": "Malta",
+    })
+
+
+def products(count=3):
+    return pd.DataFrame({
+        "id": range(1, count + 1), "name": [f"Product {i}" for i in range(1, count + 1)],
+        "category": "Books", "price": 9.5, "supplier": "Supplier A",
+    })
+
+
+def items(rows):
+    """Transaction items from (id, product_id, quantity) tuples."""
+    df = pd.DataFrame(rows, columns=["id", "product_id", "quantity"])
+    df["customer_id"] = 1
+    df["timestamp"] = "2026-03-14T10:00:00"
+    df["payment_method"] = "Credit Card"
+    return df[["id", "customer_id", "product_id", "quantity", "timestamp", "payment_method"]]
+
+
+def raw_key(day, hhmmss, file_type, fmt="csv"):
+    year, month, dd = day.split("-")
+    name = f"{file_type}.csv" if fmt == "csv" else "part-0.parquet"
+    return f"raw/year={year}/month={month}/day={dd}/{file_type}/{hhmmss}_{name}"
+
+
+def put(client, day, hhmmss, file_type, df, fmt="csv"):
+    key = raw_key(day, hhmmss, file_type, fmt)
+    if fmt == "parquet":
+        body = s3_compaction.encode_part(schema.compact(df.copy(), file_type),
+                                         file_type, "parquet")
+    else:
+        body = df.to_csv(index=False).encode()
+    client.put_object(Bucket=BUCKET_NAME, Key=key, Body=body)
+    return key
+
+
+def read(client, objects, file_type, fmt="csv"):
+    frames = [s3_compaction.read_object_frame(obj["Key"], file_type, fmt, client, BUCKET_NAME)
+              for obj in objects]
+    return pd.concat(frames, ignore_index=True)
+
+
+def keys(client, prefix):
+    return sorted(obj["Key"] for obj in s3_reader._list_objects(client, BUCKET_NAME, prefix))
+
+
+# ---------- Deduplication ----------
+def test_latest_upload_wins(s3):
+    for i in range(5):
+        put(s3, DAY, f"10{i:02d}00", "customers", customers([f"v{i}", "Bob"]))
+
+    manifest = s3_compaction.compact_partition(DAY, "customers", client=s3, now=CLOSED)
+
+    assert manifest["replaced"] == 5 and manifest["rows"] == 2 and manifest["complete"]
+    assert keys(s3, "raw/") == []
+    objects = s3_reader.latest_objects("customers", day=DAY, client=s3)
+    assert [obj["Key"] for obj in objects] == [obj["Key"] for obj in manifest["objects"]]
+    assert objects[0]["Key"].endswith(".csv.gz")
+    assert read(s3, objects, "customers")["name"].tolist() == ["v4", "Bob"]
+
+
+def test_transaction_items_keep_every_product(s3):
+    put(s3, DAY, "100000", "transactions", items([(1, 10, 1), (1, 11, 1), (2, 10, 1)]))
+    put(s3, DAY, "110000", "transactions", items([(1, 10, 7)]))
+
+    manifest = s3_compaction.compact_partition(DAY, "transactions", client=s3, now=CLOSED)
+
+    df = read(s3, manifest["objects"], "transactions")
+    assert list(zip(df["id"], df["product_id"], df["quantity"])) == \
+        [(1, 10, 7), (1, 11, 1), (2, 10, 1)]
+
+
+def test_deduplicate_keys():
+    df = s3_compaction.deduplicate([items([(1, 10, 1), (1, 11, 2)]), items([(1, 10, 3)])],
+                                   "transactions")
+    assert df[["id", "product_id", "quantity"]].values.tolist() == [[1, 10, 3], [1, 11, 2]]
+
+
+# ---------- Concurrent uploads ----------
+def test_unsettled_uploads_stay_and_win(s3):
+    now = datetime(2026, 3, 14, 12, 0, 0, tzinfo=timezone.utc)
+    put(s3, DAY, "100000", "customers", customers(["old"]))
+    recent = put(s3, DAY, "115900", "customers", customers(["in flight"]))
+
+    manifest = s3_compaction.compact_partition(DAY, "customers", client=s3, now=now,
+                                               settle_seconds=300)
+
+    assert manifest["replaced"] == 1 and not manifest["complete"]
+    assert keys(s3, "raw/") == [recent]
+    objects = s3_reader.latest_objects("customers", day=DAY, client=s3)
+    assert [obj["Key"] for obj in objects] == [recent]
+
+
+def test_manifest_serves_open_partition_without_uploads(s3):
+    put(s3, DAY, "100000", "customers", customers(["only"]))
+    now = datetime(2026, 3, 14, 12, tzinfo=timezone.utc)
+    manifest = s3_compaction.compact_partition(DAY, "customers", client=s3, now=now)
+
+    objects = s3_reader.latest_objects("customers", day=DAY, client=s3)
+    assert objects == manifest["objects"]
+
+
+def test_complete_manifest_skips_listing(s3):
+    put(s3, DAY, "100000", "customers", customers(["compacted"]))
+    s3_compaction.compact_partition(DAY, "customers", client=s3, now=CLOSED)
+    # A closed partition gets no more uploads, so readers do not list it
+    put(s3, DAY, "235959", "customers", customers(["ignored"]))
+
+    objects = s3_reader.latest_objects("customers", day=DAY, client=s3)
+    assert read(s3, objects, "customers")["name"].tolist() == ["compacted"]
+
+
+@pytest.mark.parametrize("compacted_before", [False, True])
+def test_overlapping_compaction_aborts(s3, monkeypatch, compacted_before):
+    if compacted_before:
+        put(s3, DAY, "090000", "customers", customers(["earlier"]))
+        s3_compaction.compact_partition(DAY, "customers", client=s3, now=CLOSED)
+    raw = put(s3, DAY, "100000", "customers", customers(["a"]))
+    path, _, _ = s3_compaction.parse_partition(DAY)
+    manifest_key = s3_reader.manifest_key(path, "customers")
+    before = keys(s3, "compacted/")
+    put_object = s3.put_object
+
+    def overlapping_put(**kwargs):
+        if kwargs["Key"] == manifest_key:
+            # Another compaction writes its manifest just before this one
+            put_object(Bucket=BUCKET_NAME, Key=manifest_key, Body=b'{"objects": []}')
+        return put_object(**kwargs)
+
+    monkeypatch.setattr(s3, "put_object", overlapping_put)
+
+    with pytest.raises(RuntimeError, match="changed during compaction"):
+        s3_compaction.compact_partition(DAY, "customers", client=s3, now=CLOSED)
+
+    assert keys(s3, "compacted/") == sorted(set(before) | {manifest_key})
+    assert s3.get_object(Bucket=BUCKET_NAME, Key=manifest_key)["Body"].read() \
+        == b'{"objects": []}'
+    assert keys(s3, "raw/") == [raw]
+
+
+def test_retried_manifest_write_is_not_a_conflict(s3):
+    key = "compacted/_manifest.csv.json"
+    assert s3_compaction._put_manifest(s3, BUCKET_NAME, key, {}, None, "run-1")
+    # A retry of that request, or another run, finds the manifest written
+    assert s3_compaction._put_manifest(s3, BUCKET_NAME, key, {}, None, "run-1")
+    assert not s3_compaction._put_manifest(s3, BUCKET_NAME, key, {}, None, "run-2")
+
+
+def test_dry_run_writes_nothing(s3):
+    put(s3, DAY, "100000", "customers", customers(["a"]))
+    assert s3_compaction.compact_partition(DAY, "customers", client=s3, now=CLOSED,
+                                           dry_run=True) is None
+    assert keys(s3, "compacted/") == []
+    assert len(keys(s3, "raw/")) == 1
+
+
+def test_unchanged_upload_skipped_after_compaction(s3, tmp_path):
+    path = tmp_path / "customers.csv"
+    customers(["Ann", "Bob"]).to_csv(path, index=False)
+    key = s3_handler.upload_file(str(path), "customers", s3)["key"]
+    year, month, day = (part.split("=")[1] for part in key.split("/")[1:4])
+    later = datetime.now(timezone.utc) + timedelta(days=2)
+
+    s3_compaction.compact_partition(f"{year}-{month}-{day}", "customers", client=s3, now=later)
+
+    assert keys(s3, "raw/") == []
+    assert s3_handler.upload_file(str(path), "customers", s3)["skipped"]
+
+
+# ---------- Month compaction ----------
+def test_month_absorbs_day_compactions(s3):
+    put(s3, DAY, "100000", "customers", customers(["day 14", "Bob"]))
+    s3_compaction.compact_partition(DAY, "customers", client=s3, now=CLOSED)
+    put(s3, NEXT_DAY, "090000", "customers", customers(["day 15"]))
+
+    manifest = s3_compaction.compact_partition("2026-03", "customers", client=s3, now=CLOSED)
+
+    assert manifest["replaced"] == 2 and manifest["complete"]
+    assert keys(s3, "raw/") == []
+    assert [key for key in keys(s3, "compacted/") if "day=" in key] == []
+    for day in (DAY, NEXT_DAY):
+        objects = s3_reader.latest_objects("customers", day=day, client=s3)
+        assert objects == manifest["objects"]
+    assert read(s3, manifest["objects"], "customers")["name"].tolist() == ["day 15", "Bob"]
+
+
+# ---------- Parquet ----------
+def test_parquet_parts(s3):
+    pytest.importorskip("pyarrow")
+    rows = [(i, i % 7, 1) for i in range(1, 3001)]
+    put(s3, DAY, "100000", "transactions", items(rows), fmt="parquet")
+    put(s3, DAY, "110000", "transactions", items(rows[:1000]), fmt="parquet")
+
+    manifest = s3_compaction.compact_partition(DAY, "transactions", fmt="parquet",
+                                               target_mb=0.05, client=s3, now=CLOSED)
+
+    assert len(manifest["objects"]) > 1
+    assert all(obj["Key"].endswith(".parquet") for obj in manifest["objects"])
+    assert sum(obj["rows"] for obj in manifest["objects"]) == 3000
+    objects = s3_reader.latest_objects("transactions", fmt="parquet", day=DAY, client=s3)
+    df = read(s3, objects, "transactions", fmt="parquet")
+    assert len(df) == 3000 and not df.duplicated(["id", "product_id"]).any()
+    assert s3_reader.latest_objects("transactions", day=DAY, client=s3) == []
+
+
+# ---------- Loading ----------
+def test_load_compacted_partition(s3, database):
+    from src.etl import load_to_db
+
+    for i in range(3):
+        put(s3, DAY, f"10{i:02d}00", "customers", customers([f"v{i}", "Bob"]))
+        put(s3, DAY, f"10{i:02d}00", "products", products())
+        put(s3, DAY, f"10{i:02d}00", "transactions",
+            items([(t, p, i + 1) for t in range(1, 41) for p in (1, 2)]))
+    s3_compaction.compact(DAY, client=s3, now=CLOSED)
+
+    load_to_db.cli(["--from-s3", "--s3-day", DAY, "--chunk-size", "25", "--full-reload"])
+
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT name FROM customers ORDER BY id")).scalars().all() \
+            == ["v2", "Bob"]
+        assert conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 40
+        assert conn.execute(text(
+            "SELECT COUNT(*), MIN(quantity), MAX(quantity) FROM transaction_items"
+        )).one() == (80, 3, 3)
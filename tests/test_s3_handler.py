@@ -0,0 +1,128 @@
+# tests/test_s3_handler.py
+"""Uploads to a moto bucket: concurrency, skip-if-unchanged, pointers, retries."""
+import json
+import threading
+
+import pytest
+from botocore.exceptions import ClientError
+
+from src.cloud import s3_handler
+from src.cloud.s3_handler import BUCKET_NAME, LATEST_PREFIX
+
+
+@pytest.fixture
+def raw_files(tmp_path, monkeypatch):
+    paths = {}
+    for file_type in s3_handler.CSV_PATHS:
+        path = tmp_path / f"{file_type}.csv"
+        path.write_text(f"id,name\n1,{file_type}\n")
+        paths[file_type] = str(path)
+    monkeypatch.setattr(s3_handler, "CSV_PATHS", paths)
+    return paths
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(s3_handler.time, "sleep", delays.append)
+    return delays
+
+
+def pointer(client, name):
+    body = client.get_object(Bucket=BUCKET_NAME, Key=f"{LATEST_PREFIX}{name}.json")["Body"]
+    return json.loads(body.read())
+
+
+# ---------- Uploads ----------
+def test_upload_records_hash_and_pointer(s3, raw_files):
+    path = raw_files["customers"]
+
+    result = s3_handler.upload_file(path, "customers", s3)
+
+    assert not result["skipped"] and result["bytes"] > 0 and result["seconds"] >= 0
+    assert result["key"].startswith("raw/year=") and result["key"].endswith("_customers.csv")
+    digest = s3_handler.file_sha256(path)
+    head = s3.head_object(Bucket=BUCKET_NAME, Key=result["key"])
+    assert head["Metadata"]["sha256"] == digest
+    assert pointer(s3, "customers") == {"key": result["key"], "sha256": digest}
+    assert s3_handler.get_latest_upload_hash("customers", s3) == digest
+
+
+def test_unchanged_file_is_skipped(s3, raw_files):
+    path = raw_files["customers"]
+    first = s3_handler.upload_file(path, "customers", s3)
+
+    assert s3_handler.upload_file(path, "customers", s3)["skipped"]
+    assert pointer(s3, "customers")["key"] == first["key"]
+    # Forced, or with new content, it is uploaded again
+    assert not s3_handler.upload_file(path, "customers", s3, force=True)["skipped"]
+    with open(path, "a") as f:
+        f.write("2,changed\n")
+    changed = s3_handler.upload_file(path, "customers", s3)
+    assert not changed["skipped"]
+    assert pointer(s3, "customers")["sha256"] == s3_handler.file_sha256(path)
+
+
+def test_files_upload_concurrently(s3, raw_files, monkeypatch):
+    # Every upload waits for the others: serial uploads would break the barrier
+    barrier = threading.Barrier(len(raw_files), timeout=10)
+    upload = s3.upload_file
+
+    def upload_together(*args, **kwargs):
+        barrier.wait()
+        return upload(*args, **kwargs)
+
+    monkeypatch.setattr(s3, "upload_file", upload_together)
+
+    results = s3_handler.upload_all(s3, workers=len(raw_files))
+
+    assert [result["file"] for result in results] == [f"{t}.csv" for t in raw_files]
+    for file_type in raw_files:
+        assert s3.head_object(Bucket=BUCKET_NAME, Key=pointer(s3, file_type)["key"])
+    assert all(result["skipped"] for result in s3_handler.upload_all(s3))
+
+
+# ---------- Retries ----------
+def failing(upload, failures):
+    calls = []
+
+    def flaky(*args, **kwargs):
+        calls.append(args)
+        if len(calls) <= failures:
+            raise ClientError({"Error": {"Code": "SlowDown", "Message": "slow down"}},
+                              "PutObject")
+        return upload(*args, **kwargs)
+
+    return flaky, calls
+
+
+def test_retries_with_backoff(s3, raw_files, no_sleep, monkeypatch):
+    flaky, calls = failing(s3.upload_file, failures=2)
+    monkeypatch.setattr(s3, "upload_file", flaky)
+
+    result = s3_handler.upload_file(raw_files["products"], "products", s3)
+
+    assert not result["skipped"] and len(calls) == 3
+    assert len(no_sleep) == 2
+    for attempt, delay in enumerate(no_sleep, start=1):
+        assert 0 <= delay <= s3_handler.RETRY_BASE_DELAY * 2 ** (attempt - 1)
+    assert pointer(s3, "products")["key"] == result["key"]
+
+
+def test_gives_up_after_max_retries(s3, raw_files, no_sleep, monkeypatch):
+    flaky, calls = failing(s3.upload_file, failures=s3_handler.MAX_RETRIES)
+    monkeypatch.setattr(s3, "upload_file", flaky)
+
+    with pytest.raises(RuntimeError, match=f"after {s3_handler.MAX_RETRIES} attempts"):
+        s3_handler.upload_file(raw_files["products"], "products", s3)
+
+    assert len(calls) == s3_handler.MAX_RETRIES
+    assert len(no_sleep) == s3_handler.MAX_RETRIES - 1
+    assert s3_handler.get_latest_upload_hash("products", s3) is None
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(s3_handler.random, "uniform", lambda low, high: high)
+    delays = [s3_handler.backoff_delay(attempt) for attempt in range(1, 10)]
+    assert delays[:3] == [s3_handler.RETRY_BASE_DELAY * 2 ** n for n in range(3)]
+    assert max(delays) == s3_handler.RETRY_MAX_DELAY
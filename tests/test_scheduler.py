@@ -0,0 +1,78 @@
+# tests/test_scheduler.py
+"""The load DAG: ordering, concurrency and failure propagation."""
+import threading
+
+import pytest
+from sqlalchemy import text
+
+from src.etl import load_to_db
+from src.etl.scheduler import check_dag, run_dag
+
+
+def recorder(events):
+    def task(name, wait_for=None):
+        def run():
+            events.append(("start", name))
+            if wait_for is not None:
+                wait_for.wait()
+            events.append(("end", name))
+            return name
+        return run
+    return task
+
+
+def test_independent_tasks_run_concurrently_and_dependents_wait():
+    events = []
+    task = recorder(events)
+    # Each branch waits for the other: run one after the other, they would hang
+    both_started = threading.Barrier(2, timeout=10)
+    tasks = {"customers": task("customers", both_started),
+             "products": task("products", both_started),
+             "transactions": task("transactions")}
+    dependencies = {"transactions": ["customers", "products"]}
+
+    assert run_dag(tasks, dependencies) == {name: name for name in tasks}
+    assert events.index(("start", "transactions")) > max(
+        events.index(("end", "customers")), events.index(("end", "products")))
+
+
+def test_failure_stops_dependents_and_is_raised():
+    events = []
+    task = recorder(events)
+
+    def fail():
+        raise RuntimeError("products failed")
+
+    tasks = {"customers": task("customers"), "products": fail,
+             "transactions": task("transactions")}
+    with pytest.raises(RuntimeError, match="products failed"):
+        run_dag(tasks, {"transactions": ["customers", "products"]}, workers=2)
+    assert ("start", "transactions") not in events
+    assert ("end", "customers") in events
+
+
+def test_invalid_dags_are_rejected():
+    with pytest.raises(ValueError, match="unknown tasks"):
+        check_dag({"a": None}, {"a": ["b"]})
+    with pytest.raises(ValueError, match="cycle"):
+        check_dag({"a": None, "b": None}, {"a": ["b"], "b": ["a"]})
+
+
+def test_failed_load_task_stops_the_load(database, sources, monkeypatch):
+    def fail(df, conn, update_rollups=True):
+        raise RuntimeError("products failed")
+
+    monkeypatch.setitem(load_to_db.LOAD_STAGES, "products", fail)
+    with pytest.raises(RuntimeError, match="products failed"):
+        load_to_db.load_data(workers=2)
+
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM products")).scalar() == 0
+        assert conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar() == 0
+        # Tasks that did not depend on it completed, with their timing
+        audited = conn.execute(text("""
+            SELECT table_name FROM load_audit
+            WHERE status = 'success' AND started_at IS NOT NULL AND duration_seconds >= 0
+            ORDER BY 1
+        """)).scalars().all()
+        assert audited == ["customers", "payment_methods"]
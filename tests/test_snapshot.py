@@ -0,0 +1,80 @@
+# tests/test_snapshot.py
+"""Snapshot save and restore, and the truncating reset."""
+import pytest
+from sqlalchemy import text
+
+from src import snapshot
+from src.etl import bulk_load, load_to_db
+from src.reset_db import reset_db
+
+CONTENTS = {
+    "customers": "SELECT id, name FROM customers",
+    "products": "SELECT id, name, supplier_id FROM products",
+    "transactions": "SELECT id, customer_id, payment_method_id FROM transactions",
+    "transaction_items": "SELECT id, transaction_id, product_id, quantity FROM transaction_items",
+    "product_sales": "SELECT product_id, total_quantity FROM product_sales",
+    "load_audit": "SELECT table_name, status, row_count FROM load_audit",
+}
+
+
+def contents(conn):
+    return {table: sorted(conn.execute(text(query)).fetchall())
+            for table, query in CONTENTS.items()}
+
+
+def test_restore_returns_the_saved_database(database, sources, tmp_path):
+    load_to_db.load_data(workers=1)
+    with database.connect() as conn:
+        saved = contents(conn)
+        indexes = bulk_load.secondary_indexes(conn, ["transactions", "transaction_items"])
+    manifest = snapshot.save("first", root=str(tmp_path))
+    assert {table["name"]: table["rows"] for table in manifest["tables"]}["transactions"] == 2
+    with pytest.raises(RuntimeError, match="already exists"):
+        snapshot.save("first", root=str(tmp_path))
+
+    with open(sources["transactions"], "a") as f:
+        f.write("3,1,2,4,2026-03-15T09:00:00,Cash\n")
+    load_to_db.load_data(workers=1)
+
+    snapshot.restore("first", root=str(tmp_path))
+
+    with database.connect() as conn:
+        assert contents(conn) == saved
+        assert bulk_load.secondary_indexes(conn, ["transactions", "transaction_items"]) \
+            == indexes
+    # The sequences continue after the restored ids, and the restored
+    # state tables make the next load read only the appended row
+    results = load_to_db.load_data(workers=1)
+    assert results["transactions"]["transactions"]["inserted"] == 1
+    with database.connect() as conn:
+        assert conn.execute(text(
+            "SELECT id FROM transaction_items ORDER BY id"
+        )).scalars().all() == [1, 2, 3]
+
+
+def test_truncate_reset_empties_every_table(database, sources):
+    load_to_db.load_data(workers=1)
+
+    assert reset_db("truncate") == "truncate"
+
+    with database.connect() as conn:
+        assert all(rows == [] for rows in contents(conn).values())
+        assert conn.execute(text("SELECT COUNT(*) FROM data_versions")).scalar() == 0
+    # Nothing is skipped, and the ids start over
+    results = load_to_db.load_data(workers=1)
+    assert results["customers"]["customers"]["inserted"] == 2
+    with database.connect() as conn:
+        assert conn.execute(text("SELECT MIN(id) FROM suppliers")).scalar() == 1
+
+
+def test_truncate_reset_needs_a_matching_schema(database):
+    with database.begin() as conn:
+        conn.execute(text("ALTER TABLE customers ADD COLUMN nickname TEXT"))
+
+    with pytest.raises(RuntimeError, match="does not match"):
+        reset_db("truncate")
+    assert reset_db("auto") == "drop"
+    with database.connect() as conn:
+        assert "nickname" not in conn.execute(text(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'customers'"
+        )).scalars().all()
@@ -0,0 +1,76 @@
+# tests/test_stream_load.py
+"""Micro-batch commits of the transaction stream and their offsets."""
+import pytest
+from sqlalchemy import text
+
+from src.etl import load_to_db, stream_load
+from src.raw_zone import stream_batch_path, stream_batch_seq
+
+HEADER = "id,customer_id,product_id,quantity,timestamp,payment_method\n"
+
+
+def emit(root, seq, *rows):
+    with open(stream_batch_path(seq, str(root)), "w") as f:
+        f.write(HEADER + "".join(f"{row}\n" for row in rows))
+
+
+def follow(root, **kwargs):
+    return stream_load.follow(str(root), max_latency=60, report_seconds=60,
+                              idle_timeout=0.2, **kwargs)
+
+
+def transaction_ids(conn):
+    return conn.execute(text("SELECT id FROM transactions ORDER BY id")).scalars().all()
+
+
+def test_batches_commit_with_their_offset_and_resume(database, sources, tmp_path,
+                                                      monkeypatch):
+    load_to_db.load_data(workers=1)
+    for seq, tid in [(1, 3), (2, 4), (3, 5)]:
+        emit(tmp_path, seq, f"{tid},1,2,1,2026-03-15T09:00:00,Cash")
+    commits = []
+    commit_batch = stream_load.commit_batch
+
+    def record(stream, paths, *args, **kwargs):
+        commits.append([stream_batch_seq(path) for path in paths])
+        return commit_batch(stream, paths, *args, **kwargs)
+
+    monkeypatch.setattr(stream_load, "commit_batch", record)
+
+    assert follow(tmp_path, max_batch_rows=2) == 3
+    # Coalesced up to max_batch_rows, the rest committed on the way out
+    assert commits == [[1, 2], [3]]
+    assert stream_load.get_offset(str(tmp_path)) == (3, 3)
+
+    emit(tmp_path, 4, "6,2,1,2,2026-03-15T10:00:00,Cash", "7,9,1,1,2026-03-15T10:00:00,Cash")
+    commits.clear()
+    assert follow(tmp_path, max_batch_rows=10) == 2
+
+    assert commits == [[4]]  # only the new batch
+    assert stream_load.get_offset(str(tmp_path)) == (4, 5)
+    with database.connect() as conn:
+        assert transaction_ids(conn) == [1, 2, 3, 4, 5, 6]  # 7 quarantined
+        assert conn.execute(text(
+            "SELECT product_id, total_quantity FROM product_sales ORDER BY 1"
+        )).fetchall() == [(1, 5), (2, 3)]
+
+
+def test_failed_commit_keeps_the_offset(database, sources, tmp_path, monkeypatch):
+    load_to_db.load_data(workers=1)
+    emit(tmp_path, 1, "3,1,2,1,2026-03-15T09:00:00,Cash")
+    load = stream_load.load_transactions_chunk
+
+    def fail(chunk, conn):
+        load(chunk, conn)
+        raise RuntimeError("killed")
+
+    monkeypatch.setattr(stream_load, "load_transactions_chunk", fail)
+    with pytest.raises(RuntimeError, match="killed"):
+        follow(tmp_path)
+    assert stream_load.get_offset(str(tmp_path)) == (0, 0)
+
+    monkeypatch.setattr(stream_load, "load_transactions_chunk", load)
+    assert follow(tmp_path) == 1
+    assert stream_load.get_offset(str(tmp_path)) == (1, 1)
+    with database.connect() as conn:
+        assert transaction_ids(conn) == [1, 2, 3]